@@ -49,7 +49,7 @@ az_current, alt_current = mount.azimuth_deg, mount.altitude_deg
 day = datetime.now().day
 month = datetime.now().month
 year = datetime.now().year
-db = TwilightMonitorDatabase(day, month, year, path=databaseRoot)
+db = TwilightMonitorDatabase(day, month, year, path=databaseRoot, storage="append", background=True)
 
 ## Step 1) Check mount state
 section("Check the mount state")
@@ -3,8 +3,9 @@ import datetime
 import numpy as np
 import matplotlib.pyplot as plt
 
-from photodiode import Keysight
-from skyhunter import IoptronMount
+from photodiode import Keysight, AcquisitionClock
+from photodiode.correlate import correlate
+from skyhunter import IoptronMount, angles
 from twmdb import TwilightMonitorDatabase
 
 from config import port, USBSerial, databaseRoot
@@ -42,16 +43,28 @@ def slew_in_altitude(mount, el_slew_time, direction, dead_time=0.5):
     #     print("Mount is settled.")
 
 ## Function to start electrometer and measure alt/az
-def start_measurement(mount, keysight, db):
+def start_measurement(mount, keysight, db, controller=None):
+    # Choose the exposure from the last one (photodiode.ExposureController)
+    if controller is not None:
+        controller.apply(verbose=True)
+
     # Start electrometer measurements
     print("Starting electrometer measurement...")
     keysight_data = keysight.start_measurement()
+    if controller is not None:
+        controller.update()
     acq_time = keysight.t_acq
     
-    # Get current mount position
+    # Get the mount position: the mean pointing of the samples if the telemetry is
+    # recording (continuous scans), otherwise the current position
     try:
-        mount.get_current_alt_az()
-        alt_current, az_current = mount.altitude_deg, mount.azimuth_deg
+        if mount.telemetry is not None and mount.telemetry.is_running:
+            clock = AcquisitionClock.from_keysight(keysight)
+            samples = correlate(keysight.datavector, clock, mount.telemetry.since(keysight.t_start - 1))
+            alt_current = np.nanmean(samples.alt)
+            az_current = angles.wrap_180(samples.az[0] + np.nanmean(angles.azimuth_difference(samples.az, samples.az[0])))
+        else:
+            alt_current, az_current, _ = mount.get_position(max_age=0.5)
 
     except:
         print("error reading position")
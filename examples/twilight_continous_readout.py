@@ -4,8 +4,8 @@ import asyncio
 import numpy as np
 import matplotlib.pyplot as plt
 
-from photodiode import Keysight
-from skyhunter import IoptronMount
+from photodiode import AsyncKeysight
+from skyhunter import AsyncIoptronMount
 from config import port, USBSerial
 
 SIDERAL_RATE = 0.004178 # deg/sec
@@ -18,16 +18,13 @@ print(f"Exposure time is set to {EXPTIME} seconds")
 
 
 async def trigger_photodiode(k):
-    t_acq = k.params['nsamples'] * k.params['interval']
-    
-    k.acquire()  # Start acquisition
-    for t in range(int(t_acq * 100) + 1):
-        print(f'Photodiode Acquisition {t/100:.2f}/{t_acq:.2f} s', end='\r')
-        await asyncio.sleep(k.params['interval'] / 100)  # Sleep for the interval
+    await k.start_acquisition()  # Start acquisition, the other tasks keep running
+    print(f'Photodiode Acquisition {k.t_acq:.2f} s')
+    await k.wait_complete()
 
-    print('\nAcquisition finished')
+    print('Acquisition finished')
 
-    res = k.read_data()
+    res = await k.fetch()
     np.save('data.npy', res)
     plt.plot(res['time'], res['CURR'])
     plt.xlabel('Time (s)')
@@ -37,21 +34,21 @@ async def trigger_photodiode(k):
 
 async def mount_continous_acquisition(mount, EXPTIME, DIRECTION):
     # Set the speed and start continuous altaz reading
-    mount.set_arrow_speed(9)
-    asyncio.create_task(mount.continous_altaz_reading(EXPTIME + Buffer))
+    await mount.set_arrow_speed(9)
+    altaz_task = asyncio.create_task(mount.continous_altaz_reading(EXPTIME + Buffer))
 
     # Slew in the given direction indefinitely
-    mount.slew_arrow_forever(DIRECTION.lower())
+    await mount.slew_arrow_forever(DIRECTION.lower())
     
     # Wait for the exposure time (plus some buffer)
     await asyncio.sleep(EXPTIME)
 
-    # Stop slewing and wait for Buffer seconds before proceeding
-    mount.stop_updown()
-    await asyncio.sleep(Buffer)
+    # Stop slewing and wait for the altaz reading to finish
+    await mount.stop_updown()
+    altaz = await altaz_task
     
     # Save the data after the task is done
-    np.savez('mount_altaz_data.npz', alt=mount.altaz['alt'], az=mount.altaz['az'], time=mount.altaz['time'])
+    np.savez('mount_altaz_data.npz', alt=altaz['alt'], az=altaz['az'], time=altaz['time'])
     
     print("Mount stopped")
 
@@ -62,15 +59,15 @@ async def main(k, mount, EXPTIME, DIRECTION):
     )
 
 ## Setup Keysight
-k = Keysight(USBSerial)
+k = AsyncKeysight(USBSerial)
 k.sync_tracked_properties()
 k.get_params()
 k.set_interval(0.1)
 k.set_acquisition_time(EXPTIME+Buffer)
 
 ## Setup Mount
-mount = IoptronMount(port)
-mount.get_current_alt_az()
+mount = AsyncIoptronMount(port)
+mount.mount.get_current_alt_az()
 az0, alt0 = mount.azimuth_deg, mount.altitude_deg
 mount.unpark()
 
@@ -3,7 +3,7 @@ import asyncio
 import numpy as np
 import matplotlib.pyplot as plt
 
-from photodiode import Keysight
+from photodiode import AsyncKeysight
 from skyhunter import IoptronMount
 from config import port, USBSerial
 
@@ -15,16 +15,13 @@ print(f"Exposure time is set to {EXPTIME} seconds")
 
 
 async def trigger_photodiode(k):
-    t_acq = k.params['nsamples'] * k.params['interval']
-    
-    k.acquire()  # Start acquisition
-    for t in range(int(t_acq * 100) + 1):
-        print(f'Photodiode Acquisition {t/100:.2f}/{t_acq:.2f} s', end='\r')
-        await asyncio.sleep(k.params['interval'] / 100)  # Sleep for the interval
+    await k.start_acquisition()  # Start acquisition, the other tasks keep running
+    print(f'Photodiode Acquisition {k.t_acq:.2f} s')
+    await k.wait_complete()
 
-    print('\nAcquisition finished')
+    print('Acquisition finished')
 
-    res = k.read_data()
+    res = await k.fetch()
     np.save('data.npy', res)
     plt.plot(res['time'], res['CURR'])
     plt.xlabel('Time (s)')
@@ -51,7 +48,7 @@ async def main(k, mount, EXPTIME):
     )
 
 ## Setup Keysight
-k = Keysight(USBSerial)
+k = AsyncKeysight(USBSerial)
 k.sync_tracked_properties()
 k.get_params()
 k.set_interval(0.1)
@@ -1,7 +1,29 @@
 # Import specific classes or functions from each module
-from .keysight_usb import Keysight
+# Loaded on first access (PEP 562), numpy and asyncio are slow to import
+_lazy_exports = {
+    'Keysight': '.keysight_usb',
+    'AsyncKeysight': '.async_keysight',
+    'AutoRanger': '.autorange',
+    'ExposureController': '.exposure',
+    'AcquisitionClock': '.correlate',
+}
+
+def __getattr__(name):
+    if name in _lazy_exports:
+        import importlib
+        value = getattr(importlib.import_module(_lazy_exports[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_exports))
 
 # You can also define an __all__ list to control what's exported
 __all__ = [
-    'Keysight'
-]
\ No newline at end of file
+    'Keysight',
+    'AsyncKeysight',
+    'AutoRanger',
+    'ExposureController',
+    'AcquisitionClock',
+]
@@ -0,0 +1,127 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .keysight_usb import Keysight
+
+"""asyncio client for the Keysight Electrometer (B2983B)
+
+The VISA calls of the wrapped `Keysight` run on a dedicated I/O thread, so the
+event loop keeps running (mount slews, telemetry, database writes) while the
+electrometer integrates and while the data are transferred.
+
+>> k = AsyncKeysight(electrometer_id)
+>> await k.start_acquisition()   # returns once the trigger is sent
+>> ...                           # other coroutines run here
+>> await k.wait_complete()
+>> data = await k.fetch()
+"""
+
+class AsyncKeysight():
+    """
+    Awaitable version of `Keysight`.
+
+    Attributes not defined here (params, t_acq, set_* methods, ...) are read from the
+    wrapped instrument; its blocking methods should only be called before the loop starts.
+
+    Args:
+        electrometer_id (str): The resource identifier for the electrometer.
+        client (optional): An already opened resource, see `Keysight`.
+        keysight (Keysight, optional): An already connected instrument.
+    """
+    def __init__(self, electrometer_id='USB0::2391::54808::MY54321262::0::INSTR', client=None, keysight=None):
+        self.keysight = keysight if keysight is not None else Keysight(electrometer_id, client=client)
+        # a single worker keeps the commands in submission order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='keysight-io')
+
+    def __getattr__(self, name):
+        if name == 'keysight':
+            raise AttributeError(name)
+        return getattr(self.keysight, name)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stop the I/O thread once the pending commands are done."""
+        self.executor.shutdown(wait=True)
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking instrument call on the I/O thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def start_acquisition(self):
+        """Start the acquisition, return as soon as the trigger is sent."""
+        await self._run(self.keysight.start_acquisition)
+
+    async def is_acquisition_complete(self):
+        """Check the status byte for the completion of the acquisition."""
+        return await self._run(self.keysight.is_acquisition_complete)
+
+    async def wait_complete(self, timeout=None):
+        """
+        Wait for the completion of the acquisition, yielding to the loop between polls.
+
+        Each poll is `Keysight.poll_acquisition`, run on the I/O thread.
+
+        Raises:
+            TimeoutError: If the acquisition is not complete within the timeout
+                (defaults to twice the estimated acquisition time plus 10 s).
+        """
+        k = self.keysight
+        while not await self._run(k.poll_acquisition, timeout):
+            await asyncio.sleep(k.poll_interval)
+
+    async def acquire(self):
+        """Start the acquisition and wait for its completion."""
+        await self.start_acquisition()
+        await self.wait_complete()
+
+    async def fetch(self, combined=True):
+        """
+        Fetch the acquired data off the loop.
+
+        Returns:
+            np.recarray: A record array containing time and measurement data, see `Keysight.read_data`.
+        """
+        return await self._run(self.keysight.read_data, combined=combined)
+
+    async def stream(self, nsamples=None, chunk_interval=1.0):
+        """
+        Asynchronous iterator over the new samples of an acquisition, see `Keysight.stream`.
+
+        >> async with contextlib.aclosing(k.stream(nsamples, chunk_interval=0.5)) as stream:
+        >>     async for chunk in stream:
+        >>         ...
+
+        The stream is stopped and the settings restored when the iterator is closed:
+        use `contextlib.aclosing` to do so as soon as the loop is left early.
+
+        Yields:
+            np.recarray: The new samples, with the fields of `Keysight.fetch_array`.
+        """
+        k = self.keysight
+        await self._run(k.begin_stream, nsamples)
+        try:
+            while not k.is_stream_finished():
+                await asyncio.sleep(chunk_interval)
+                chunk = await self._run(k.stream_step)
+                if len(chunk):
+                    yield chunk
+        finally:
+            await self._run(k.end_stream)
+
+    async def start_measurement(self):
+        """
+        Acquire and fetch a measurement.
+
+        Returns:
+            dict: A dictionary containing the electrometer data, see `Keysight.summarize`.
+        """
+        await self.acquire()
+        d = await self.fetch()
+        return self.keysight.summarize(d)
@@ -0,0 +1,202 @@
+"""Range finding for the Keysight Electrometer (B2983B)
+
+`AutoRanger` picks the measurement range with short probe acquisitions at a
+low NPLC instead of full exposures. A probe that does not overflow measures
+the signal level, so the ranger jumps straight to the smallest range holding
+it; a probe that overflows moves the search above the probed range. The range
+found is remembered per sky position and used as the first guess of the next
+search, which usually ends after a single probe.
+
+>> from photodiode import Keysight
+>> from photodiode.autorange import AutoRanger
+>> k = Keysight()
+>> ranger = AutoRanger(k)
+>> ranger.find_range(position=(30, 270))
+"""
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# measurement ranges of the B2983B, also used by photodiode.simulator
+RANGES = {
+    'CURR': [2e-12, 20e-12, 200e-12, 2e-9, 20e-9, 200e-9, 2e-6, 20e-6, 200e-6, 2e-3, 20e-3],
+    'CHAR': [2e-9, 20e-9, 200e-9, 2e-6],
+    'VOLT': [2, 20, 1000],
+    'RES': [1e6, 1e9, 1e12],
+}
+
+# modes the range finding supports
+AUTORANGE_MODES = ('CURR', 'CHAR')
+
+# the instrument returns 9.9e37 for a reading out of range
+OVERFLOW = 9.9e37
+
+
+class AutoRanger():
+    """
+    Find the range of the electrometer with short probe acquisitions.
+
+    Args:
+        keysight (Keysight): The connected instrument.
+        probe_nplc (float): NPLC of the probe acquisitions.
+        probe_samples (int): Number of samples of each probe.
+        headroom (float): Fraction of the range the signal may use, the rest is
+            left for the flux changes during the exposure.
+        memory_time (float): Time in seconds a remembered range is used as first guess.
+    """
+    def __init__(self, keysight, probe_nplc=0.01, probe_samples=5, headroom=0.5, memory_time=600.):
+        self.keysight = keysight
+        self.probe_nplc = probe_nplc
+        self.probe_samples = probe_samples
+        self.headroom = headroom
+        self.memory_time = memory_time
+        # position -> (time, range) of the last good range
+        self.history = {}
+        self.nprobes = 0
+        # shortest trigger period of the instrument, read on the first probe
+        self.probe_interval = 'MIN'
+
+    def ranges(self):
+        """The ranges of the current measurement mode, in increasing order."""
+        mode = self.keysight.params['mode']
+        if mode not in AUTORANGE_MODES:
+            raise ValueError(f"Range finding is not supported in {mode} mode.")
+        return RANGES[mode]
+
+    def select_index(self, level):
+        """Index of the smallest range holding `level` within the headroom."""
+        ranges = self.ranges()
+        for i, rang in enumerate(ranges):
+            if level <= self.headroom * rang:
+                return i
+        return len(ranges) - 1
+
+    def start_index(self, position=None):
+        """First guess: the range remembered for the position, else the last range found, else the largest."""
+        ranges = self.ranges()
+        now = time.time()
+        fresh = {p: (t, r) for p, (t, r) in self.history.items() if now - t < self.memory_time and r in ranges}
+        if position in fresh:
+            return ranges.index(fresh[position][1])
+        if fresh:
+            t, r = max(fresh.values())
+            return ranges.index(r)
+        return len(ranges) - 1
+
+    @contextmanager
+    def restore_settings(self):
+        """Put back the range and exposure settings of the caller on exit."""
+        k = self.keysight
+        settings = {p: k.params[p] for p in ['rang', 'nplc', 'nsamples', 'interval']}
+        try:
+            yield
+        finally:
+            with k.batch():
+                for p, value in settings.items():
+                    getattr(k, f'set_{p}')(value)
+
+    def probe(self, rang, restore=True):
+        """
+        Acquire a short probe on a fixed range.
+
+        Args:
+            rang (float): The range of the probe.
+            restore (bool): Put back the range and exposure settings afterwards.
+
+        Returns:
+            np.recarray: The probe samples, see `Keysight.read_data`.
+        """
+        if restore:
+            with self.restore_settings():
+                return self.probe(rang, restore=False)
+        k = self.keysight
+        with k.batch():
+            k.set_rang(rang)
+            k.set_nplc(self.probe_nplc)
+            k.set_nsamples(self.probe_samples)
+            k.set_interval(self.probe_interval)
+        self.probe_interval = k.params['interval']
+        k.acquire()
+        self.nprobes += 1
+        return k.read_data()
+
+    def level(self, d, exposure_time):
+        """
+        Signal level the range has to hold during the exposure.
+
+        In charge mode the charge keeps growing, so the level is the charge
+        extrapolated to the end of the exposure.
+        """
+        values = d[self.keysight.params['mode']]
+        if self.keysight.params['mode'] != 'CHAR' or len(values) < 2:
+            return np.max(np.abs(values))
+        dt = d['time'][-1] - d['time'][0]
+        rate = (values[-1] - values[0]) / dt if dt > 0 else 0.
+        return np.abs(values[-1]) + np.abs(rate) * exposure_time
+
+    def exposure_time(self):
+        """Duration of an acquisition with the current settings in seconds."""
+        k = self.keysight
+        if k.line_frequency is None:
+            k.line_frequency = k.get_powerline_freq()
+        return float(k.params['nsamples']) * max(k.current_nplc() / k.line_frequency, float(k.params['interval']))
+
+    def find_range(self, position=None, verbose=False):
+        """
+        Find the smallest range holding the signal and set it on the instrument.
+
+        The exposure settings (NPLC, number of samples, interval) are restored afterwards.
+
+        Args:
+            position (hashable): Key of the sky position, e.g. rounded (alt, az).
+                The range found is the first guess of the next search at that position.
+            verbose (bool): Print each probe.
+
+        Returns:
+            float: The range set on the instrument.
+        """
+        k = self.keysight
+        ranges = self.ranges()
+        exposure_time = self.exposure_time()
+        with self.restore_settings():
+            i = self.search(ranges, exposure_time, position, verbose)
+
+        k.set_rang(ranges[i])
+        self.history[position] = (time.time(), ranges[i])
+        return ranges[i]
+
+    def search(self, ranges, exposure_time, position=None, verbose=False):
+        """Probe the ranges and return the index of the smallest one holding the signal."""
+        k = self.keysight
+        # the answer is in ranges[lo:hi+1]
+        lo, hi = 0, len(ranges) - 1
+        i = self.start_index(position)
+        measured = set()
+        while True:
+            d = self.probe(ranges[i], restore=False)
+            measured.add(i)
+            values = d[k.params['mode']]
+            overflow = np.any(np.abs(values) >= OVERFLOW / 10)
+            if overflow:
+                if verbose: print(f"Range: {ranges[i]:e}, overflow")
+                lo = i + 1
+                if lo > hi:
+                    print("Signal is beyond the largest range")
+                    i = hi
+                    break
+                # measure on the largest range, or step up below a range that held the signal
+                i = lo if hi in measured else hi
+                continue
+
+            level = self.level(d, exposure_time)
+            target = min(max(self.select_index(level), lo), hi)
+            if verbose: print(f"Range: {ranges[i]:e}, Value: {level:.2e}, Next: {ranges[target]:e}")
+            if target >= i:
+                # the signal is measured within this range, no need to confirm a larger one
+                i = target
+                break
+            # confirm the smaller range, it may overflow with the probe noise
+            hi = i
+            i = target
+        return i
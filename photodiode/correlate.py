@@ -0,0 +1,169 @@
+"""
+Correlation of the electrometer samples with the mount pointing.
+
+The electrometer time stamps (`:FETC:ARR:TIME?`) count seconds from the
+trigger of the acquisition on the instrument clock, while the mount telemetry
+(skyhunter.telemetry) is stamped with the host unix time. AcquisitionClock
+maps the instrument times to host times from two markers recorded by
+Keysight: the host time window of the write that triggered the acquisition
+(`t_trigger`) and the window in which its completion was seen (`t_complete`).
+`correlate` then interpolates the mount track onto every sample, giving the
+alt/az of each sample of a continuous scan.
+
+Example:
+    recorder = mount.start_telemetry(interval=0.1)
+    keysight.acquire()
+    d = keysight.read_data()
+    clock = AcquisitionClock.from_keysight(keysight, d)
+    samples = correlate(d, clock, recorder.since(keysight.t_start - 1))
+    samples.alt, samples.az       # pointing of each sample, deg
+"""
+import numpy as np
+
+
+class AcquisitionClock:
+    """Map from the instrument time of an acquisition to the host unix time.
+
+    host time = t0 + rate * instrument time
+
+    Args:
+        t0 (float): host unix time of the instrument time 0 (the trigger).
+        rate (float, optional): host seconds per instrument second. Defaults to 1.
+        error (float, optional): uncertainty of t0 in seconds. Defaults to 0.
+    """
+    def __init__(self, t0, rate=1.0, error=0.0):
+        self.t0 = t0
+        self.rate = rate
+        self.error = error
+
+    def __repr__(self):
+        return f"AcquisitionClock(t0={self.t0:.6f}, rate={self.rate:.9f}, error={self.error:.2e})"
+
+    def to_host(self, t):
+        """Host unix time of the instrument time(s) t."""
+        return self.t0 + self.rate * np.asarray(t, dtype=float)
+
+    @classmethod
+    def from_keysight(cls, keysight, d=None, fit_rate=False, max_rate_error=1e-3):
+        """Estimate the clock of the last acquisition of a Keysight.
+
+        The trigger marker places the instrument time 0 within the write of
+        :INIT:ACQ; the completion marker places the end of the last sample
+        (its time stamp plus the aperture) within the last polls of
+        `wait_complete`. The offset is the weighted mean of both estimates.
+
+        Args:
+            keysight (Keysight): the electrometer, after `wait_complete`.
+            d (np.recarray, optional): the data of the acquisition. Defaults to
+                the last data kept by `summarize`.
+            fit_rate (bool, optional): also fit the clock rate from both markers.
+                Only worth it for long acquisitions with a fast poll interval.
+            max_rate_error (float, optional): a fitted rate further than this
+                from 1 is rejected (bad marker) and the rate is kept at 1.
+
+        Returns:
+            AcquisitionClock: the clock of the acquisition.
+        """
+        d = keysight.datavector if d is None else d
+        # trigger marker: the instrument time 0 is within the write of :INIT:ACQ
+        t_trigger = getattr(keysight, 't_trigger', keysight.t_start)
+        err_trigger = max(getattr(keysight, 't_trigger_err', 0.0), 1e-6)
+
+        t_complete = getattr(keysight, 't_complete', None)
+        if t_complete is None or d is None or not len(d):
+            return cls(t_trigger, error=err_trigger)
+
+        try:
+            aperture = float(keysight.params['nplc']) / keysight.line_frequency
+        except ValueError:
+            # NPLC AUTO, the end of the last sample is unknown
+            return cls(t_trigger, error=err_trigger)
+
+        # completion marker: the last sample ended within the last polling interval
+        t_last = float(d['time'][-1]) + aperture
+        host_end = 0.5 * (t_complete[0] + t_complete[1])
+        err_end = max(0.5 * (t_complete[1] - t_complete[0]), 1e-6)
+
+        rate = 1.0
+        if fit_rate and t_last > 0:
+            fitted = (host_end - t_trigger) / t_last
+            if abs(fitted - 1) < max_rate_error:
+                rate = fitted
+                # both markers are on the line, the trigger is the better one
+                return cls(t_trigger, rate=rate, error=err_trigger)
+
+        # inverse variance weighted mean of the two offset estimates
+        w_trigger, w_end = err_trigger**-2, err_end**-2
+        t0 = (w_trigger * t_trigger + w_end * (host_end - t_last)) / (w_trigger + w_end)
+        return cls(t0, rate=rate, error=(w_trigger + w_end)**-0.5)
+
+
+def _track_arrays(track):
+    """Return the host times, altitudes and azimuths of a mount track."""
+    if isinstance(track, dict):
+        # IoptronMount.altaz, times as datetime64
+        t = np.asarray(track['time'])
+        if np.issubdtype(t.dtype, np.datetime64):
+            t = t.astype('datetime64[ns]').astype(np.int64) / 1e9
+        return np.asarray(t, dtype=float), np.asarray(track['alt'], dtype=float), np.asarray(track['az'], dtype=float)
+
+    # telemetry samples (skyhunter.telemetry.SAMPLE_DTYPE), stamped at the receipt of the reply
+    t = np.asarray(track['time'], dtype=float)
+    if 'rtt' in track.dtype.names:
+        # the mount reads its position when the command arrives, the rest of
+        # the round trip is the latency of the reply
+        t = t - track['rtt']
+    return t, np.asarray(track['alt'], dtype=float), np.asarray(track['az'], dtype=float)
+
+
+def interpolate_track(track, t):
+    """Interpolate a mount track at the host unix times t.
+
+    The azimuth is unwrapped before the interpolation, so a track crossing
+    the wrap angle interpolates through it, and the result is wrapped back to
+    the range of the track: [-180, 180) for IoptronMount azimuths (offset by
+    OFFSET_AZ), [0, 360) otherwise. Times outside the track give NaN.
+
+    Args:
+        track (np.ndarray or dict): telemetry samples from TelemetryRecorder, or
+            a dict with 'time' (datetime64 or unix), 'alt' and 'az' arrays.
+        t (float or np.ndarray): host unix times.
+
+    Returns:
+        alt (np.ndarray): the altitudes in degree
+        az (np.ndarray): the azimuths in degree
+    """
+    track_t, alt, az = _track_arrays(track)
+    t = np.asarray(t, dtype=float)
+    if len(track_t) < 2:
+        nan = np.full(t.shape, np.nan)
+        return nan, nan.copy()
+
+    order = np.argsort(track_t, kind='stable')
+    track_t, alt, az = track_t[order], alt[order], az[order]
+    az_min = -180.0 if np.min(az) < 0 else 0.0
+    az = np.unwrap(az, period=360.0)
+
+    outside = (t < track_t[0]) | (t > track_t[-1])
+    alt_t = np.where(outside, np.nan, np.interp(t, track_t, alt))
+    az_t = np.where(outside, np.nan, np.mod(np.interp(t, track_t, az) - az_min, 360.0) + az_min)
+    return alt_t, az_t
+
+
+def correlate(d, clock, track):
+    """Pointing of each electrometer sample.
+
+    Args:
+        d (np.recarray): the data of an acquisition (`Keysight.read_data`).
+        clock (AcquisitionClock): the clock of the acquisition.
+        track (np.ndarray or dict): the mount track, see `interpolate_track`.
+
+    Returns:
+        np.recarray: the fields of d plus 'host_time' (unix time of the sample),
+            'alt' and 'az' (deg, NaN where the track does not cover the sample).
+    """
+    host_time = clock.to_host(d['time'])
+    alt, az = interpolate_track(track, host_time)
+    names = list(d.dtype.names)
+    return np.rec.fromarrays([d[name] for name in names] + [host_time, alt, az],
+                             names=names + ['host_time', 'alt', 'az'])
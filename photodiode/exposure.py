@@ -0,0 +1,153 @@
+"""Adaptive exposure for the Keysight Electrometer (B2983B)
+
+During twilight the photocurrent falls by orders of magnitude, so a fixed
+exposure over-integrates early and is noise limited late. `ExposureController`
+chooses the NPLC and number of samples of the next exposure from the signal
+and noise of the previous one, to reach a target signal-to-noise ratio in the
+shortest time.
+
+>> from photodiode import Keysight
+>> from photodiode.exposure import ExposureController
+>> k = Keysight()
+>> controller = ExposureController(k, target_snr=200)
+>> for position in positions:
+>>     controller.apply()
+>>     k.start_measurement()
+>>     controller.update()
+
+In current mode the noise of each sample is assumed white, so it scales as
+1/sqrt(NPLC) and the SNR of the mean grows as sqrt(nsamples). In charge mode
+the signal is the slope of the accumulated charge and the noise is the scatter
+of the charge around a line, which does not depend on the NPLC.
+"""
+import numpy as np
+
+from .keysight_usb import TRACE_POINTS
+
+
+class ExposureController():
+    """
+    Choose the NPLC and number of samples of each exposure to reach a target SNR.
+
+    Args:
+        keysight (Keysight): The connected instrument.
+        target_snr (float): Signal-to-noise ratio of the mean signal of an exposure.
+        nplc_choices (list): NPLC values to choose from.
+        min_samples (int): Minimum number of samples of an exposure.
+        max_samples (int): Maximum number of samples of an exposure.
+        max_time (float): Maximum exposure time in seconds.
+    """
+    def __init__(self, keysight, target_snr=100., nplc_choices=(0.01, 0.1, 1, 10),
+                 min_samples=10, max_samples=TRACE_POINTS, max_time=60.):
+        self.keysight = keysight
+        self.target_snr = target_snr
+        self.nplc_choices = sorted(nplc_choices)
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.max_time = max_time
+        # signal and noise per sample of the last exposure, see update()
+        self.signal = None
+        self.noise = None
+        self.nplc = None
+
+    def sample_time(self, nplc):
+        """Time between two samples in seconds."""
+        k = self.keysight
+        if k.line_frequency is None:
+            k.line_frequency = k.get_powerline_freq()
+        return max(nplc / k.line_frequency, float(k.params['interval']))
+
+    def update(self, d=None):
+        """
+        Measure the signal and noise of the last exposure.
+
+        Args:
+            d (np.recarray): The exposure data, see `Keysight.read_data`.
+                Defaults to the last measurement of `Keysight.start_measurement`.
+
+        Returns:
+            float: The signal-to-noise ratio of the exposure.
+        """
+        k = self.keysight
+        d = k.datavector if d is None else d
+        mode = k.params['mode']
+        values = np.asarray(d[mode], dtype=float)
+        self.nplc = k.current_nplc()
+
+        if mode == 'CHAR':
+            t = np.asarray(d['time'], dtype=float)
+            slope, intercept = np.polyfit(t, values, 1)
+            self.signal = np.abs(slope)
+            self.noise = np.std(values - (slope * t + intercept))
+        else:
+            self.signal = np.abs(np.mean(values))
+            self.noise = np.std(values)
+        return self.snr(len(values), self.nplc)
+
+    def snr(self, nsamples, nplc):
+        """Expected signal-to-noise ratio of an exposure, from the last measurement."""
+        if self.keysight.params['mode'] == 'CHAR':
+            # error of the fitted slope over nsamples uniformly spaced samples
+            duration = nsamples * self.sample_time(nplc)
+            return self.signal * duration * np.sqrt(nsamples / 12.) / self.noise
+        noise = self.noise * np.sqrt(self.nplc / nplc)
+        return self.signal * np.sqrt(nsamples) / noise
+
+    def nsamples_for(self, nplc):
+        """Number of samples reaching the target SNR with the given NPLC."""
+        lo, hi = self.min_samples, self.max_samples
+        if self.snr(hi, nplc) < self.target_snr:
+            return hi
+        # the SNR increases with the number of samples
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.snr(mid, nplc) >= self.target_snr:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def next_exposure(self):
+        """
+        Choose the settings of the next exposure.
+
+        Without a previous measurement the current settings are kept.
+
+        Returns:
+            dict: 'nplc', 'nsamples', the exposure 'time' in seconds and the expected 'snr'.
+        """
+        k = self.keysight
+        if self.signal is None or not self.noise:
+            nplc, nsamples = k.current_nplc(), int(k.params['nsamples'])
+            return {'nplc': nplc, 'nsamples': nsamples, 'time': nsamples * self.sample_time(nplc), 'snr': np.nan}
+
+        options = []
+        for nplc in self.nplc_choices:
+            nsamples = self.nsamples_for(nplc)
+            nsamples = min(nsamples, max(self.min_samples, int(self.max_time / self.sample_time(nplc))))
+            exptime = nsamples * self.sample_time(nplc)
+            # shortest exposure reaching the target, then the largest NPLC (better line rejection)
+            reached = self.snr(nsamples, nplc) >= self.target_snr
+            options.append((not reached, exptime if reached else -self.snr(nsamples, nplc), -nplc, nsamples))
+
+        _, _, nplc, nsamples = min(options)
+        nplc = -nplc
+        return {'nplc': nplc, 'nsamples': nsamples, 'time': nsamples * self.sample_time(nplc),
+                'snr': self.snr(nsamples, nplc)}
+
+    def apply(self, verbose=False):
+        """
+        Set the settings of the next exposure on the instrument.
+
+        Returns:
+            dict: The settings, see `next_exposure`.
+        """
+        k = self.keysight
+        exposure = self.next_exposure()
+        with k.batch():
+            k.set_nplc(exposure['nplc'])
+            k.set_nsamples(exposure['nsamples'])
+        if verbose:
+            print(f"Exposure: {exposure['time']:0.3f} sec with nsamples {exposure['nsamples']} "
+                  f"and nplc {exposure['nplc']}, expected SNR {exposure['snr']:0.1f}")
+        return exposure
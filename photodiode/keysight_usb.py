@@ -1,8 +1,11 @@
 # import telnetlib
-import pyvisa as visa
-import struct
+import sys
 import time
 import numpy as np
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from .autorange import AutoRanger
 
 """Command Keysight Electrometer (B2983B)
 
@@ -22,11 +25,66 @@ Autor: Elana Urbarch
 Modiefied by: Johnny Esteves
 """
 
+# Elements of a combined `:FETC:ARR?` in the order sent by the instrument,
+# and their field names in the returned record array
+FETCH_ELEMENTS = {
+    'CHAR': 'CHAR',
+    'CURR': 'CURR',
+    'VOLT': 'VOLT',
+    'RES': 'RES',
+    'TIME': 'time',
+    'STAT': 'status',
+    'SOUR': 'source',
+}
+
+# size of the instrument trace buffer, the longest streamed segment
+TRACE_POINTS = 100000
+
+@dataclass
+class RunningStats:
+    """Mean and standard deviation updated chunk by chunk (Chan et al. parallel update)."""
+    n: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.n) if self.n > 0 else np.nan
+
+    def update(self, values):
+        """Add a chunk of values."""
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
+            return
+        n, mean = values.size, values.mean()
+        m2 = np.sum((values - mean)**2)
+        delta = mean - self.mean
+        total = self.n + n
+        self.mean += delta * n / total
+        self.m2 += m2 + delta**2 * self.n * n / total
+        self.n = total
+
+def visa_errors():
+    """
+    The pyvisa I/O error, for `except` clauses.
+
+    pyvisa is imported only when a resource manager is created (see `Config.rm`),
+    so nothing can raise its errors before; an empty tuple then catches nothing.
+    """
+    visa = sys.modules.get('pyvisa')
+    return (visa.errors.VisaIOError,) if visa is not None else ()
+
 class Config():
     def __init__(self) -> None:
-        # initialize the resource manager (USB connection)
-        self.rm = visa.ResourceManager()
-    pass
+        # the resource manager (USB connection) is created on first use
+        self._rm = None
+
+    @property
+    def rm(self):
+        if self._rm is None:
+            import pyvisa as visa
+            self._rm = visa.ResourceManager()
+        return self._rm
 
 class Keysight():
     """
@@ -44,6 +102,7 @@ class Keysight():
         off(): Turns the instrument input OFF.
         acquire(): Starts the data acquisition process.
         read_data(): Reads the acquired data in ASCII format.
+        stream(nsamples, chunk_interval): Yields the samples of a running acquisition in chunks.
         reset(): Resets the instrument's settings.
         set_trigger_out(): Sets up the trigger output configuration.
         set_mode(mode): Set the measurement mode of the electrometer.
@@ -58,6 +117,7 @@ class Keysight():
         get_mode(): Get the current mode of the instrument.
         get_aper(): Get the aperture setting of the instrument.
         get_nplc(): Get the number of power line cycles (NPLC) setting.
+        current_nplc(): Get the NPLC in use, queried when it is set to AUTO.
         get_rang(): Get the range setting of the instrument.
         get_delay(): Get the delay setting of the instrument.
         get_interval(): Get the interval setting between consecutive samples.
@@ -66,16 +126,21 @@ class Keysight():
         get_default_params(): Get the current default configuration parameters.
         explain_params(): Print an explanation of each parameter.
         sync_tracked_properties(): Synchronizes the instrument's settings with the expected parameters.
+        batch(): Context manager sending the writes made inside it as a single message.
+        check_errors(): Read the instrument error queue.
+        invalidate(*keys): Forget the cached instrument state.
 
     """
     # tracked_properties = ["mode", 'rang', 'nplc', 'nsamples', 'interval', 'delay']
 
-    def __init__(self, electrometer_id='USB0::2391::54808::MY54321262::0::INSTR'):
+    def __init__(self, electrometer_id='USB0::2391::54808::MY54321262::0::INSTR', client=None):
         """
         Initializes the Keysight object with the specified resource identifiers.
 
         Args:
             electrometer_id (str): The resource identifier for the electrometer.
+            client (optional): An already opened resource used instead of `electrometer_id`,
+                e.g. a `photodiode.simulator.SimulatedB2983B`.
         """
         self.config = Config()
         self.config.electrometer_id = electrometer_id
@@ -90,11 +155,33 @@ class Keysight():
                     }
         self.tracked_properties = list(self.default_params.keys())
         self.params = self.default_params.copy()
-        self.client = None
+        # keys of self.params known to match the instrument, see invalidate()
+        self._cached = set()
+        self.client = client
         # self.rm = visa.ResourceManager()
         self._config()
         self.buffer = 0.010 # 25 ms
 
+        # arrays are fetched as binary blocks, see set_data_format()
+        self.data_format = 'REAL,64'
+        self._data_format_sent = None
+
+        # acquisition completion, see start_acquisition()
+        self.line_frequency = None # Hz, read from the instrument on first use
+        self.poll_interval = 1e-3 # sec
+
+        # elements of the combined fetch, see set_fetch_elements()
+        self.fetch_elements = None
+        self.fetch_status = False
+        self.fetch_source = False
+
+        # range finding, see auto_scale()
+        self.autoranger = None
+
+        # writes queued by batch()
+        self._batch_depth = 0
+        self._pending_writes = []
+
         # # check instrument connection
         # try:
         #     self.get_params()
@@ -115,7 +202,8 @@ class Keysight():
         # if self.client is not None:
             # self.client.close()
         
-        self.client = self.config.rm.open_resource(self.config.electrometer_id)
+        if self.client is None:
+            self.client = self.config.rm.open_resource(self.config.electrometer_id)
         self.client.timeout = 9000000  # Timeout in milliseconds (e.g., 5000 ms = 5 seconds)
         # self.client.write('SYST:REM')
         # remote connections
@@ -135,17 +223,76 @@ class Keysight():
         Synchronizes the instrument's settings with the expected parameters.
         """
         # print('Setting defult parameters')
-        for p in self.tracked_properties:
-            # print(f'Set {p} to {self.default_params[p]}')
-            getattr(self, f'set_{p}')(self.default_params[p])
-    
+        with self.batch():
+            for p in self.tracked_properties:
+                # print(f'Set {p} to {self.default_params[p]}')
+                getattr(self, f'set_{p}')(self.default_params[p])
+
+    @contextmanager
+    def batch(self):
+        """
+        Send the writes made inside the block as a single message.
+
+        The commands are joined with ';' and sent in one write when the block exits,
+        followed by a single `SYST:ERR?` check. A query inside the block first sends
+        the writes queued so far, so the commands keep their order. Blocks can be nested.
+
+        >> with k.batch():
+        >>     k.set_rang(2e-9)
+        >>     k.set_nplc(1)
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flush()
+
+    def flush(self):
+        """
+        Send the writes queued by `batch` as one message and check the error queue.
+
+        Returns:
+            list: The instrument errors, empty if none.
+        """
+        if not self._pending_writes:
+            return []
+        # after a ';' a header is relative to the previous one, make them all absolute
+        commands = [m if m.startswith((':', '*')) else ':' + m for m in self._pending_writes]
+        self._pending_writes = []
+        self._send(';'.join(commands))
+        errors = self.check_errors()
+        if errors:
+            # some settings may not have been applied
+            self.invalidate()
+        return errors
+
+    def check_errors(self):
+        """
+        Read the instrument error queue until it is empty.
+
+        Returns:
+            list: The error messages, e.g. ['-113,"Undefined header"'].
+        """
+        errors = []
+        while True:
+            error = self.query('SYST:ERR?')
+            if error is None or int(error.split(',')[0]) == 0:
+                break
+            errors.append(error)
+            print(f"Instrument error: {error}")
+        return errors
+
     def query(self, command):
         """Send a command to the instrument and return the response."""
         # self._config()
+        if self._pending_writes:
+            self.flush()
         try:
             response = self.client.query(command)
             return response.strip().strip('"') 
-        except visa.errors.VisaIOError as e:
+        except visa_errors() as e:
             print(f"Query failed: {e}")
             return None
         finally:
@@ -153,35 +300,51 @@ class Keysight():
             time.sleep(self.buffer)
 
     def write(self, message):
+        """Send a command to the instrument, or queue it inside a `batch` block."""
+        if '*RST' in message.upper():
+            self.invalidate()
+        if self._batch_depth:
+            self._pending_writes.append(message.strip())
+            return
+        self._send(message)
+
+    def _send(self, message):
         #self.client = telnetlib.Telnet(self.config.keysight_addr, self.config.keysight_port)
         # self._config()
+        t_write = time.time()
         try:
             self.client.write(message)
         except EOFError:
             # self._config()
             self.client.write(message)
+        # host time window of the write, see start_acquisition()
+        self.t_write = (t_write, time.time())
         # self.client.close()
         time.sleep(self.buffer)
     
     def read(self, message):
+        if self._pending_writes:
+            self.flush()
         self.client.write(message + '\r\n')
 
         # self._config()
         try:
             return self.client.read().strip()  # Use read() for string data
-        except visa.VisaIOError as e:  # Handle errors specific to pyvisa
+        except visa_errors() as e:  # Handle errors specific to pyvisa
             # self._config()
             return self.client.read().strip()
         finally:
             # self.client.close()
             time.sleep(self.buffer)
     
-    def read_binary_data(self, message):
+    def read_raw(self, message):
         # self._config()
+        if self._pending_writes:
+            self.flush()
         self.client.write(message + '\r\n')
         try:
             return self.client.read_raw()  # Use read_raw() for binary data
-        except visa.VisaIOError as e:  # Handle errors specific to pyvisa
+        except visa_errors() as e:  # Handle errors specific to pyvisa
             # self._config()
             return self.client.read_raw()
         finally:
@@ -204,64 +367,364 @@ class Keysight():
         
     def on(self):
         """Turns the instrument input ON."""
+        if self._is_cached('power', 1):
+            return
         self.write(':INP ON')
+        self._cache('power', 1)
 
     def off(self):
         """Turns the instrument input OFF."""
+        if self._is_cached('power', 0):
+            return
         self.write(':INP OFF')
+        self._cache('power', 0)
+
+    def _is_cached(self, key, value):
+        """Check if the instrument is known to have `key` set to `value`."""
+        return key in self._cached and self.params.get(key) == value
+
+    def _cache(self, key, value):
+        """Record a value set on (or read from) the instrument."""
+        self.params[key] = value
+        self._cached.add(key)
+
+    def _cached_query(self, key, command, cast=str):
+        """Return the cached value of `key`, querying the instrument only if unknown."""
+        if key not in self._cached:
+            self._cache(key, cast(self.query(command)))
+        return self.params[key]
+
+    def invalidate(self, *keys):
+        """
+        Forget the cached instrument state, so the next get_* queries the instrument
+        and the next set_* writes even an unchanged value.
+
+        The `set_*` methods skip the write when the instrument already has the value,
+        and the `get_*` methods answer from `self.params`. Call this after changing
+        the instrument from elsewhere (front panel, another program). It is called
+        on `*RST` and when an error is reported by a batch.
+
+        Args:
+            *keys (str): Parameters to forget, e.g. 'rang'. Defaults to all of them.
+        """
+        if keys:
+            self._cached.difference_update(keys)
+            return
+        self._cached.clear()
+        self._data_format_sent = None
+        self.fetch_elements = None
 
     def acquire(self, verbose=False):
-        """Starts the data acquisition process."""
-        # print("Get frequency")
-        freq = 50 # Hz # to be checked #self.get_powerline_freq()
-        # print("Get acquisition time")
-        self.t_acq = float(self.params['nsamples']) * (float(self.params['nplc'])*1/freq + float(self.params['interval']))
+        """Starts the data acquisition process and waits for its completion."""
+        self.start_acquisition(verbose=verbose)
+        self.wait_complete(verbose=verbose)
+
+    def start_acquisition(self, verbose=False):
+        """
+        Starts the data acquisition process without waiting.
+
+        `*OPC` sets the operation complete bit once the trigger count is reached, and
+        `*ESE 1` reports it in the status byte (ESB, bit 5) checked by `wait_complete`.
+        """
+        if self.line_frequency is None:
+            self.line_frequency = self.get_powerline_freq()
+        # upper bound of the acquisition time, used for the timeout
+        self.t_acq = float(self.params['nsamples']) * (self.current_nplc()/self.line_frequency + float(self.params['interval']))
         if verbose: print('acquisition time:', self.t_acq)
 
-        self.write(':INIT:ACQ')
+        # the trigger is never deferred by batch(), t_start must be the trigger time
+        if self._pending_writes:
+            self.flush()
+        self._send(f'*CLS;*ESE 1;:INIT:ACQ;*OPC')
+        self.t_start = time.time()
+        self.t_running = self.t_start
+        # host time of the trigger, the origin of the instrument time stamps (see photodiode.correlate)
+        self.t_trigger = 0.5 * (self.t_write[0] + self.t_write[1])
+        self.t_trigger_err = 0.5 * (self.t_write[1] - self.t_write[0])
+        self.t_complete = None
+
+    def is_acquisition_complete(self):
+        """Check the status byte for the completion of the acquisition."""
+        return bool(self.client.read_stb() & 32)
+
+    def poll_acquisition(self, timeout=None):
+        """
+        Check once for the completion of the acquisition started by `start_acquisition`.
 
-        # Use time.time() to track real-time progress
-        start_time = time.time()
-          
-        # Wait for the acquisition to complete based on the calculated time
-        while time.time() - start_time < self.t_acq:
-            elapsed = time.time() - start_time
+        The status byte is read with a cheap serial poll (no SCPI message). Once the
+        acquisition is complete, `t_end` and `t_complete` are set.
 
-            if verbose:
-                print(f'Acquisition {elapsed:.2f}/{self.t_acq:.2f} s', end='\r')
+        Args:
+            timeout (float): Timeout in seconds. Defaults to twice the estimated acquisition time plus 10 s.
 
-            time.sleep(self.buffer)  # Sleep for 100 ms to avoid overwhelming the system
+        Returns:
+            bool: True if the acquisition is complete.
 
+        Raises:
+            TimeoutError: If the acquisition is not complete within the timeout.
+        """
+        if timeout is None:
+            timeout = 2 * self.t_acq + 10
+        if self.is_acquisition_complete():
+            self.t_end = time.time()
+            # the acquisition ended within this host time window
+            self.t_complete = (self.t_running, self.t_end)
+            return True
+        # last host time the acquisition was seen running
+        self.t_running = time.time()
+        elapsed = self.t_running - self.t_start
+        if elapsed > timeout:
+            raise TimeoutError(f"Acquisition not complete after {elapsed:.2f} s")
+        return False
+
+    def wait_complete(self, timeout=None, verbose=False):
+        """
+        Wait until the acquisition started by `start_acquisition` is complete.
+
+        The completion is polled with `poll_acquisition` every `self.poll_interval` seconds.
+
+        Args:
+            timeout (float): Timeout in seconds. Defaults to twice the estimated acquisition time plus 10 s.
+
+        Raises:
+            TimeoutError: If the acquisition is not complete within the timeout.
+        """
+        while not self.poll_acquisition(timeout):
+            if verbose:
+                print(f'Acquisition {self.t_running - self.t_start:.2f}/{self.t_acq:.2f} s', end='\r')
+            time.sleep(self.poll_interval)
         if verbose: print('\nAcquisition finished')
 
-    def read_binary_data(self):
-        d = self.read_binary_data(f':FORM:DATA REAL,32')
-        n = struct.unpack('>I', d[:4])
-        data = struct.unpack(f'>{n}f', d[4:-1])
-        self.write(f':FORM:DATA ASC')
-        return data
+    def set_data_format(self, data_format='REAL,64'):
+        """
+        Set the format of the data arrays sent by the instrument.
+
+        The binary formats are sent as IEEE 488.2 definite-length blocks in big-endian
+        byte order, several times smaller than ASCII and parsed without conversion.
+
+        Args:
+            data_format (str): One of ['ASC', 'REAL,32', 'REAL,64'].
+        """
+        if data_format not in ['ASC', 'REAL,32', 'REAL,64']:
+            raise ValueError("Invalid data format. Choose from 'ASC', 'REAL,32', 'REAL,64'.")
+        self.data_format = data_format
+        if self._data_format_sent == data_format:
+            return
+        self.write(f':FORM:DATA {data_format}')
+        if data_format != 'ASC':
+            self.write(':FORM:BORD NORM')
+        self._data_format_sent = data_format
+
+    def read_binary_data(self, message):
+        """
+        Query an array of values sent as a binary block.
+
+        Args:
+            message (str): The query, e.g. ':FETC:ARR:CURR?'.
+
+        Returns:
+            np.ndarray: The values, a read-only view on the received block (no copy).
+        """
+        if self._pending_writes:
+            self.flush()
+        datatype = 'f' if self.data_format == 'REAL,32' else 'd'
+        return self.client.query_binary_values(message, datatype=datatype, is_big_endian=True,
+                                               container=np.array)
+
+    def read_ascii_data(self, message):
+        """Query an array of values sent as ASCII."""
+        if self._pending_writes:
+            self.flush()
+        return np.array(self.client.query_ascii_values(message), dtype=float)
+
+    def set_fetch_elements(self, status=False, source=False):
+        """
+        Set the elements returned by the combined fetch (`fetch_array`).
+
+        The time stamps and the measured quantity are always fetched.
+
+        Args:
+            status (bool): Also fetch the status word of each sample.
+            source (bool): Also fetch the source output value of each sample.
+        """
+        requested = ['TIME', self.params['mode']] + ['STAT'] * status + ['SOUR'] * source
+        elements = [e for e in FETCH_ELEMENTS if e in requested]
+        self.fetch_status, self.fetch_source = status, source
+        if elements != self.fetch_elements:
+            self.write(f':FORM:ELEM:SENS {",".join(elements)}')
+            self.fetch_elements = elements
+
+    def fetch_array(self):
+        """
+        Fetch all the elements of the last acquisition in a single `:FETC:ARR?` query.
+
+        The instrument holds the fetch until the acquisition is done. The samples come
+        interleaved (time, value, ... per sample) and are viewed as records without a copy.
+
+        Returns:
+            np.recarray: A record array with the fields 'time', the measurement mode
+                and, if enabled, 'status' and 'source'.
+        """
+        return self._fetch_elements(':FETC:ARR?')
+
+    def _check_fetch_elements(self):
+        """Send the fetch elements if they are unknown (new instance, `invalidate`) or miss the mode."""
+        if self.fetch_elements is None or self.params['mode'] not in self.fetch_elements:
+            self.set_fetch_elements(self.fetch_status, self.fetch_source)
+
+    def _fetch_elements(self, message):
+        """Query the interleaved elements of `set_fetch_elements` as a record array."""
+        self._check_fetch_elements()
+        self.set_data_format(self.data_format)
+
+        if self.data_format == 'ASC':
+            values = self.read_ascii_data(message)
+        else:
+            values = self.read_binary_data(message)
+        dtype = np.dtype([(FETCH_ELEMENTS[e], values.dtype) for e in self.fetch_elements])
+        return values.view(dtype).view(np.recarray)
+
+    def start_stream(self, nsamples, time_offset=0.0):
+        """
+        Start an acquisition stored in the trace buffer, to be read while it runs with `read_stream`.
+
+        Args:
+            nsamples (int): Number of samples, at most TRACE_POINTS.
+            time_offset (float): Added to the time stamps of the samples, in seconds.
+        """
+        nsamples = int(nsamples)
+        if nsamples > TRACE_POINTS:
+            raise ValueError(f"At most {TRACE_POINTS} samples fit in the trace buffer.")
+        self.set_nsamples(nsamples)
+        self._check_fetch_elements()
+        self.write(f':TRAC:FEED:CONT NEV;:TRAC:CLE;:TRAC:FEED SENS;:TRAC:POIN {nsamples};:TRAC:FEED:CONT NEXT')
+        self.stream_nsamples = nsamples
+        self.stream_read = 0
+        self.stream_time_offset = time_offset
+        self.start_acquisition()
+
+    def read_stream(self):
+        """
+        Fetch the samples stored in the trace buffer since the last call.
+
+        Returns:
+            np.recarray: The new samples (possibly none), with the fields of `fetch_array`.
+        """
+        available = int(self.query(':TRAC:POIN:ACT?'))
+        if available <= self.stream_read:
+            return self._fetch_elements_empty()
+        chunk = self._fetch_elements(f':TRAC:DATA? {self.stream_read},{available - self.stream_read}')
+        self.stream_read = available
+        if self.stream_time_offset:
+            chunk = chunk.copy()
+            chunk['time'] += self.stream_time_offset
+        self.stream_stats.update(chunk[self.params['mode']])
+        return chunk
+
+    def _fetch_elements_empty(self):
+        self._check_fetch_elements()
+        value_dtype = np.float32 if self.data_format == 'REAL,32' else np.float64
+        return np.recarray(0, dtype=[(FETCH_ELEMENTS[e], value_dtype) for e in self.fetch_elements])
+
+    def is_stream_complete(self):
+        """Check if all the samples of the current stream segment were read."""
+        return self.stream_read >= self.stream_nsamples
+
+    def begin_stream(self, nsamples=None):
+        """
+        Start a stream of `nsamples`, read with `stream_step` until `is_stream_finished`.
+
+        Streams longer than the trace buffer are acquired in consecutive segments.
+
+        Args:
+            nsamples (int): Number of samples. Defaults to the configured number of samples.
+        """
+        self.stream_total = int(self.params['nsamples'] if nsamples is None else nsamples)
+        self.stream_done = 0
+        self.stream_nsamples_setting = self.params['nsamples']
+        self.stream_t0 = time.time()
+        self.stream_stats = RunningStats()
+        if self.stream_total > 0:
+            self.start_stream(min(self.stream_total, TRACE_POINTS))
+
+    def stream_step(self):
+        """
+        Read the new samples of the stream, and start the next segment once the current one is read.
+
+        Returns:
+            np.recarray: The new samples (possibly none), with the fields of `fetch_array`.
+        """
+        chunk = self.read_stream()
+        if self.is_stream_complete():
+            self.stream_done += self.stream_nsamples
+            if not self.is_stream_finished():
+                self.start_stream(min(self.stream_total - self.stream_done, TRACE_POINTS),
+                                  time_offset=time.time() - self.stream_t0)
+        return chunk
+
+    def is_stream_finished(self):
+        """Check if all the samples of the stream were read."""
+        return self.stream_done >= self.stream_total
+
+    def end_stream(self):
+        """Stop filling the trace buffer and restore the configured number of samples.
+
+        A stream left before its last sample (the consumer stopped early, or a read
+        failed) is aborted, the instrument ignores `:INIT:ACQ` while acquiring.
+        """
+        if not self.is_stream_finished():
+            self.write(':ABOR:ACQ')
+        self.write(':TRAC:FEED:CONT NEV')
+        self.set_nsamples(self.stream_nsamples_setting)
+
+    def stream(self, nsamples=None, chunk_interval=1.0):
+        """
+        Acquire `nsamples` and yield the new samples every `chunk_interval` seconds.
+
+        Only one chunk is held in memory; the running mean and standard deviation of the
+        whole stream are kept in `self.stream_stats`. Streams longer than the trace buffer
+        are acquired in consecutive segments, with a short re-arm gap between them.
+
+        Args:
+            nsamples (int): Number of samples. Defaults to the configured number of samples.
+            chunk_interval (float): Time between two reads of the trace buffer in seconds.
+
+        Yields:
+            np.recarray: The new samples, with the fields of `fetch_array`.
+        """
+        self.begin_stream(nsamples)
+        try:
+            while not self.is_stream_finished():
+                time.sleep(chunk_interval)
+                chunk = self.stream_step()
+                if len(chunk):
+                    yield chunk
+        finally:
+            self.end_stream()
 
-    def read_data(self):
+    def read_data(self, combined=True):
         """
-        Reads the acquired data in ASCII format.
+        Reads the acquired data in the format set by `set_data_format` (binary by default).
+
+        Args:
+            combined (bool): Fetch time and data in one query with `fetch_array`. If False,
+                fetch the time and data arrays separately.
 
         Returns:
             np.recarray: A record array containing time and measurement data.
         """
+        if combined:
+            return self.fetch_array()
+
         # print('Reading the data')
         # self._config()
 
-        # check if the acquisition is complete and wait if necessary
-        opc = int(self.query('*OPC?'))
-        # if opc == 1:  # Check if bit 0 (OPC) is set
-        #     # print('Acquisition complete')
-        #     pass
-
+        # the acquisition is complete, see wait_complete()
         # read the data
-        t = self.client.query_ascii_values(':FETC:ARR:TIME?')
-        t = np.array(t, dtype=float)
-        d = self.client.query_ascii_values(f':FETC:ARR:{self.params["mode"]}?')
-        d = np.array(d, dtype=float)
+        self.set_data_format(self.data_format)
+        read_array = self.read_ascii_data if self.data_format == 'ASC' else self.read_binary_data
+        t = read_array(':FETC:ARR:TIME?')
+        d = read_array(f':FETC:ARR:{self.params["mode"]}?')
         return np.rec.fromarrays([t, d], names=['time', self.params["mode"]])
 
     def reset(self):
@@ -284,8 +747,12 @@ class Keysight():
         """
         if mode not in ['CURR', 'CHAR', 'VOLT', 'RES']:
             raise ValueError("Invalid mode. Choose from 'CURR', 'CHAR', 'VOLT', 'RES'.")
-        self.params["mode"] = mode
+        if self._is_cached('mode', mode):
+            return
         self.write(f'SENSe:FUNCtion:ON "{mode}"')
+        self._cache('mode', mode)
+        # range and integration time are settings of each function
+        self.invalidate('rang', 'nplc', 'aper')
 
     def set_rang(self, charge_range):
         """
@@ -297,14 +764,17 @@ class Keysight():
         Args:
             rang (str or float): The range in scientific notation (e.g., 'AUTO, 2e-6).
         """
-        self.params['rang'] = charge_range
-        
+        if charge_range != 'AUTO':
+            charge_range = float(charge_range)
+        if self._is_cached('rang', charge_range):
+            return
+
         if charge_range == 'AUTO' :
             self.write(f'SENS:{self.params["mode"]}:RANG:AUTO ON')
         else :
-            charge_range = float(charge_range)
             self.write(f'SENS:{self.params["mode"]}:RANG:AUTO OFF')
             self.write(f'SENS:{self.params["mode"]}:RANG {charge_range}')
+        self._cache('rang', charge_range)
     
     def set_nplc(self, nplc):
         """
@@ -313,12 +783,17 @@ class Keysight():
         Args:
             nplc (float): NPLC value, where lower values mean faster measurements with potentially higher noise.
         """
-        self.params['nplc'] = nplc
+        if nplc != 'AUTO':
+            nplc = float(nplc)
+        if self._is_cached('nplc', nplc):
+            return
         if nplc == 'AUTO' :
             self.write(f':SENS:{self.params["mode"]}:NPLC:AUTO ON')
         else:
             self.write(f':SENS:{self.params["mode"]}:NPLC:AUTO OFF')
             self.write(f':SENS:{self.params["mode"]}:NPLC {nplc}')
+        self._cache('nplc', nplc)
+        self.invalidate('aper')
     
     def set_nsamples(self, nsamples=5500):
         """
@@ -328,9 +803,10 @@ class Keysight():
             nsamples (int): Number of samples.
         """
         nsamples = int(nsamples)
-        self.params['nsamples'] = nsamples
+        if self._is_cached('nsamples', nsamples):
+            return
         self.write(f':TRIG:ACQ:COUN {nsamples}')
-        self.params['nsamples'] = nsamples
+        self._cache('nsamples', nsamples)
     
     def set_delay(self, delay):
         """
@@ -340,51 +816,76 @@ class Keysight():
             delay (float): Delay time in seconds.
         """
         delay_time = float(delay)
+        # the timer trigger source is set along with the delay
+        if self._is_cached('delay', delay_time) and self._is_cached('trig_source', 'TIM'):
+            return
         self.write(f':TRIG:ACQ:DEL {str(delay_time)}')
         self.write(f':TRIG:SOUR TIM')
-        self.params['delay'] = delay
+        self._cache('delay', delay_time)
+        self._cache('trig_source', 'TIM')
     
     def set_interval(self, interval):
         """
         Set the time interval between consecutive samples.
         
         Args:
-            interval (float): Interval time in seconds (e.g., 2e-3 for 2 milliseconds).
+            interval (float or str): Interval time in seconds (e.g., 2e-3 for 2 milliseconds),
+                or 'MIN', 'MAX' or 'DEF' for the limits of the instrument, read back as a float.
         """
+        if interval in ('MIN', 'MAX', 'DEF'):
+            self.write(f':TRIG:ACQ:TIM {interval}')
+            self.invalidate('interval')
+            self.get_interval()
+            return
         interval = float(interval)
+        if self._is_cached('interval', interval):
+            return
         self.write(f':TRIG:ACQ:TIM {interval}')
-        self.params['interval'] = interval
+        self._cache('interval', interval)
 
-    def get_params(self):
+    def get_params(self, refresh=False):
         """
         Get the current state parameters by calling each get function and storing the output in a dictionary.
 
+        Only the parameters not cached are queried, see `invalidate`.
+
+        Args:
+            refresh (bool): Query all the parameters from the instrument.
+
         Returns:
             dict: A dictionary containing the current state parameters.
         """
-        self.params = {
+        if refresh:
+            self.invalidate()
+        params = {
             'power': self.get_power(),
             "mode": self.get_mode(),
             'aper': self.get_aper(),
-            'nplc': float(self.get_nplc()),
+            'nplc': self.get_nplc(),
             'rang': self.get_rang(),
             'delay': self.get_delay(),
             'interval': self.get_interval(),
-            'nsamples': int(self.get_nsamples())
+            'nsamples': self.get_nsamples()
         }
         print('\nCurrent instrument parameters:')
-        for param, value in self.params.items():
+        for param, value in params.items():
             print(f"{param}: {value}")
         print("")
+        return params
 
-    def set_acquisition_time(self, time, freq=50):
+    def set_acquisition_time(self, time, freq=None):
         """
         Set the acquisition time for the measurement.
         
         Args:
             time (float): Acquisition time in seconds.
+            freq (float): Power line frequency in Hz. Defaults to the instrument setting.
         """
-        nsamples = int(time * freq / float(self.params['nplc']))
+        if freq is None:
+            if self.line_frequency is None:
+                self.line_frequency = self.get_powerline_freq()
+            freq = self.line_frequency
+        nsamples = int(time * freq / self.current_nplc())
         self.set_nsamples(nsamples)
         print(f"Acquisition time set to {time:0.3f} sec with nsamples {self.params['nsamples']} and {self.params['nplc']}")
 
@@ -393,9 +894,9 @@ class Keysight():
         Get the power reading from the instrument.
 
         Returns:
-            str: The power reading.
+            int: The input state (1 for ON).
         """
-        return int(self.query(':INP?'))
+        return self._cached_query('power', ':INP?', int)
 
     def get_mode(self):
         """
@@ -404,52 +905,72 @@ class Keysight():
         Returns:
             str: The current mode.
         """
-        return self.query(f'SENS:FUNC?')
+        return self._cached_query('mode', 'SENS:FUNC?')
 
     def get_aper(self):
         """
         Get the aperture setting of the instrument.
 
         Returns:
-            str: The aperture setting.
+            float: The aperture setting.
         """
-        return self.query(f'SENS:{self.params["mode"]}:APER?')
+        return self._cached_query('aper', f'SENS:{self.get_mode()}:APER?', float)
 
     def get_nplc(self):
         """
         Get the number of power line cycles (NPLC) setting.
 
         Returns:
-            str: The NPLC setting.
+            float or str: The NPLC setting.
         """
-        return self.query(f'SENS:{self.params["mode"]}:NPLC?')
+        return self._cached_query('nplc', f'SENS:{self.get_mode()}:NPLC?', float)
+
+    def current_nplc(self):
+        """
+        Get the NPLC in use, queried from the instrument when it is set to 'AUTO'.
+
+        Returns:
+            float: The NPLC of the measurements.
+        """
+        if self.params['nplc'] == 'AUTO':
+            # the integration time chosen by the instrument
+            return float(self.query(f':SENS:{self.params["mode"]}:NPLC?'))
+        return float(self.params['nplc'])
 
     def get_rang(self):
         """
         Get the range setting of the instrument.
 
+        Auto range is reported by `RANG:AUTO?`, `RANG?` only gives the range in use.
+
         Returns:
-            str: The range setting.
+            float or str: The range setting, 'AUTO' if set to auto range.
         """
-        return self.query(f'SENS:{self.params["mode"]}:RANG?')
+        if 'rang' not in self._cached:
+            mode = self.get_mode()
+            if int(self.query(f'SENS:{mode}:RANG:AUTO?')):
+                self._cache('rang', 'AUTO')
+            else:
+                self._cache('rang', float(self.query(f'SENS:{mode}:RANG?')))
+        return self.params['rang']
 
     def get_delay(self):
         """
         Get the delay setting of the instrument.
 
         Returns:
-            str: The delay setting.
+            float: The delay setting.
         """
-        return self.query(f'TRIG:ACQ:DEL?')
+        return self._cached_query('delay', 'TRIG:ACQ:DEL?', float)
 
     def get_interval(self):
         """
         Get the interval setting between consecutive samples.
 
         Returns:
-            str: The interval setting.
+            float: The interval setting.
         """
-        return self.query(':TRIG:ACQ:TIM?')
+        return self._cached_query('interval', ':TRIG:ACQ:TIM?', float)
 
     def get_nsamples(self):
         """
@@ -458,7 +979,7 @@ class Keysight():
         Returns:
             int: The number of samples.
         """
-        return int(self.query(':TRIG:ACQ:COUN?'))
+        return self._cached_query('nsamples', ':TRIG:ACQ:COUN?', lambda v: int(float(v)))
     
     def get_powerline_freq(self):
         """
@@ -496,26 +1017,23 @@ class Keysight():
             value = self.params.get(param)
             print(f"{param}: {value}\n    {explanation}\n")
     
-    def auto_scale(self, verbose=False, rang0=20e-6):
-        rang = rang0 # 20 microA
-        for i in range(9):
-            self.set_rang(rang)
-            self.start_measurement()
-            value = np.mean(self.datavector[self.params['mode']])
-            if verbose: print(f"Range: {rang:e}, Value: {value:.2e}")
-
-            if np.log10(np.abs(value))>15:
-                # print("")
-                # print(f"Optimal range is {rang*10:e}")
-                self.set_rang(rang*100)
-                break
-            else:
-                rang /= 10
-            
-            if rang < 1e-15:
-                print("Range is beyond the limit")
-                break
-    
+    def auto_scale(self, verbose=False, position=None):
+        """
+        Find the smallest range holding the signal with short probe acquisitions and set it.
+
+        The ranges found are remembered per position to start the next search, see `AutoRanger`.
+
+        Args:
+            verbose (bool): Print each probe.
+            position (hashable): Key of the sky position, e.g. rounded (alt, az).
+
+        Returns:
+            float: The range set on the instrument.
+        """
+        if self.autoranger is None:
+            self.autoranger = AutoRanger(self)
+        return self.autoranger.find_range(position=position, verbose=verbose)
+
     def start_measurement(self):
         """
         Start electrometer measurements.
@@ -527,7 +1045,18 @@ class Keysight():
         self.acquire()
         # wait for acquisition completion
         d = self.read_data()
+        return self.summarize(d)
 
+    def summarize(self, d):
+        """
+        Keep the data of a measurement and compute its summary statistics.
+
+        Args:
+            d (np.recarray): The data returned by `read_data`.
+
+        Returns:
+            dict: A dictionary containing the electrometer data.
+        """
         self.datavector = d
         # save the data
         self.keysight_data = {}
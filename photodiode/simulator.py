@@ -0,0 +1,441 @@
+"""Simulated Keysight Electrometer (B2983B)
+
+SimulatedB2983B stands in for the pyvisa resource opened by `Keysight._config`,
+so the acquisition path can be run and profiled without the instrument:
+
+>> from photodiode import Keysight
+>> from photodiode.simulator import SimulatedB2983B
+>> k = Keysight(client=SimulatedB2983B())
+
+It answers the SCPI subset used by `Keysight` (input, function, range, NPLC,
+aperture, trigger count/timer/delay, `:INIT:ACQ`, `:ABOR:ACQ`, `:FETC:ARR...?`,
+the trace buffer, `*OPC?`, the status registers, `SYST:ERR?` and `:FORM:DATA ASC|REAL,32|REAL,64`) and
+returns a synthetic twilight photocurrent. Timing follows the instrument: the
+acquisition lasts `count` samples of `max(interval, aperture)` seconds with
+aperture = NPLC / line frequency, and every transfer costs `io_time` plus
+the message size over `transfer_rate`.
+"""
+import struct
+import time
+from collections import deque
+
+import numpy as np
+
+from .autorange import OVERFLOW, RANGES
+
+# trigger timer period of the B2983B, sec
+INTERVAL_LIMITS = (1e-5, 1e5)
+
+# output order of the `:FORM:ELEM:SENS` elements
+ELEMENTS = ['CHAR', 'CURR', 'VOLT', 'RES', 'TIME', 'STAT', 'SOUR']
+
+
+def twilight_current(t, current0=1e-9, t0=None, decade_time=900.0):
+    """Photocurrent in A falling one decade every `decade_time` seconds after t0."""
+    t0 = time.time() if t0 is None else t0
+    return current0 * 10**(-(np.asarray(t) - t0) / decade_time)
+
+
+def short_form(header):
+    """Short form of a SCPI header, e.g. 'SENSe:FUNCtion:ON' -> 'SENS:FUNC:ON'."""
+    nodes = []
+    for node in header.upper().split(':'):
+        if len(node) > 4 and not node[-1].isdigit():
+            # 4 characters, or 3 when the 4th is a vowel
+            node = node[:3] if node[3] in 'AEIOU' else node[:4]
+        nodes.append(node)
+    return ':'.join(nodes)
+
+
+class SimulatedB2983B:
+    """A fake pyvisa resource answering as the Keysight B2983B.
+
+    Args:
+        signal (callable, optional): photocurrent in A as a function of the host
+            unix time of each sample. Defaults to a twilight decay from now.
+        noise (float, optional): current noise in A for an integration of 1 PLC,
+            it scales as 1/sqrt(NPLC). Defaults to 1e-13.
+        line_frequency (float, optional): power line frequency in Hz. Defaults to 50.
+        io_time (float, optional): overhead of each transfer in seconds.
+        transfer_rate (float, optional): bytes per second of the USB link.
+        seed (int, optional): seed of the noise generator.
+    """
+    def __init__(self, signal=None, noise=1e-13, line_frequency=50, io_time=0.5e-3,
+                 transfer_rate=1e6, seed=None):
+        t0 = time.time()
+        self.signal = signal if signal is not None else (lambda t: twilight_current(t, t0=t0))
+        self.noise = noise
+        self.line_frequency = line_frequency
+        self.io_time = io_time
+        self.transfer_rate = transfer_rate
+        self.rng = np.random.default_rng(seed)
+        self.timeout = 2000 # ms, as pyvisa
+        self.output = deque()
+        self.reset_state()
+
+    def reset_state(self):
+        """State after *RST."""
+        self.input_on = False
+        self.function = 'CURR'
+        self.range = {m: r[-1] for m, r in RANGES.items()}
+        self.range_auto = {m: True for m in RANGES}
+        self.nplc = {m: 1.0 for m in RANGES}
+        self.count = 1
+        self.interval = 0.1
+        self.delay = 0.0
+        self.trigger_source = 'AINT'
+        self.data_format = 'ASC'
+        self.byte_order = 'NORM'
+        self.elements = ['CURR']
+        self.acquisition = None
+        self.charge = 0.0
+        self.trace_points = 100000
+        self.trace_feed = 'SENS'
+        self.trace_control = 'NEV'
+        self.trace = None # acquisition stored in the trace buffer
+        self.errors = deque()
+        self.esr = 0
+        self.ese = 0
+        self.sre = 0
+        self.opc_pending = False
+
+    # ---- pyvisa resource API
+    def write(self, message):
+        self._transfer(len(message))
+        for command in message.strip().split(';'):
+            if command.strip():
+                self._execute(command.strip())
+        return len(message)
+
+    def read_raw(self):
+        if not self.output:
+            raise TimeoutError("VI_ERROR_TMO: no response queued")
+        data = self.output.popleft()
+        self._transfer(len(data))
+        return data
+
+    def read(self):
+        return self.read_raw().decode('ascii')
+
+    def query(self, message):
+        self.write(message)
+        return self.read()
+
+    def query_ascii_values(self, message, converter='f', separator=',', container=list, delay=None):
+        values = self.query(message).strip().split(separator)
+        cast = float if converter == 'f' else int
+        return container([cast(v) for v in values])
+
+    def query_binary_values(self, message, datatype='f', is_big_endian=False, container=list,
+                            delay=None, header_fmt='ieee', expect_termination=True):
+        self.write(message)
+        block = self.read_raw()
+        ndigits = int(block[1:2])
+        length = int(block[2:2 + ndigits])
+        data = block[2 + ndigits:2 + ndigits + length]
+        n = length // struct.calcsize(datatype)
+        order = '>' if is_big_endian else '<'
+        if container in (np.array, np.ndarray):
+            return np.frombuffer(data, order + datatype, n)
+        return container(struct.unpack(f"{order}{n}{datatype}", data))
+
+    def read_stb(self):
+        self._transfer(1)
+        return self._status_byte()
+
+    def close(self):
+        pass
+
+    # ---- instrument model
+    def _transfer(self, nbytes):
+        time.sleep(self.io_time + nbytes / self.transfer_rate)
+
+    def _respond(self, value):
+        if isinstance(value, bytes):
+            self.output.append(value)
+        else:
+            self.output.append(f"{value}\n".encode('ascii'))
+
+    def _error(self, code, message):
+        self.errors.append(f'{code:+d},"{message}"')
+        self.esr |= 32 # command error
+
+    def aperture(self, mode=None):
+        return self.nplc[mode or self.function] / self.line_frequency
+
+    def sample_interval(self):
+        return max(self.interval, self.aperture())
+
+    def _acquisition_end(self):
+        return self.acquisition['end']
+
+    def is_acquiring(self):
+        return self.acquisition is not None and time.monotonic() < self._acquisition_end()
+
+    def _wait_acquisition(self):
+        if self.acquisition is not None:
+            time.sleep(max(0.0, self._acquisition_end() - time.monotonic()))
+
+    def _status_byte(self):
+        if self.opc_pending and not self.is_acquiring():
+            self.opc_pending = False
+            self.esr |= 1 # operation complete
+        stb = 0
+        if self.errors:
+            stb |= 4
+        if self.esr & self.ese:
+            stb |= 32
+        if stb & self.sre:
+            stb |= 64
+        return stb
+
+    def _initiate(self):
+        start = time.monotonic()
+        n = self.count
+        t = self.delay + np.arange(n) * self.sample_interval()
+        host_t = time.time() + t
+        mode = self.function
+        current = self.signal(host_t) + self.rng.normal(0, self.noise / np.sqrt(self.nplc[mode]), n)
+        status = np.zeros(n)
+        if mode == 'CHAR':
+            value = self.charge + np.cumsum(current * self.sample_interval())
+            self.charge = value[-1]
+        elif mode == 'CURR':
+            value = current
+        else:
+            value = np.zeros(n)
+        rang = self.range[mode]
+        if self.range_auto[mode]:
+            fits = [r for r in RANGES[mode] if r >= np.max(np.abs(value))]
+            rang = fits[0] if fits else RANGES[mode][-1]
+        overflow = np.abs(value) > 1.05 * rang
+        value = np.where(overflow, OVERFLOW, value)
+        status[overflow] = 8 # range overflow bit
+        if not self.input_on:
+            value = np.zeros(n)
+        end = start + t[-1] + self.aperture()
+        self.acquisition = {'start': start, 'end': end, 'TIME': t, mode: value, 'STAT': status,
+                            'SOUR': np.zeros(n)}
+        if self.trace_control == 'NEXT':
+            # the buffer fills once, then the feed control returns to NEVer
+            self.trace = self.acquisition
+            self.trace['points'] = min(n, self.trace_points)
+            self.trace_control = 'NEV'
+
+    def trace_actual_points(self):
+        """Number of samples stored in the trace buffer by now."""
+        if self.trace is None:
+            return 0
+        ends = self.trace['start'] + self.trace['TIME'][:self.trace['points']] + self.aperture()
+        return int(np.searchsorted(ends, time.monotonic(), side='right'))
+
+    def _fetch(self, elements, index=None, acquisition=None, wait=True):
+        if wait:
+            self._wait_acquisition()
+        acquisition = self.acquisition if acquisition is None else acquisition
+        if acquisition is None:
+            self._error(-230, "Data corrupt or stale")
+            return self._respond('')
+        index = slice(None) if index is None else index
+        n = len(acquisition['TIME'])
+        columns = [acquisition.get(e, np.zeros(n))[index] for e in elements]
+        values = np.column_stack(columns).ravel()
+        if self.data_format == 'ASC':
+            return self._respond(','.join(f'{v:+.6E}' for v in values))
+        order = '>' if self.byte_order == 'NORM' else '<'
+        dtype = f"{order}{'f4' if self.data_format == 'REAL,32' else 'f8'}"
+        data = values.astype(dtype).tobytes()
+        header = f"#{len(str(len(data)))}{len(data)}".encode('ascii')
+        self._respond(header + data + b'\n')
+
+    def _execute(self, command):
+        header, _, args = command.partition(' ')
+        query = header.endswith('?')
+        header = short_form(header.rstrip('?').lstrip(':'))
+        args = args.strip().strip('"')
+        nodes = header.split(':')
+
+        # ---- common commands
+        if header == '*IDN':
+            return self._respond('Keysight Technologies,B2983B,MY00000000,SIMULATED')
+        if header == '*RST':
+            return self.reset_state()
+        if header == '*CLS':
+            self.errors.clear()
+            self.esr = 0
+            self.opc_pending = False
+            return
+        if header == '*OPC':
+            if query:
+                self._wait_acquisition()
+                return self._respond(1)
+            self.opc_pending = True
+            self._status_byte()
+            return
+        if header == '*ESE':
+            if query:
+                return self._respond(self.ese)
+            self.ese = int(args)
+            return
+        if header == '*SRE':
+            if query:
+                return self._respond(self.sre)
+            self.sre = int(args)
+            return
+        if header == '*ESR':
+            self._status_byte()
+            esr, self.esr = self.esr, 0
+            return self._respond(esr)
+        if header == '*STB':
+            return self._respond(self._status_byte())
+        if header == 'SYST:ERR':
+            return self._respond(self.errors.popleft() if self.errors else '+0,"No error"')
+        if header == 'SYST:POWE:FREQ':
+            return self._respond(self.line_frequency)
+
+        # ---- input and measurement function
+        if header == 'INP':
+            if query:
+                return self._respond(int(self.input_on))
+            self.input_on = args.upper() in ['ON', '1']
+            return
+        if header in ['SENS:FUNC', 'SENS:FUNC:ON']:
+            if query:
+                return self._respond(f'"{self.function}"')
+            self.function = args.upper()
+            return
+        if nodes[0] == 'SENS' and len(nodes) >= 3 and nodes[1] in RANGES:
+            mode, setting = nodes[1], ':'.join(nodes[2:])
+            if setting == 'RANG:AUTO':
+                if query:
+                    return self._respond(int(self.range_auto[mode]))
+                self.range_auto[mode] = args.upper() in ['ON', '1']
+                return
+            if setting == 'RANG':
+                if query:
+                    return self._respond(self.range[mode])
+                fits = [r for r in RANGES[mode] if r >= float(args)]
+                self.range[mode] = fits[0] if fits else RANGES[mode][-1]
+                self.range_auto[mode] = False
+                return
+            if setting == 'NPLC':
+                if query:
+                    return self._respond(self.nplc[mode])
+                self.nplc[mode] = float(args)
+                return
+            if setting == 'NPLC:AUTO':
+                if not query and args.upper() in ['ON', '1']:
+                    self.nplc[mode] = 1.0
+                return
+            if setting == 'APER':
+                if query:
+                    return self._respond(self.aperture(mode))
+                self.nplc[mode] = float(args) * self.line_frequency
+                return
+            if setting == 'DISC':
+                self.charge = 0.0
+                return
+
+        # ---- trigger
+        if header == 'TRIG:ACQ:COUN':
+            if query:
+                return self._respond(self.count)
+            self.count = int(float(args))
+            return
+        if header == 'TRIG:ACQ:TIM':
+            if query:
+                return self._respond(self.interval)
+            limits = {'MIN': INTERVAL_LIMITS[0], 'MAX': INTERVAL_LIMITS[1], 'DEF': 0.1}
+            key = args.upper()[:3]
+            interval = limits[key] if key in limits else float(args)
+            if not INTERVAL_LIMITS[0] <= interval <= INTERVAL_LIMITS[1]:
+                return self._error(-222, "Data out of range")
+            self.interval = interval
+            return
+        if header == 'TRIG:ACQ:DEL':
+            if query:
+                return self._respond(self.delay)
+            self.delay = float(args)
+            return
+        if header in ['TRIG:SOUR', 'TRIG:ACQ:SOUR']:
+            if query:
+                return self._respond(self.trigger_source)
+            self.trigger_source = args.upper()
+            return
+        if header.startswith('TRIG:ACQ:TOUT'):
+            return
+        if header in ['INIT:ACQ', 'INIT']:
+            if self.is_acquiring():
+                return self._error(-213, "Init ignored")
+            return self._initiate()
+        if header in ['ABOR:ACQ', 'ABOR']:
+            if self.is_acquiring():
+                # the samples not taken yet are dropped
+                now = time.monotonic()
+                self.acquisition['end'] = now
+                taken = self.acquisition['start'] + self.acquisition['TIME'] + self.aperture() <= now
+                for key in ['TIME', 'CHAR', 'CURR', 'VOLT', 'RES', 'STAT', 'SOUR']:
+                    if key in self.acquisition:
+                        self.acquisition[key] = self.acquisition[key][taken]
+                if self.trace is self.acquisition:
+                    self.trace['points'] = min(self.trace['points'], int(taken.sum()))
+            return
+
+        # ---- data
+        if header == 'FORM:DATA':
+            if query:
+                return self._respond(self.data_format)
+            fmt = args.upper().replace(' ', '')
+            self.data_format = {'ASCII': 'ASC', 'REAL': 'REAL,32'}.get(fmt, fmt)
+            return
+        if header == 'FORM:BORD':
+            if query:
+                return self._respond(self.byte_order)
+            self.byte_order = args.upper()[:4]
+            return
+        if header == 'FORM:ELEM:SENS':
+            if query:
+                return self._respond(','.join(self.elements))
+            requested = [short_form(e.strip()) for e in args.split(',')]
+            self.elements = [e for e in ELEMENTS if e in requested]
+            return
+        if header == 'FETC:ARR':
+            return self._fetch(self.elements)
+        if header.startswith('FETC:ARR:'):
+            return self._fetch([nodes[2]])
+
+        # ---- trace buffer
+        if header == 'TRAC:CLE':
+            self.trace = None
+            return
+        if header == 'TRAC:FEED':
+            if query:
+                return self._respond(self.trace_feed)
+            self.trace_feed = short_form(args)
+            return
+        if header == 'TRAC:FEED:CONT':
+            if query:
+                return self._respond(self.trace_control)
+            self.trace_control = short_form(args)
+            return
+        if header == 'TRAC:POIN':
+            if query:
+                return self._respond(self.trace_points)
+            self.trace_points = int(float(args))
+            return
+        if header == 'TRAC:POIN:ACT':
+            return self._respond(self.trace_actual_points())
+        if header == 'TRAC:DATA':
+            actual = self.trace_actual_points()
+            offset, size = ([int(a) for a in args.split(',')] + [None, None])[:2]
+            offset = offset or 0
+            stop = actual if size is None else min(actual, offset + size)
+            # reading past the stored samples is an error on the instrument
+            if self.trace is None or offset > actual:
+                self._error(-222, "Data out of range")
+                return self._respond('')
+            return self._fetch(self.elements, slice(offset, stop), self.trace, wait=False)
+
+        self._error(-113, "Undefined header")
+        if query:
+            self._respond('')
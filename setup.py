@@ -11,6 +11,9 @@ setup(
         'pyserial',
         'pylint'
     ],
+    extras_require={
+        'archive': ['pyarrow'],  # twmdb.archive
+    },
     author="Johnny H. Esteves",
     author_email="jesteves@g.harvard.edu",
     description="A package to control the iOptron SkyHunter mount.",
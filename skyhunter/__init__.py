@@ -1,9 +1,28 @@
 # Import specific classes or functions from each module
 from .ioptron import IoptronMount
 from .usb_serial import USBSerial
+from .command_queue import CommandQueue
+
+# Loaded on first access (PEP 562), asyncio is slow to import
+_lazy_exports = {
+    'AsyncIoptronMount': '.async_ioptron',
+}
+
+def __getattr__(name):
+    if name in _lazy_exports:
+        import importlib
+        value = getattr(importlib.import_module(_lazy_exports[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_exports))
 
 # You can also define an __all__ list to control what's exported
 __all__ = [
     'IoptronMount',
     'USBSerial',
-]
\ No newline at end of file
+    'CommandQueue',
+    'AsyncIoptronMount',
+]
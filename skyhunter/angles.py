@@ -0,0 +1,62 @@
+"""
+Angle arithmetic for the mount control loop.
+
+Plain NumPy functions on angles in degrees, accepting scalars or arrays
+(broadcast as usual). They replace the astropy `SkyCoord` objects built for
+each difference in the pointing loop: a scalar call costs a few microseconds
+instead of milliseconds, see tests/angles_test.py.
+
+Example:
+    from skyhunter import angles
+
+    angles.azimuth_difference(350, 10)       # -20.0
+    angles.separation(30, 0, 30, 90)         # 64.34 deg on the sky
+"""
+import numpy as np
+
+
+def _result(value):
+    """Return a Python float for scalar inputs, the array otherwise."""
+    return value if np.ndim(value) else float(value)
+
+
+def wrap_360(angle):
+    """Wrap an angle to [0, 360) degrees."""
+    return _result(np.mod(angle, 360.0))
+
+
+def wrap_180(angle):
+    """Wrap an angle to [-180, 180) degrees."""
+    return _result(np.mod(np.add(angle, 180.0), 360.0) - 180.0)
+
+
+def angle_difference(angle1_deg, angle2_deg):
+    """Signed difference angle1 - angle2 along the shortest way, in [-180, 180) degrees."""
+    return wrap_180(np.subtract(angle1_deg, angle2_deg))
+
+
+def azimuth_difference(azimuth1_deg, azimuth2_deg):
+    """Signed azimuth difference azimuth1 - azimuth2, in [-180, 180) degrees."""
+    return angle_difference(azimuth1_deg, azimuth2_deg)
+
+
+def elevation_difference(elevation1_deg, elevation2_deg):
+    """Signed elevation difference elevation1 - elevation2 in degrees (no wrapping)."""
+    return _result(np.subtract(elevation1_deg, elevation2_deg, dtype=float))
+
+
+def separation(alt1_deg, az1_deg, alt2_deg, az2_deg):
+    """Great-circle separation between two alt/az positions in degrees.
+
+    Uses the Vincenty formula, accurate for small and antipodal separations.
+    """
+    alt1, az1, alt2, az2 = (np.radians(a) for a in (alt1_deg, az1_deg, alt2_deg, az2_deg))
+    daz = az2 - az1
+    sin_daz, cos_daz = np.sin(daz), np.cos(daz)
+    sin1, cos1 = np.sin(alt1), np.cos(alt1)
+    sin2, cos2 = np.sin(alt2), np.cos(alt2)
+
+    num1 = cos2 * sin_daz
+    num2 = cos1 * sin2 - sin1 * cos2 * cos_daz
+    denominator = sin1 * sin2 + cos1 * cos2 * cos_daz
+    return _result(np.degrees(np.arctan2(np.hypot(num1, num2), denominator)))
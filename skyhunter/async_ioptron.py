@@ -0,0 +1,119 @@
+"""
+asyncio client for the iOptron mount.
+
+The serial protocol is blocking, so AsyncIoptronMount runs every command of
+the wrapped IoptronMount on a dedicated I/O thread and awaits its future. The
+event loop stays free while the mount answers, so telemetry, slews and the
+electrometer acquisition can overlap on one loop.
+
+Example:
+    async with AsyncIoptronMount(port='/dev/ttyUSB0') as mount:
+        alt, az = await mount.get_current_alt_az()
+        await mount.slew('up', 2.0)
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .ioptron import IoptronMount
+
+
+class AsyncIoptronMount:
+    """Awaitable version of IoptronMount.
+
+    Attributes not defined here (altitude_deg, system_status, ...) are read
+    from the wrapped mount.
+
+    Args:
+        port (str, optional): serial port of the mount, used when `mount` is None.
+        baudrate (int, optional): baudrate of the serial port. Defaults to 115200.
+        mount (IoptronMount, optional): an already connected mount.
+    """
+    def __init__(self, port=None, baudrate=115200, mount=None):
+        self.mount = mount if mount is not None else IoptronMount(port, baudrate)
+        # a single worker keeps the commands in submission order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ioptron-io')
+
+    def __getattr__(self, name):
+        if name == 'mount':
+            raise AttributeError(name)
+        return getattr(self.mount, name)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stop the I/O thread once the pending commands are done."""
+        self.executor.shutdown(wait=True)
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking mount call on the I/O thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def get_current_alt_az(self, verbose=False):
+        """Get the current altitude and azimuth in degrees."""
+        await self._run(self.mount.get_current_alt_az, verbose=verbose)
+        return self.mount.altitude_deg, self.mount.azimuth_deg
+
+    async def get_system_state(self, verbose=False):
+        """Get the system status of the mount."""
+        await self._run(self.mount.get_system_state, verbose=verbose)
+        return self.mount.system_status
+
+    async def get_position(self, max_age=None):
+        """Get the altitude, azimuth and age of the position, see IoptronMount.get_position()."""
+        return await self._run(self.mount.get_position, max_age)
+
+    async def get_status(self, max_age=None):
+        """Get the system status and its age, see IoptronMount.get_status()."""
+        return await self._run(self.mount.get_status, max_age)
+
+    async def is_slewing(self, max_age=None):
+        """Check if the mount is slewing."""
+        return await self._run(self.mount.is_slewing, max_age)
+
+    async def set_arrow_speed(self, speed):
+        """Set the arrow speed (0 to 9)."""
+        return await self._run(self.mount.set_arrow_speed, speed)
+
+    async def slew_arrow_forever(self, direction):
+        """Start moving in the given direction ('up', 'down', 'left', 'right')."""
+        return await self._run(self.mount.slew_arrow_forever, direction)
+
+    async def stop(self):
+        """Stop all slewing."""
+        return await self._run(self.mount.stop)
+
+    async def stop_updown(self):
+        """Stop the mount from moving up or down."""
+        return await self._run(self.mount.stop_updown)
+
+    async def stop_leftright(self):
+        """Stop the mount from moving left or right."""
+        return await self._run(self.mount.stop_leftright)
+
+    async def slew(self, direction, moving_time=2):
+        """Slew in the given direction for a given time without blocking the loop.
+
+        The awaitable equivalent of slew_up(), slew_down(), slew_left() and slew_right().
+        """
+        await self.slew_arrow_forever(direction)
+        await asyncio.sleep(moving_time - self.mount.slew_pause)
+        if direction.lower() in ['up', 'down']:
+            return await self.stop_updown()
+        return await self.stop_leftright()
+
+    async def continous_altaz_reading(self, timeout, interval=0.1, verbose=False):
+        """Read the altitude and azimuth every `interval` seconds for `timeout` seconds.
+
+        The samples are taken by the telemetry recorder thread, stamped when each
+        reply is received, see IoptronMount.continous_altaz_reading().
+
+        Returns:
+            dict: 'alt' and 'az' in degrees and the receive 'time' of each sample.
+        """
+        return await self.mount.continous_altaz_reading(timeout, interval=interval, verbose=verbose)
@@ -0,0 +1,130 @@
+"""
+Pipelined command queue for the iOptron mount.
+
+Every command of the iOptron RS-232 protocol has a known reply shape: a
+'#'-terminated string (":GAC#", ":GLS#", ...), a fixed-length answer
+(":MountInfo#"), a single '1'/'0' acknowledgement (most set/move commands)
+or nothing at all (the arrow moves ":mn#", ":ms#", ":me#", ":mw#").
+
+Knowing the shape of every reply lets the queue write several commands in a
+single write and split the replies back to their callers in order, e.g.
+
+    replies = queue.pipeline(":SR9#", ":mn#", ":GAC#")
+"""
+import logging
+import threading
+
+# Reply size in bytes per command; None is a '#'-terminated reply and 0 no reply.
+# Commands not listed here answer with a single '1' or '0'.
+REPLY_SIZES = {
+    ':GAC#': None,
+    ':GLS#': None,
+    ':GEP#': None,
+    ':GUT#': None,
+    ':GPC#': None,
+    ':MountInfo#': 4,
+    ':mn#': 0,
+    ':ms#': 0,
+    ':me#': 0,
+    ':mw#': 0,
+}
+DEFAULT_REPLY_SIZE = 1
+
+
+def reply_size(command):
+    """Get the expected reply size of an iOptron command, see REPLY_SIZES."""
+    return REPLY_SIZES.get(command, DEFAULT_REPLY_SIZE)
+
+
+class PendingReply:
+    """Reply of a queued command, filled in when the queue is flushed."""
+    def __init__(self, queue, command, size):
+        self.queue = queue
+        self.command = command
+        self.size = size
+        self.reply = None
+        self.complete = False
+        self.done = threading.Event()
+
+    def set(self, reply):
+        if self.size is None:
+            self.complete = reply.endswith('#')
+        else:
+            self.complete = len(reply) == self.size
+        self.reply = reply
+        self.done.set()
+
+    def result(self):
+        """Get the reply, flushing the queue if the command was not sent yet."""
+        if not self.done.is_set():
+            self.queue.flush()
+        self.done.wait()
+        return self.reply
+
+
+class CommandQueue:
+    """Queue of iOptron commands written in one go and answered in order.
+
+    All access to the serial port goes through the queue lock, so the queue
+    can be shared by several threads (e.g. a telemetry poller and a scheduler).
+    """
+    def __init__(self, scope, timeout=None):
+        self.scope = scope
+        self.timeout = timeout
+        self.lock = threading.RLock()
+        self.pending = []
+
+    def submit(self, command, size=-1):
+        """Queue a command without sending it.
+
+        Args:
+            command (str): the iOptron command, e.g. ':GAC#'
+            size (int, optional): expected reply size, see REPLY_SIZES.
+                Defaults to the size known for the command.
+
+        Returns:
+            PendingReply: call result() to get the reply.
+        """
+        if size == -1:
+            size = reply_size(command)
+        pending = PendingReply(self, command, size)
+        with self.lock:
+            self.pending.append(pending)
+        return pending
+
+    def flush(self):
+        """Write all queued commands at once and read their replies in order."""
+        with self.lock:
+            batch, self.pending = self.pending, []
+            if not batch:
+                return
+            self.scope.write(''.join(p.command for p in batch))
+
+            misaligned = False
+            for p in batch:
+                if misaligned:
+                    # the stream can no longer be split, do not guess
+                    p.set('')
+                    continue
+                p.set(self.scope.read_reply(p.size, self.timeout))
+                if not p.complete:
+                    logging.warning("Incomplete reply to %s, dropping the rest of the batch", p.command)
+                    misaligned = True
+
+    def execute(self, command, size=-1):
+        """Send a single command and return its reply."""
+        with self.lock:
+            pending = self.submit(command, size)
+            self.flush()
+        return pending.reply
+
+    def pipeline(self, *commands):
+        """Send several commands in a single write.
+
+        Returns:
+            list: the replies in the order of the commands.
+        """
+        with self.lock:
+            batch = [self.submit(command) for command in commands]
+            self.flush()
+        return [p.reply for p in batch]
@@ -1,24 +1,30 @@
 import time
 import sys
-import numpy as np
 from dataclasses import dataclass, field
-from astropy.time import Time, TimeDelta
-import astropy.units as u
-
-import asyncio
-import datetime
 
+# numpy, asyncio and astropy are imported where used, so that the
+# stop/park scripts start fast, see tests/import_time_test.py
 
 from .usb_serial import USBSerial
+from .command_queue import CommandQueue
 from . import utils
+from . import parser
 
 # TODO: Add arrows, stop, and fine-tunning method
 
 class IoptronMount:
-    def __init__(self, port, baudrate=115200):
+    def __init__(self, port, baudrate=115200, ser=None):
         # print("Welcome to the iOptron Mount controller.")
-        self.scope = USBSerial(port=port, baud=baudrate, log_level = 'DEBUG')
+        # `ser` replaces the serial port, e.g. by a simulator.SimulatedSerial
+        self.scope = USBSerial(port=port, baud=baudrate, log_level = 'DEBUG', ser=ser)
         self.scope.open()
+        self.commands = CommandQueue(self.scope)
+
+        # Cached position and status, see get_position() and get_status()
+        self.max_age = 0.0 # default tolerance in seconds, 0 always reads the mount
+        self.last_position_update = 0.0
+        self.last_update = 0.0
+        self.telemetry = None
 
         if self.check_connection():
             # print("Connection established.")
@@ -50,6 +56,7 @@ class IoptronMount:
     def __del__(self):
         # Close the serial connection
         try:
+            self.stop_telemetry()
             self.scope.close()
         except:
             print("CLEANUP: not needed or was unclean")
@@ -57,14 +64,11 @@ class IoptronMount:
     def get_system_state(self, verbose=True):
         """Get (a lot) of status from the mount. Get movement
         and tracking information."""
-        self.scope.send(":GLS#")
-        response_data = self.scope.recv()
-        status_code = response_data[18:19]
+        response_data = self.commands.execute(":GLS#")
 
-        # get latitude and longitude
-        pos = utils.parse_alt_az(response_data[:18], is_latlong=True)
-        self.latitude_deg = pos[1]-90
-        self.longitude_deg = pos[0]
+        # get latitude, longitude and the system status digit
+        self.longitude_deg, self.latitude_deg, status = parser.parse_gls(response_data)
+        status_code = status[1]
 
         # get sysetm status
         self.system_status.update_status(status_code)
@@ -79,8 +83,7 @@ class IoptronMount:
         sign = '+' if alt >= 0 else '-'
         alt_str = f"{sign}{int(abs(alt) * 360000):08d}#"  # Convert Az to 0.01 arc-seconds
         command = f":Sa{alt_str}"
-        self.scope.send(command)
-        response = self.scope.recv()
+        response = self.commands.execute(command)
         self.print_received(command, response)
         return response == "1"
 
@@ -89,8 +92,7 @@ class IoptronMount:
         sign = '+' if az >= 0 else '-'
         az_str = f"{int(abs(az) * 360000):09d}#"  # Convert Az to 0.01 arc-seconds
         command = f":SZ{az_str}"
-        self.scope.send(command)
-        response = self.scope.recv()
+        response = self.commands.execute(command)
         self.print_received(command, response)
         return 
 
@@ -110,8 +112,7 @@ class IoptronMount:
             print("Mount is parked. Unparking...")
             self.unpark()
         
-        self.scope.send(":MSS#")
-        response = self.scope.recv()
+        response = self.commands.execute(":MSS#")
         self.last_slew = time.time()
         return response == "1"
     
@@ -125,13 +126,16 @@ class IoptronMount:
 
     def slew_with_speed(self, pos, name='alt', speed=9, tol=5, niters=100):
         """Slew to the given position with the given speed."""
+        from .angles import elevation_difference, azimuth_difference
+
         self.set_arrow_speed(speed)
         
         if self.system_status.is_parked:
             print("Mount is parked. Unparking...")
             self.unpark()
         
-        self.get_current_alt_az()
+        # the cached position is used when not older than self.max_age
+        self.get_position()
         diffDict = {'alt': elevation_difference(pos%90, self.altitude_deg), 'az': azimuth_difference(pos, self.azimuth_deg)}
         diff = diffDict[name]
 
@@ -140,8 +144,7 @@ class IoptronMount:
         if name == 'alt':
             while abs(diff) > tol:
                 # print(10*"-------")
-                self.get_current_alt_az(verbose=False)
-                alt = self.altitude_deg
+                alt, _, _ = self.get_position()
                 diff = elevation_difference(pos, alt)
                 slew_time = get_slew_time(speed, diff)
                 if alt>80: slew_time *= 1.25
@@ -168,8 +171,7 @@ class IoptronMount:
         elif name == 'az':
             while abs(diff) > tol:
                 print(10*"-------")
-                self.get_current_alt_az()
-                az = self.azimuth_deg
+                _, az, _ = self.get_position()
                 diff = azimuth_difference(pos, az)
                 slew_time = get_slew_time(speed, diff)
                 print(f"The position difference is: {diff:0.5f} deg")
@@ -244,7 +246,8 @@ class IoptronMount:
         directions = {'up': "mn", 'right': 'me', 'down': 'ms', 'left': 'mw'}
         assert direction.lower() in directions
         move_command = ":" + directions[direction.lower()] + "#"
-        self.scope.send(move_command)
+        # arrow moves have no reply (see command_queue.REPLY_SIZES)
+        self.commands.execute(move_command)
         # if self.scope.recv() == '1':
         #     return True
         # return False
@@ -258,44 +261,40 @@ class IoptronMount:
         """
         assert speed >= 0 and speed <= 9
         speed_command = ":SR" + str(speed) + "#"
-        self.scope.send(speed_command)
-        if self.scope.recv() == '1':
+        if self.commands.execute(speed_command) == '1':
             return True
         
     def set_alt_limit(self, alt_limit):
         """Set the altitude limit of the mount. Returns True after command is sent."""
         alt_limit_str = f"{int(alt_limit):02d}"
         command = f":SAL{alt_limit_str}#"
-        self.scope.send(command)
-        return self.scope.recv() == '1'
+        return self.commands.execute(command) == '1'
     
     def goto_zero_position(self):
         """Go to the zero position (home position)."""
         command = ":MH#"
-        response = self.scope.send(command)
+        response = self.commands.execute(command)
         self.print_received(command, response)
         return response == "1"
     
     def park(self):
         """Park the mount at the most recently defined parking position."""
-        self.scope.send(":MP1#")
-        response = self.scope.recv()
+        response = self.commands.execute(":MP1#")
         self.system_status.is_parked = response == "1"
         return response == "1"
 
     def unpark(self):
         """Unpark the mount from its parking position."""
         command = ":MP0#"
-        response = self.scope.send(command)
+        response = self.commands.execute(command)
         self.print_received(command, response)
-        self.system_status.is_parked = response == "1"
+        self.system_status.is_parked = response != "1"
         return response == "1"
 
     def get_park_position(self):
         """Get the current parking position of the mount. """
-        self.scope.send(':GPC#')
-        returned_data = self.scope.recv()
-        alt, az = utils.parse_alt_az("+"+returned_data)
+        returned_data = self.commands.execute(':GPC#')
+        alt, az = parser.parse_gpc(returned_data)
         self.altitude_park = self.offset_alt(alt)
         self.azimuth_park = self.offset_az(az)
         print("Park position:")
@@ -312,57 +311,126 @@ class IoptronMount:
         assert direction.lower() in ['north', 'south', 'n', 's']
         hemisphere = 0 if direction[0:1] == 's' else 1
         command = ":SHE" + str(hemisphere) + "#"
-        self.scope.send(command)
-        self.scope.recv()
+        self.commands.execute(command)
         return True
     
     def stop(self):
         """Stop all slewing no matter the source of slewing or the direction(s)."""
-        self.scope.send(':Q#')
+        return self.commands.execute(':Q#') == "1"
 
     def stop_updown(self):
         """Stop the mount from moving up or down."""
-        self.scope.send(':qD#')
-        response = self.scope.recv()
+        response = self.commands.execute(':qD#')
         return response == "1"
     
     def stop_leftright(self):
         """Stop the mount from moving left or right."""
-        self.scope.send(':qR#')
-        response = self.scope.recv()
+        response = self.commands.execute(':qR#')
         return response == "1"
 
+    def pipeline(self, *commands):
+        """Send several commands in a single write and return their replies in order.
+
+        Example:
+            speed, _, position = mount.pipeline(':SR9#', ':mn#', ':GAC#')
+        """
+        return self.commands.pipeline(*commands)
+
     def print_received(self, command, response):
         print(f"Command {command} accepted {bool(response)}")
 
-    def get_current_alt_az(self, verbose=True):
-        """Get the current altitude and azimuth from the mount."""
-        self.scope.send(":GAC#")
-        response = self.scope.recv()
-        if len(response) < 10 or len(response) > 21:
-            self.get_current_alt_az()
-            return
-        
-        pos = utils.parse_alt_az(response)
+    def get_current_alt_az(self, verbose=True, attempts=3):
+        """Get the current altitude and azimuth from the mount.
+
+        The angles keep the 0.01 arc-second resolution of the reply, they are
+        no longer rounded to 5 decimals as by utils.parse_alt_az.
+
+        Args:
+            verbose (bool, optional): print the position. Defaults to True.
+            attempts (int, optional): number of :GAC# queries before giving up on
+                malformed replies. Defaults to 3.
+
+        Raises:
+            parser.ResponseError: if the last of `attempts` replies is malformed
+                (mount unplugged, wrong baud rate).
+        """
+        for attempt in range(attempts):
+            response = self.commands.execute(":GAC#")
+            try:
+                pos = parser.parse_gac(response)
+                break
+            except parser.ResponseError:
+                if attempt == attempts - 1:
+                    raise
+
         self.altitude_deg = self.offset_alt(pos[0]) 
         self.azimuth_deg =self.offset_az(pos[1])
+        self.last_position_update = time.time()
         if verbose:
             print(f"Alt, Az [deg]: {self.altitude_deg:0.5f}, {self.azimuth_deg:0.5f}")
 
+    def _update_from_telemetry(self):
+        """Take the position and status of the last telemetry sample if newer than the cache."""
+        if self.telemetry is None or self.telemetry.count == 0:
+            return
+        sample = self.telemetry.latest(1)
+        if len(sample) == 0:
+            return
+        sample = sample[0]
+        t = float(sample['time'])
+        if t > self.last_position_update:
+            self.altitude_deg, self.azimuth_deg = float(sample['alt']), float(sample['az'])
+            self.last_position_update = t
+        if sample['status'] >= 0 and t > self.last_update:
+            self.system_status.update_status(str(sample['status']))
+            self.last_update = t
+
+    def get_position(self, max_age=None):
+        """Get the altitude and azimuth, from the cache if it is not older than max_age.
+
+        The cache holds the last get_current_alt_az() reading and the samples of
+        the background telemetry (see start_telemetry()), so several consumers
+        share one stream of polls. The mount is read only when the cache is too old.
+
+        Args:
+            max_age (float, optional): tolerated age in seconds. Defaults to self.max_age.
+
+        Returns:
+            alt (float): the altitude in degree
+            az (float): the azimuth in degree
+            age (float): the age of the position in seconds
+        """
+        max_age = self.max_age if max_age is None else max_age
+        self._update_from_telemetry()
+        if time.time() - self.last_position_update > max_age:
+            self.get_current_alt_az(verbose=False)
+        return self.altitude_deg, self.azimuth_deg, time.time() - self.last_position_update
+
+    def get_status(self, max_age=None):
+        """Get the system status, from the cache if it is not older than max_age, see get_position().
+
+        Returns:
+            status (SystemStatus): the system status, also in self.system_status
+            age (float): the age of the status in seconds
+        """
+        max_age = self.max_age if max_age is None else max_age
+        self._update_from_telemetry()
+        if time.time() - self.last_update > max_age:
+            self.get_system_state(verbose=False)
+        return self.system_status, time.time() - self.last_update
+
     def get_current_ra_dec(self):
         """Get the current RA and DEC from the mount."""
-        self.scope.send(":GEP#")
-        response = self.scope.recv()
+        response = self.commands.execute(":GEP#")
         # print(f"Raw response: {response}")  # Print the raw response
-        pos = utils.parse_alt_az(response)
+        pos = parser.parse_gep(response)
         self.dec_deg = self.offset_alt(pos[0]) 
         self.ra_deg =self.offset_az(pos[1])
         print(f"Ra, Dec [deg]: {self.ra_deg:0.5f}, {self.dec_deg:0.5f}")
 
     def get_mount_version(self, verbose=False):
         """Get the mount version."""
-        self.scope.send(':MountInfo#')
-        response = self.scope.recv()
+        response = self.commands.execute(':MountInfo#')
         if verbose:
             print(f"Mount version: {response}")
         return response
@@ -397,20 +465,17 @@ class IoptronMount:
 
         sign = '+' if long >= 0 else '-'
         longitude_str = f"{sign}{int( abs(long) * 360000):08d}"
-        self.scope.send(f":SLA{latitude_str}#")
-        response = self.scope.recv()
+        response = self.commands.execute(f":SLA{latitude_str}#")
         self.print_received(f":SLA{latitude_str}#", response)
 
         # set longitude
-        self.scope.send(f":SLO{longitude_str}#")
-        response = self.scope.recv()
+        response = self.commands.execute(f":SLO{longitude_str}#")
         self.print_received(f":SLO{longitude_str}#", response)
         return response == "1"
     
     def set_zero_position(self):
         """This command will set current position as zero position."""
-        self.scope.send(":SZP#")
-        response = self.scope.recv()
+        response = self.commands.execute(":SZP#")
         return response == "1"
     
     def set_park_position(self, alt=90, az=0):
@@ -433,13 +498,11 @@ class IoptronMount:
         az_str = f"{int(self.offset_az(az) * 360000):08d}"
 
         # set azimuth
-        self.scope.send(f":SPA#")
-        response = self.scope.recv()
+        response = self.commands.execute(f":SPA#")
         # self.print_received(f":SPA+{az_str}#", response)
 
         # set altitude 
-        self.scope.send(f":SPH#")
-        response = self.scope.recv()
+        response = self.commands.execute(f":SPH#")
         # self.print_received(f":SPH+{alt_str}#", response)
 
         return response == "1"
@@ -448,7 +511,7 @@ class IoptronMount:
         """Set the current time on the moint to the current computer's time. Sets to UTC."""
         j2k_time = str(utils.get_utc_time_in_j2k()).zfill(13)
         time_command = ":SUT" + j2k_time + "#"
-        self.scope.send(time_command)
+        return self.commands.execute(time_command) == "1"
 
     def set_max_speed(self):
         """Set the mount to the maximum speed."""
@@ -459,41 +522,34 @@ class IoptronMount:
 
     def set_current_time(self):
         """Set the current UTC time on the mount."""
-        current_time = Time.now()
-        
-        # Convert current UTC time to JD since J2000
-        jd_value = current_time.jd
-        jd_j2000 = jd_value - 2451545.0  # J2000 is 2451545.0
-        utc_millis = int(jd_j2000 * 8.64e7)  # Convert to milliseconds
+        # milliseconds since J2000 (JD 2451545.0)
+        utc_millis = utils.get_utc_time_in_j2k()
         # Send the time to the mount
-        self.scope.send(f":SUT{utc_millis:013d}#")
+        return self.commands.execute(f":SUT{utc_millis:013d}#") == "1"
 
     def set_timezone_offset(self, offset = utils.get_utc_offset_min()):
         """Sets the time zone offset on the mount to the computer's TZ offset."""
         tz_offset = str(offset).zfill(3)
         tz_command = ":SG" + tz_offset + "#" if offset < 0 else ":SG+" + tz_offset + "#"
-        self.scope.send(tz_command)
         # Get the response; do nothing with it
-        self.scope.recv()
+        self.commands.execute(tz_command)
 
     def get_time_information(self):
         """Get all time information from the mount."""
-        self.scope.send(':GUT#')
-        response_data = self.scope.recv()
+        from astropy.time import Time, TimeDelta
+
+        response_data = self.commands.execute(':GUT#')
         if response_data[0] == '1':
-            self.scope.send(':GUT#')
-            response_data = self.scope.recv()
+            response_data = self.commands.execute(':GUT#')
 
         # Extract UTC offset, DST, and the time value
-        utc_offset_minutes = int(response_data[0:4])
+        utc_offset_minutes, self.time.dst, utc_millis = parser.parse_gut(response_data)
         self.time.utc_offset = utc_offset_minutes / 60.0  # Convert minutes to hours
-        self.time.dst = response_data[4:5] == '1'
 
         if self.time.dst:
             self.time.utc_offset += 1
         
-        # Extract and convert the time value
-        utc_millis = int(response_data[5:18])
+        # Convert the time value
         jd_value = utc_millis / 8.64e7 + 2451545.0  # Convert to JD by reversing the formula
         self.time.julian_date = Time(jd_value, format='jd')
         
@@ -506,40 +562,62 @@ class IoptronMount:
 
     def check_connection(self):
         """Check if the mount is connected."""
-        self.scope.send(':GLS#')
-        response = self.scope.recv()
+        response = self.commands.execute(':GLS#')
         return len(response) > 0
     
-    def _continous_altaz_reading(self,i):
-        """Continously read the altitude and azimuth."""
-        self.scope.send(":GAC#")
-        response, timestamp = self.scope.recv_timestamp()
-        pos = utils.parse_alt_az(response)
-        self.altaz['alt'][i] = self.offset_alt(pos[0])
-        self.altaz['az'][i] = self.offset_az(pos[1])
-        self.altaz['time'][i] = timestamp
+    def start_telemetry(self, interval=0.1, capacity=36000, status=True):
+        """Start recording alt/az/status in the background, see telemetry.TelemetryRecorder.
 
-    async def continous_altaz_reading(self, timeout, interval=0.1, verbose=True):
-        """Continuously read the altitude and azimuth asynchronously."""
-        nsamples = int(timeout / interval)
+        Returns:
+            TelemetryRecorder: the running recorder, also kept in self.telemetry.
+        """
+        from .telemetry import TelemetryRecorder
 
-        # Initialize vectors
-        alt_vec = np.zeros(nsamples)
-        az_vec = np.zeros(nsamples)
-        t_vec = np.full(nsamples, np.datetime64('1970-01-01T00:00:00', 'ns'), dtype='datetime64[ns]')
-        self.altaz = {'alt': alt_vec, 'az': az_vec, 'time': t_vec}
+        if self.telemetry is None or not self.telemetry.is_running:
+            self.telemetry = TelemetryRecorder(self, interval=interval, capacity=capacity, status=status)
+            self.telemetry.start()
+        return self.telemetry
 
-        for i in range(nsamples):
-            # Perform the reading and update the vectors
-            alt, az = self._continous_altaz_reading(i)
-            self.altitude_deg = alt
-            self.azimuth_deg = az
+    def stop_telemetry(self):
+        """Stop the background telemetry recording."""
+        if self.telemetry is not None:
+            self.telemetry.stop()
 
-            if verbose:
-                print(f"Altitude: {alt:0.5f}, Azimuth: {az:0.5f}, Time: {self.altaz['time'][i]}")
-            await asyncio.sleep(interval)
+    async def continous_altaz_reading(self, timeout, interval=0.1, verbose=True):
+        """Continuously read the altitude and azimuth asynchronously.
+
+        The samples are recorded by the telemetry recorder and stored in self.altaz
+        with the receive time of each sample. A recorder started by the caller is
+        read at its own interval; otherwise one is started at `interval` and
+        stopped when the reading is done.
+        """
+        import asyncio
 
+        started = self.telemetry is None or not self.telemetry.is_running
+        recorder = self.start_telemetry(interval=interval) if started else self.telemetry
+        start = recorder.count
+        try:
+            loop = asyncio.get_running_loop()
+            t_end = loop.time() + timeout
+            while loop.time() < t_end:
+                await asyncio.sleep(min(interval, max(0, t_end - loop.time())))
+                if verbose and recorder.count > start:
+                    last = recorder.latest(1)[0]
+                    print(f"Altitude: {last['alt']:0.5f}, Azimuth: {last['az']:0.5f}, Time: {last['time']:0.3f}")
+            samples = recorder.latest(recorder.count - start)
+        finally:
+            if started:
+                self.stop_telemetry()
+
+        self.altaz = {
+            'alt': samples['alt'],
+            'az': samples['az'],
+            'time': (samples['time'] * 1e9).astype('datetime64[ns]'),
+        }
+        if len(samples):
+            self.altitude_deg, self.azimuth_deg = samples['alt'][-1], samples['az'][-1]
         print("Continous altaz reading is done.")
+        return self.altaz
         
     def offset_alt(self, alt):
         return (alt - self.OFFSET_ALT) #% 90
@@ -547,20 +625,24 @@ class IoptronMount:
     def offset_az(self, az):
         return (az - self.OFFSET_AZ) % 360 - 180
     
-    def is_slewing(self):
-        """Check if the mount is slewing."""
+    def is_slewing(self, max_age=None):
+        """Check if the mount is slewing, with a status not older than max_age seconds."""
         # time.sleep(1)
-        self.get_system_state(verbose=False)
-        return self.system_status.is_sleewing
+        status, _ = self.get_status(max_age)
+        return status.is_sleewing
+
+SIDEREAL_RATE = 15.041 / 3600  # deg/sec
+# arrow speed (:SRn#) -> multiple of the sidereal rate
+ARROW_SPEEDS = {2:2, 3:8, 4:16, 5:64, 6:128, 7:256, 8:512, 9:900}
 
 def get_slew_time(speed, theta):
-    SIDREAL_RATE = 15.041 / 3600  # deg/sec
-    vel_book = {2:2, 3:8, 4:16, 5:64, 6:128, 7:256, 8:512, 9:900}
-    vel = vel_book[speed] * SIDREAL_RATE #/ 1.25 # deg/sec            
+    vel = ARROW_SPEEDS[speed] * SIDEREAL_RATE #/ 1.25 # deg/sec            
     slew_time = abs(theta)/vel
     return slew_time
 
 def refine_movement(theta, threshold):
+    import numpy as np
+
     speeds = np.arange(2,10,1,dtype=np.int64)
     times = np.array([get_slew_time(s,abs(theta)) for s in speeds])
     ix = np.where((times-threshold)>0)[0][-1]
@@ -629,27 +711,6 @@ class TimeInfo:
             '-------------------------------'
         )
 
-from astropy.coordinates import SkyCoord
-import astropy.units as u
-
-def elevation_difference(elevation1_deg, elevation2_deg):
-    coord1 = SkyCoord(alt=elevation1_deg * u.deg, az=0 * u.deg, frame='altaz')
-    coord2 = SkyCoord(alt=elevation2_deg * u.deg, az=0 * u.deg, frame='altaz')
-    # Calculate the signed angular difference
-    diff = coord1.alt - coord2.alt
-    return diff.to(u.deg).value
-
-def azimuth_difference(azimuth1_deg, azimuth2_deg):
-    # Create SkyCoord objects for the two azimuths, using a fixed altitude
-    coord1 = SkyCoord(alt=0 * u.deg, az=azimuth1_deg * u.deg, frame='altaz')
-    coord2 = SkyCoord(alt=0 * u.deg, az=azimuth2_deg * u.deg, frame='altaz')
-    
-    # Calculate the signed angular difference in azimuth
-    diff = coord1.az - coord2.az
-    diff = (diff + 180 * u.deg) % (360 * u.deg) - 180 * u.deg
-    # Normalize the difference to be within -180 to 180 degrees
-    return diff.to(u.deg).value
-
 if __name__ == "__main__":
     # Example usage:
     is_park = False
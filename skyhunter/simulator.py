@@ -0,0 +1,337 @@
+"""
+Simulator of the iOptron SkyHunter mount speaking the RS-232 serial protocol.
+
+SimulatedSerial is an in-process stand-in for `serial.Serial`: commands
+written to it are answered by a MountModel with the reply shapes of the real
+mount, after a configurable latency and jitter plus the wire time at the
+configured baudrate. The model moves the axes with the arrow speeds of
+`ioptron.ARROW_SPEEDS` and decelerates for `stop_time` seconds after a stop.
+
+Example:
+    from skyhunter import IoptronMount
+    from skyhunter.simulator import SimulatedSerial
+
+    mount = IoptronMount('sim', ser=SimulatedSerial(latency=2e-3, jitter=0.5e-3))
+    mount.slew_up(2)
+    mount.get_current_alt_az()
+
+Implemented commands: :GAC#, :GLS#, :GEP#, :GUT#, :GPC#, :MountInfo#,
+:mn#, :ms#, :me#, :mw#, :qD#, :qR#, :Q#, :SRn#, :Sa..#, :SZ..#, :MSS#,
+:MP0#, :MP1#, :MH#, :SUT..#, and the '1'-acknowledged settings
+(:SAL, :SG, :SHE, :SLA, :SLO, :SZP, :SPA, :SPH).
+"""
+import random
+import threading
+import time
+from collections import deque
+
+from .ioptron import SIDEREAL_RATE, ARROW_SPEEDS
+
+ARCSEC_CENTI = 360000.0 # 0.01 arc-seconds per degree
+J2000_UNIX = 946728000.0 # 2000-01-01T12:00:00 UTC
+
+
+class _Axis:
+    """One mount axis moving at a constant rate with a linear deceleration on stop."""
+    def __init__(self, position=0.0, limits=None):
+        self.limits = limits # (lower, upper) mechanical limits, if any
+        self.position0 = position
+        self.rate = 0.0
+        self.t0 = 0.0
+        self.t_end = None # end of the deceleration
+        self.target = None # goto target, reached at full rate
+
+    def position(self, t):
+        if self.rate == 0:
+            return self.position0
+        dt = t - self.t0
+        if self.t_end is not None:
+            ramp = self.t_end - self.t0
+            dt = min(dt, ramp)
+            dt = dt - dt**2 / (2 * ramp)
+        pos = self.position0 + self.rate * dt
+        if self.target is not None:
+            pos = min(pos, self.target) if self.rate > 0 else max(pos, self.target)
+        if self.limits is not None:
+            pos = min(max(pos, self.limits[0]), self.limits[1])
+        return pos
+
+    def is_moving(self, t):
+        if self.rate == 0:
+            return False
+        if self.limits is not None and self.position(t) == self.limits[self.rate > 0]:
+            return False
+        if self.target is not None:
+            return self.position(t) != self.target
+        return self.t_end is None or t < self.t_end
+
+    def start(self, rate, t, target=None):
+        self.position0 = self.position(t)
+        self.rate = rate
+        self.t0 = t
+        self.t_end = None
+        self.target = target
+
+    def stop(self, t, stop_time):
+        if not self.is_moving(t):
+            self.rate = 0.0
+            return
+        self.position0 = self.position(t)
+        self.t0 = t
+        self.target = None
+        if stop_time > 0:
+            self.t_end = t + stop_time
+        else:
+            self.rate = 0.0
+
+
+class MountModel:
+    """State of the simulated mount and the replies to each command.
+
+    Positions are in the mount frame: altitude in [-90, 90] deg and
+    azimuth in [0, 360) deg.
+
+    Args:
+        alt (float, optional): initial altitude in degrees. Defaults to 90.
+        az (float, optional): initial azimuth in degrees. Defaults to 180.
+        latitude (float, optional): site latitude in degrees.
+        longitude (float, optional): site longitude in degrees.
+        stop_time (float, optional): deceleration time after a stop in seconds.
+        clock (callable, optional): time source. Defaults to time.monotonic.
+    """
+    def __init__(self, alt=90.0, az=180.0, latitude=-30.24, longitude=-70.74,
+                 stop_time=0.2, clock=time.monotonic):
+        self.alt = _Axis(alt, limits=(-89.0, 90.0))
+        self.az = _Axis(az)
+        self.latitude = latitude
+        self.longitude = longitude
+        self.stop_time = stop_time
+        self.clock = clock
+        self.speed = 9
+        self.parked = False
+        self.target_alt = alt
+        self.target_az = az
+        self.park_position = (90.0, 180.0)
+        self.utc_offset = 0 # minutes
+        self.time_offset = 0.0 # mount clock minus host clock, sec
+        self.model = '0120'
+
+    def rate(self):
+        """Arrow rate in deg/sec for the current speed."""
+        return ARROW_SPEEDS.get(self.speed, 1) * SIDEREAL_RATE
+
+    def position(self, t=None):
+        """Altitude and azimuth in degrees at time t."""
+        t = self.clock() if t is None else t
+        return self.alt.position(t), self.az.position(t) % 360
+
+    def status_code(self, t):
+        if self.parked:
+            return '6'
+        if self.alt.is_moving(t) or self.az.is_moving(t):
+            return '2'
+        return '0'
+
+    def reply(self, command):
+        """Process one command (including the trailing '#') and return its reply."""
+        t = self.clock()
+        body = command[1:-1]
+
+        if body == 'GAC':
+            alt, az = self.position(t)
+            sign = '+' if alt >= 0 else '-'
+            return f"{sign}{round(abs(alt) * ARCSEC_CENTI):08d}{round(az * ARCSEC_CENTI) % 129600000:09d}#"
+        if body == 'GLS':
+            sign = '+' if self.longitude >= 0 else '-'
+            status = f"1{self.status_code(t)}0{self.speed}1{1 if self.latitude >= 0 else 0}"
+            return (f"{sign}{round(abs(self.longitude) * ARCSEC_CENTI):08d}"
+                    f"{round((self.latitude + 90) * ARCSEC_CENTI):08d}{status}#")
+        if body == 'GEP':
+            # alt-az mode: report the pole, the mount does not track
+            return f"+{round(90 * ARCSEC_CENTI):08d}{0:09d}00#"
+        if body == 'GUT':
+            sign = '+' if self.utc_offset >= 0 else '-'
+            j2k_ms = int((time.time() + self.time_offset - J2000_UNIX) * 1000)
+            return f"{sign}{abs(self.utc_offset):03d}0{j2k_ms:013d}#"
+        if body == 'GPC':
+            alt, az = self.park_position
+            return f"{round(alt * ARCSEC_CENTI):08d}{round(az * ARCSEC_CENTI):09d}#"
+        if body == 'MountInfo':
+            return self.model
+
+        if body in ['mn', 'ms', 'me', 'mw']:
+            if not self.parked:
+                axis = self.alt if body in ['mn', 'ms'] else self.az
+                sign = 1 if body in ['mn', 'me'] else -1
+                axis.start(sign * self.rate(), t)
+            return ''
+        if body == 'qD':
+            self.alt.stop(t, self.stop_time)
+            return '1'
+        if body == 'qR':
+            self.az.stop(t, self.stop_time)
+            return '1'
+        if body == 'Q':
+            self.alt.stop(t, self.stop_time)
+            self.az.stop(t, self.stop_time)
+            return '1'
+        if body.startswith('SR'):
+            speed = int(body[2:])
+            if not 1 <= speed <= 9:
+                return '0'
+            self.speed = speed
+            return '1'
+        if body.startswith('Sa'):
+            self.target_alt = int(body[2:]) / ARCSEC_CENTI
+            return '1'
+        if body.startswith('SZ'):
+            self.target_az = int(body[2:]) / ARCSEC_CENTI
+            return '1'
+        if body == 'MSS':
+            if self.parked:
+                return '0'
+            self.goto(self.target_alt, self.target_az, t)
+            return '1'
+        if body == 'MH':
+            self.parked = False
+            self.goto(90.0, 180.0, t)
+            return '1'
+        if body == 'MP1':
+            self.goto(*self.park_position, t)
+            self.parked = True
+            return '1'
+        if body == 'MP0':
+            self.parked = False
+            return '1'
+        if body.startswith('SUT'):
+            self.time_offset = J2000_UNIX + int(body[3:]) / 1000 - time.time()
+            return '1'
+        if body.startswith('SAL'):
+            self.alt.limits = (float(body[3:]), 90.0)
+            return '1'
+        if body.startswith('SG'):
+            self.utc_offset = int(body[2:])
+            return '1'
+        if body[:3] in ['SHE', 'SLA', 'SLO', 'SZP', 'SPA', 'SPH']:
+            return '1'
+        return '0'
+
+    def goto(self, alt, az, t):
+        """Slew both axes to the given position at the maximum arrow speed."""
+        rate = ARROW_SPEEDS[9] * SIDEREAL_RATE
+        current_alt, current_az = self.alt.position(t), self.az.position(t)
+        self.alt.start(rate if alt > current_alt else -rate, t, target=alt)
+        # take the shortest way around in azimuth
+        daz = (az - current_az + 180) % 360 - 180
+        self.az.start(rate if daz > 0 else -rate, t, target=current_az + daz)
+
+
+class SimulatedSerial:
+    """In-process replacement of `serial.Serial` answering as the iOptron mount.
+
+    Args:
+        model (MountModel, optional): the simulated mount. Defaults to a new MountModel().
+        baudrate (int, optional): used for the wire time of each byte. Defaults to 115200.
+        latency (float, optional): mount response time in seconds. Defaults to 2 ms.
+        jitter (float, optional): standard deviation of the response time in seconds.
+        seed (int, optional): seed of the jitter random generator.
+    """
+    def __init__(self, model=None, baudrate=115200, latency=2e-3, jitter=0.0, seed=None):
+        self.model = model if model is not None else MountModel()
+        self.baudrate = baudrate
+        self.latency = latency
+        self.jitter = jitter
+        self.timeout = None
+        self.is_open = True
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.pending = deque() # (ready time, reply bytes) not arrived yet
+        self.rx = bytearray() # arrived and unread
+        self.busy_until = 0.0
+        self.partial = b''
+
+    def byte_time(self, nbytes):
+        # 10 bits per byte on the wire (start + 8 data + stop)
+        return 10.0 * nbytes / self.baudrate
+
+    def write(self, data):
+        t = time.monotonic()
+        with self.lock:
+            data = self.partial + bytes(data)
+            *commands, self.partial = data.split(b'#')
+            # the mount starts answering once the whole command is in
+            ready = max(t + self.byte_time(len(data)), self.busy_until)
+            for command in commands:
+                reply = self.model.reply(command.decode('utf-8') + '#').encode('utf-8')
+                delay = self.latency + abs(self.random.gauss(0, self.jitter)) if self.jitter else self.latency
+                ready += delay + self.byte_time(len(reply))
+                if reply:
+                    self.pending.append((ready, reply))
+            self.busy_until = ready
+        return len(data)
+
+    def _receive(self):
+        """Move the replies that arrived by now to the input buffer."""
+        now = time.monotonic()
+        while self.pending and self.pending[0][0] <= now:
+            self.rx += self.pending.popleft()[1]
+
+    def _wait(self, done):
+        """Block until done() or the timeout, return False on timeout."""
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            with self.lock:
+                self._receive()
+                if done():
+                    return True
+                next_ready = self.pending[0][0] if self.pending else None
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return False
+            if next_ready is None:
+                if deadline is None:
+                    return False # nothing will ever arrive
+                wake = deadline
+            else:
+                wake = next_ready if deadline is None else min(next_ready, deadline)
+            time.sleep(max(0.0, wake - now))
+
+    def read(self, size=1):
+        self._wait(lambda: len(self.rx) >= size)
+        with self.lock:
+            out = bytes(self.rx[:size])
+            del self.rx[:size]
+        return out
+
+    def read_until(self, expected=b'\n', size=None):
+        def found():
+            return expected in self.rx or (size is not None and len(self.rx) >= size)
+        self._wait(found)
+        with self.lock:
+            i = self.rx.find(expected)
+            n = len(self.rx) if i < 0 else i + len(expected)
+            if size is not None:
+                n = min(n, size)
+            out = bytes(self.rx[:n])
+            del self.rx[:n]
+        return out
+
+    @property
+    def in_waiting(self):
+        with self.lock:
+            self._receive()
+            return len(self.rx)
+
+    def inWaiting(self):
+        return self.in_waiting
+
+    def reset_input_buffer(self):
+        with self.lock:
+            self._receive()
+            self.rx.clear()
+
+    def isOpen(self):
+        return self.is_open
+
+    def close(self):
+        self.is_open = False
@@ -0,0 +1,192 @@
+"""
+Background telemetry recorder for the iOptron mount.
+
+TelemetryRecorder samples the altitude, azimuth and system status of an
+IoptronMount at a fixed rate on a background thread and keeps the last
+`capacity` samples in a ring buffer. Each sample is stamped with the host
+time at which its reply was received, the pointing record the photodiode
+exposures are matched against.
+
+Readers never block the sampling thread: `latest()` copies the newest
+samples and drops those overwritten during the copy, and `drain()` returns
+(and optionally appends to a file) the samples not drained yet.
+
+Example:
+    recorder = mount.start_telemetry(interval=0.1)
+    ...
+    samples = recorder.latest(50)        # last 5 seconds
+    recorder.drain('telemetry.bin')      # append the new samples to disk
+    mount.stop_telemetry()
+
+    samples = TelemetryRecorder.load('telemetry.bin')
+"""
+import threading
+import time
+
+import numpy as np
+
+from . import parser
+
+# one telemetry sample
+SAMPLE_DTYPE = np.dtype([
+    ('time', 'f8'),   # host unix time at which the :GAC# reply was received, sec
+    ('rtt', 'f4'),    # time between the write and the receipt of the replies, sec
+    ('alt', 'f8'),    # altitude, deg
+    ('az', 'f8'),     # azimuth, deg
+    ('status', 'i1'), # system status digit of :GLS# (-1 if not sampled)
+])
+
+
+class TelemetryRecorder:
+    """Ring buffer of mount telemetry filled by a background thread.
+
+    Args:
+        mount (IoptronMount): the mount to sample.
+        interval (float, optional): sampling period in seconds. Defaults to 0.1.
+        capacity (int, optional): number of samples kept. Defaults to one hour at 10 Hz.
+        status (bool, optional): also sample the system status (:GLS#, sent in the
+            same write as :GAC#). Defaults to True.
+    """
+    def __init__(self, mount, interval=0.1, capacity=36000, status=True):
+        self.mount = mount
+        self.interval = interval
+        self.capacity = capacity
+        self.status = status
+        self.buffer = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        self.count = 0 # samples written since the start, the next one goes to count % capacity
+        self.drained = 0 # samples returned by drain()
+        self.lost = 0 # samples overwritten before being drained
+        self.errors = 0 # malformed replies and serial errors, not recorded
+        self.error = None # exception that stopped the thread, raised again by latest, since, drain and stop
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Start sampling on a background thread."""
+        if self.is_running:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='ioptron-telemetry', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the thread."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.thread = None
+        self._raise_error()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError(f"Telemetry recording stopped: {error!r}") from error
+
+    def _run(self):
+        next_time = time.monotonic()
+        try:
+            while not self.stop_event.is_set():
+                self.sample()
+                # keep the cadence regardless of the time spent on the wire
+                next_time += self.interval
+                delay = next_time - time.monotonic()
+                if delay < 0:
+                    next_time = time.monotonic() # fell behind, do not burst
+                    delay = 0
+                self.stop_event.wait(delay)
+        except Exception as error:
+            # raised on the reader's thread instead of dying silently
+            self.error = error
+
+    def sample(self):
+        """Read the mount once and record the sample."""
+        mount = self.mount
+        t_send = time.time()
+        try:
+            # :GAC# last, so that the receive time is the time of the position
+            if self.status:
+                gls, gac = mount.pipeline(':GLS#', ':GAC#')
+            else:
+                gac = mount.commands.execute(':GAC#')
+            t_receive = time.time()
+            alt, az = parser.parse_gac(gac)
+            status = int(parser.parse_gls(gls)[2][1]) if self.status else -1
+        except (parser.ResponseError, ValueError, IndexError, OSError):
+            # malformed reply, or a serial error (serial.SerialException, timeout) the next sample may recover from
+            self.errors += 1
+            return
+
+        row = self.buffer[self.count % self.capacity]
+        row['time'] = t_receive
+        row['rtt'] = t_receive - t_send
+        row['alt'] = mount.offset_alt(alt)
+        row['az'] = mount.offset_az(az)
+        row['status'] = status
+        # publish the sample once it is complete
+        self.count += 1
+
+    def _copy(self, start, end):
+        """Copy of the samples start to end - 1 (counted since the start), without locking."""
+        samples = self.buffer.take(np.arange(start, end), mode='wrap')
+        # sample k is overwritten by sample k + capacity, the recorder may be writing sample `count`
+        overwritten = self.count + 1 - self.capacity - start
+        return samples[max(0, overwritten):]
+
+    def latest(self, n=None):
+        """Copy of the latest n samples, oldest first.
+
+        Does not lock: samples overwritten by the recorder during the copy are
+        dropped, so fewer than n samples may be returned.
+
+        Args:
+            n (int, optional): number of samples. Defaults to all the samples kept.
+
+        Returns:
+            np.ndarray: samples with the fields of SAMPLE_DTYPE.
+        """
+        self._raise_error()
+        end = self.count
+        # one slot is left for the sample being written
+        n = min(self.capacity - 1, end) if n is None else min(n, self.capacity - 1, end)
+        return self._copy(end - n, end)
+
+    def since(self, t):
+        """Samples received after the host unix time t."""
+        samples = self.latest()
+        return samples[samples['time'] > t]
+
+    def drain(self, path=None):
+        """Return the samples recorded since the last drain and append them to a file.
+
+        Args:
+            path (str, optional): raw binary file the samples are appended to,
+                read back with TelemetryRecorder.load().
+
+        Returns:
+            np.ndarray: the new samples with the fields of SAMPLE_DTYPE.
+        """
+        self._raise_error()
+        end = self.count
+        start = max(self.drained, end - (self.capacity - 1))
+        samples = self._copy(start, end)
+        lost = end - self.drained - len(samples)
+        if lost:
+            self.lost += lost
+            print(f"Telemetry: {lost} samples overwritten before being drained")
+        self.drained = end
+        if path is not None and len(samples):
+            with open(path, 'ab') as f:
+                samples.tofile(f)
+        return samples
+
+    @staticmethod
+    def load(path):
+        """Load the samples appended to a file by drain()."""
+        return np.fromfile(path, dtype=SAMPLE_DTYPE)
@@ -6,17 +6,23 @@ Module for interfacing and communicating with stuff over serial.
 import logging
 import sys
 import time
-import numpy as np
 import serial
 import serial.tools.list_ports
 
 class USBSerial:
     """Class for communicating with devices over serial."""
-    def __init__(self, port = 'COM5', baud = 115200, log_level = logging.INFO):
+    def __init__(self, port = 'COM5', baud = 115200, log_level = logging.INFO, ser = None):
         self.send_wait = 0.1 # Arbritrary waiting period to save flooding comms
+        self.reply_timeout = 0.5 # Deadline (sec) for a framed reply, see query()
+        self.terminator = b'#'
         logging.basicConfig(filename='iotty.log', format='%(asctime)s - %(message)s',\
             level=log_level)
-            
+
+        if ser is not None:
+            # an already opened port, or anything speaking the serial.Serial API
+            self.ser = ser
+            return
+
         try:
             self.ser = serial.Serial(port, baud)
         except:
@@ -41,6 +47,57 @@ class USBSerial:
         self.ser.write(bytes_to_send)
         time.sleep(self.send_wait)
 
+    def query(self, data, size=None, timeout=None):
+        """Send a command and read back its framed reply.
+
+        Unlike send()/recv() there is no fixed sleep: the reply is read as soon
+        as it arrives, either up to the '#' terminator or, for the fixed-length
+        '1'/'0' acknowledgements, for exactly `size` bytes.
+
+        Args:
+            data (str): the command, e.g. ':GAC#'
+            size (int, optional): fixed reply length in bytes; 0 means the command
+                has no reply. Defaults to None, i.e. read until the terminator.
+            timeout (float, optional): deadline in seconds for the whole reply.
+                Defaults to `self.reply_timeout`.
+
+        Returns:
+            str: the reply including its terminator. A reply cut short by the
+                deadline is returned as received (possibly empty).
+        """
+        self.write(data)
+        return self.read_reply(size, timeout)
+
+    def write(self, data):
+        """Write data without waiting, dropping any unread input first."""
+        # drop stale bytes left over by commands whose reply was never read
+        self.ser.reset_input_buffer()
+        logging.debug("Sending -> %s", str(data))
+        self.ser.write(data.encode('utf-8'))
+
+    def read_reply(self, size=None, timeout=None):
+        """Read one framed reply, see query()."""
+        if size == 0:
+            return ''
+        timeout = self.reply_timeout if timeout is None else timeout
+        # changing the timeout reconfigures the port, only do it when needed
+        if self.ser.timeout != timeout:
+            self.ser.timeout = timeout
+
+        if size is None:
+            raw = self.ser.read_until(self.terminator)
+            complete = raw.endswith(self.terminator)
+        else:
+            raw = self.ser.read(size)
+            complete = len(raw) == size
+
+        output = raw.decode('utf-8')
+        if complete:
+            logging.debug("Received <- %s", output)
+        else:
+            logging.warning("Reply timed out after %.3f s, received <- %s", timeout, output)
+        return output
+
     def recv(self):
         """Receive the output."""
         output = ''
@@ -51,6 +108,8 @@ class USBSerial:
     
     def recv_timestamp(self):
         """Receive the output with a timestamp."""
+        import numpy as np
+
         output = ''
         while self.ser.inWaiting() > 0:
             output += self.ser.read(1).decode('utf-8')
@@ -12,7 +12,6 @@
     The last 9 digits indicate current azimuth. Valid data range is [0, 129,600,000]. Note: The resolution
     is 0.01 arc-second.
 """
-import numpy as np
 
 def parse_alt_az(response, is_latlong=False):
     """Parse the altitude and azimuth from the iOptron response.
@@ -42,13 +41,15 @@ def parse_alt_az(response, is_latlong=False):
     # Convert to degrees
     altitude_deg = altitude / 360000.0
     azimuth_deg = azimuth / 360000.0
-    azimuth_deg = np.where(azimuth_deg > 360, azimuth_deg - 360, azimuth_deg)
+    if azimuth_deg > 360:
+        azimuth_deg -= 360
 
-    return np.round(altitude_deg,5), np.round(azimuth_deg,5)
+    return round(altitude_deg,5), round(azimuth_deg,5)
 
 def angular_difference(target_angle, current_angle):
-    diff = (target_angle - current_angle + 180) % 360 - 180
-    return diff
+    """Signed difference target - current in [-180, 180) degrees, see `angles.angle_difference`."""
+    from .angles import angle_difference
+    return angle_difference(target_angle, current_angle)
 # # Example usage:
 # response = "+01234567012345678#"
 # altitude, azimuth = parse_ioptron_response(response)
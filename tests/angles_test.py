@@ -0,0 +1,62 @@
+from skyhunter import angles
+import numpy as np
+import time
+
+# Per-call cost of the angle helpers in the pointing loop (no hardware needed),
+# compared with the astropy SkyCoord versions they replace.
+
+NCALLS = 2000
+NARRAY = 100000
+
+def time_calls(func, ncalls=NCALLS):
+    """Return the mean time per call in microseconds."""
+    t0 = time.perf_counter()
+    for _ in range(ncalls):
+        func()
+    return 1e6 * (time.perf_counter() - t0) / ncalls
+
+def skycoord_elevation_difference(elevation1_deg, elevation2_deg):
+    coord1 = SkyCoord(alt=elevation1_deg * u.deg, az=0 * u.deg, frame='altaz')
+    coord2 = SkyCoord(alt=elevation2_deg * u.deg, az=0 * u.deg, frame='altaz')
+    return (coord1.alt - coord2.alt).to(u.deg).value
+
+def skycoord_azimuth_difference(azimuth1_deg, azimuth2_deg):
+    coord1 = SkyCoord(alt=0 * u.deg, az=azimuth1_deg * u.deg, frame='altaz')
+    coord2 = SkyCoord(alt=0 * u.deg, az=azimuth2_deg * u.deg, frame='altaz')
+    diff = coord1.az - coord2.az
+    diff = (diff + 180 * u.deg) % (360 * u.deg) - 180 * u.deg
+    return diff.to(u.deg).value
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(42)
+    alt1, alt2 = rng.uniform(-90, 90, (2, NARRAY))
+    az1, az2 = rng.uniform(0, 360, (2, NARRAY))
+
+    results = {
+        'elevation_difference': time_calls(lambda: angles.elevation_difference(45.1, 44.9)),
+        'azimuth_difference': time_calls(lambda: angles.azimuth_difference(359.5, 0.5)),
+        'separation': time_calls(lambda: angles.separation(30, 10, 31, 350)),
+        f'azimuth_difference x{NARRAY}': time_calls(lambda: angles.azimuth_difference(az1, az2), 20),
+        f'separation x{NARRAY}': time_calls(lambda: angles.separation(alt1, az1, alt2, az2), 20),
+    }
+
+    try:
+        from astropy.coordinates import SkyCoord
+        import astropy.units as u
+    except ImportError:
+        print("astropy is not installed, skipping the SkyCoord comparison")
+    else:
+        results['SkyCoord elevation_difference'] = time_calls(lambda: skycoord_elevation_difference(45.1, 44.9), 200)
+        results['SkyCoord azimuth_difference'] = time_calls(lambda: skycoord_azimuth_difference(359.5, 0.5), 200)
+
+        # same answers as astropy
+        assert np.allclose(angles.elevation_difference(alt1, alt2), skycoord_elevation_difference(alt1, alt2))
+        assert np.allclose(angles.azimuth_difference(az1, az2), skycoord_azimuth_difference(az1, az2))
+        c1 = SkyCoord(az1 * u.deg, alt1 * u.deg, frame='altaz')
+        c2 = SkyCoord(az2 * u.deg, alt2 * u.deg, frame='altaz')
+        assert np.allclose(angles.separation(alt1, az1, alt2, az2), c1.separation(c2).deg)
+        print("Results match astropy")
+
+    print("Time per call")
+    for name, dt in results.items():
+        print(f"{name:>35s}: {dt:10.2f} us")
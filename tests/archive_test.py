@@ -0,0 +1,79 @@
+from twmdb import TwilightMonitorDatabase
+from datetime import datetime, timedelta
+import numpy as np
+import tempfile
+import time
+import os
+
+# Loading a month of electrometer traces from the per-exposure .npy files vs the
+# Parquet archive (no hardware needed, the archive needs pyarrow).
+
+NNIGHTS = 30
+NEXPOSURES = 100 # per night
+NSAMPLES = 2000 # per trace
+FILTERS = ['Empty', 'SDSSr', 'SDSSg']
+
+def make_night(root, day, rng):
+    db = TwilightMonitorDatabase(day, 8, 2024, path=root, electrometer_path=os.path.join(root, 'electrometer'),
+                                 mount_path=os.path.join(root, 'mount'), storage='append')
+    for i in range(NEXPOSURES):
+        db.add_exposure(timestamp=datetime(2024, 8, day, 22) + timedelta(seconds=5 * i),
+                        alt=rng.uniform(20, 90), az=rng.uniform(0, 360), filter_type=FILTERS[i % 3])
+        t = np.arange(NSAMPLES) * 1e-3
+        db.save_electrometer_file(np.rec.fromarrays([t, rng.normal(1e-9, 1e-12, NSAMPLES)], names=['time', 'CURR']))
+        db.save_mount_file({'time': (1.7e9 + t[::100] * 1e9).astype('datetime64[ns]'),
+                            'alt': np.full(NSAMPLES // 100, 45.), 'az': np.linspace(0, 1, NSAMPLES // 100)})
+    return db
+
+def load_npy_files(root):
+    traces = []
+    for day in range(1, NNIGHTS + 1):
+        db = TwilightMonitorDatabase(day, 8, 2024, path=root, electrometer_path=os.path.join(root, 'electrometer'),
+                                     mount_path=os.path.join(root, 'mount'), storage='append')
+        database = db.database
+        selected = database[database['filter'] == 'SDSSr']
+        traces.extend(np.load(f) for f in selected['electrometer_filename'])
+        db.close()
+    return traces
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(42)
+    with tempfile.TemporaryDirectory() as root:
+        nights = []
+        for day in range(1, NNIGHTS + 1):
+            db = make_night(root, day, rng)
+            nights.append(db)
+
+        t0 = time.perf_counter()
+        traces = load_npy_files(root)
+        print(f"{'.npy files':>16s}: {len(traces)} SDSSr traces in {time.perf_counter() - t0:.3f} s")
+
+        try:
+            import pyarrow
+        except ImportError:
+            print("pyarrow is not installed, skipping the archive")
+        else:
+            from twmdb import ArchiveReader, archive_night
+            archive = os.path.join(root, 'archive')
+            t0 = time.perf_counter()
+            for db in nights:
+                archive_night(db, archive, verbose=False)
+            print(f"Archived {NNIGHTS} nights in {time.perf_counter() - t0:.2f} s")
+
+            reader = ArchiveReader(archive)
+            t0 = time.perf_counter()
+            samples = reader.traces(nights=('20240801', '20240831'), filter_type='SDSSr')
+            print(f"{'Parquet archive':>16s}: {len(samples) // NSAMPLES} SDSSr traces in {time.perf_counter() - t0:.3f} s")
+            assert len(samples) == sum(len(trace) for trace in traces)
+            # the same samples, in night and seq_id order as the .npy files
+            samples = samples.sort_values(['night', 'seq_id'], kind='stable')
+            assert np.array_equal(samples['time'].to_numpy(), np.concatenate([trace['time'] for trace in traces]))
+            assert np.array_equal(samples['value'].to_numpy(), np.concatenate([trace['CURR'] for trace in traces]))
+            assert set(samples['quantity']) == {'CURR'}
+
+            t0 = time.perf_counter()
+            samples = reader.traces(nights=('20240801', '20240831'), alt_range=(40, 45))
+            print(f"{'alt 40-45 deg':>16s}: {len(samples) // NSAMPLES} traces in {time.perf_counter() - t0:.3f} s")
+
+        for db in nights:
+            db.close()
@@ -0,0 +1,47 @@
+from photodiode import Keysight
+from photodiode.autorange import AutoRanger
+from photodiode.simulator import SimulatedB2983B
+import time
+
+# Range finding with probes against the simulated B2983B (no hardware needed).
+# The exposure settings must survive the probes and the instrument must not
+# report an error (the simulator rejects out of range trigger periods).
+
+SETTINGS = {'rang': 'AUTO', 'nplc': 1, 'nsamples': 200, 'interval': 0.02}
+
+def make_keysight(current):
+    k = Keysight(client=SimulatedB2983B(signal=lambda t: current + 0 * t, seed=42))
+    k.sync_tracked_properties()
+    k.set_mode('CURR')
+    for p, value in SETTINGS.items():
+        getattr(k, f'set_{p}')(value)
+    k.on()
+    return k
+
+if __name__ == "__main__":
+    for current in [5e-12, 3e-10, 1e-6]:
+        k = make_keysight(current)
+        ranger = AutoRanger(k)
+        t0 = time.perf_counter()
+        rang = ranger.find_range(position=(30, 270))
+        dt = time.perf_counter() - t0
+        assert rang >= current / ranger.headroom
+        assert k.check_errors() == []
+        assert {p: k.params[p] for p in ['nplc', 'nsamples', 'interval']} == \
+            {p: SETTINGS[p] for p in ['nplc', 'nsamples', 'interval']}
+        assert k.params['rang'] == rang
+
+        # a second search at the same position starts from the range found
+        ranger.find_range(position=(30, 270))
+        assert k.check_errors() == []
+
+        # a single probe puts back every setting, the range included
+        k.set_rang('AUTO')
+        ranger.probe(rang)
+        assert {p: k.params[p] for p in SETTINGS} == SETTINGS
+        print(f"{current:8.1e} A: range {rang:.0e} in {dt * 1e3:6.1f} ms, {ranger.nprobes} probes")
+
+        # the exposure after the range finding
+        k.set_rang(rang)
+        k.acquire()
+        assert len(k.read_data()) == SETTINGS['nsamples']
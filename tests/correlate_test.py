@@ -0,0 +1,52 @@
+from skyhunter import IoptronMount
+from skyhunter.simulator import SimulatedSerial
+from photodiode import Keysight, AcquisitionClock
+from photodiode.correlate import correlate
+from photodiode.simulator import SimulatedB2983B
+import numpy as np
+import time
+
+# Per-sample pointing of an acquisition taken while the mount slews in azimuth,
+# against the mount and electrometer simulators (no hardware needed).
+
+SLEW_TIME = 4 # sec
+NSAMPLES = 100
+INTERVAL = 0.02 # sec
+
+if __name__ == "__main__":
+    ser = SimulatedSerial(latency=2e-3, jitter=0.5e-3, seed=42)
+    mount = IoptronMount('sim', ser=ser)
+    recorder = mount.start_telemetry(interval=0.05)
+
+    k = Keysight(client=SimulatedB2983B())
+    k.sync_tracked_properties()
+    k.on()
+    k.set_mode('CURR')
+    k.set_nplc(1)
+    k.set_nsamples(NSAMPLES)
+    k.set_delay(0)
+    k.set_interval(INTERVAL)
+
+    mount.slew_right(SLEW_TIME, is_freerun=True)
+    time.sleep(0.5)
+    k.acquire()
+    d = k.read_data()
+    time.sleep(0.2) # the track must cover the last sample
+    mount.stop_telemetry()
+
+    clock = AcquisitionClock.from_keysight(k, d)
+    samples = correlate(d, clock, recorder.latest())
+
+    # true pointing of the simulated mount at the host time of each sample
+    monotonic_offset = time.time() - time.monotonic()
+    true_alt, true_az = np.array([ser.model.position(t - monotonic_offset) for t in samples.host_time]).T
+    true_az = np.array([mount.offset_az(az) for az in true_az])
+    error = np.abs(samples.az - true_az) * 3600
+
+    print(clock)
+    print(f"Trigger marker +/- {1e3*k.t_trigger_err:.3f} ms, "
+          f"completion window {1e3*(k.t_complete[1] - k.t_complete[0]):.3f} ms")
+    print(f"Scan from az {samples.az[0]:.3f} to {samples.az[-1]:.3f} deg in {d['time'][-1]:.2f} s")
+    print(f"Per-sample azimuth error: median {np.nanmedian(error):.1f}, max {np.nanmax(error):.1f} arcsec")
+    print(f"Azimuth error of one position read after the exposure: "
+          f"{np.nanmean(np.abs(mount.offset_az(ser.model.position()[1]) - true_az)) * 3600:.1f} arcsec")
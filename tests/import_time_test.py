@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+# Import time of the packages, measured with `python -X importtime` (no hardware needed).
+# The stop/park scripts only import skyhunter.IoptronMount: it should not load
+# astropy, numpy, asyncio or pyvisa.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NRUNS = 5
+HEAVY = ['astropy', 'numpy', 'asyncio', 'pyvisa', 'pandas']
+
+STATEMENTS = {
+    'stop/park script': 'from skyhunter import IoptronMount',
+    'async mount': 'from skyhunter import AsyncIoptronMount',
+    'photodiode package': 'import photodiode',
+    'electrometer': 'from photodiode import Keysight',
+}
+
+def import_time(statement):
+    """
+    Run the statement in a fresh interpreter.
+
+    Returns:
+        float: The cumulative import time in ms (best of NRUNS).
+        list: The (cumulative time in ms, module) of the 5 slowest top-level imports.
+        list: The heavy packages loaded.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    check = f"import sys; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    best = None
+    for _ in range(NRUNS):
+        out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'{statement}; {check}'],
+                             capture_output=True, text=True, env=env, cwd=ROOT)
+        # import time: self [us] | cumulative | imported package
+        imports = []
+        for line in out.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            # top-level imports are not indented
+            if not name[1:].startswith(' '):
+                imports.append((int(cumulative) / 1e3, name.strip()))
+        total = sum(t for t, _ in imports)
+        if best is None or total < best[0]:
+            loaded = [m for m in out.stdout.strip().split(',') if m]
+            best = (total, sorted(imports, reverse=True)[:5], loaded)
+    return best
+
+if __name__ == "__main__":
+    print(f"Import time (best of {NRUNS} runs)")
+    for label, statement in STATEMENTS.items():
+        total, slowest, loaded = import_time(statement)
+        print(f"\n{label:>20s}: {total:8.1f} ms   `{statement}`")
+        print(f"{'heavy packages':>20s}: {', '.join(loaded) or 'none'}")
+        for t, name in slowest:
+            print(f"{'':>20s}  {t:8.1f} ms  {name}")
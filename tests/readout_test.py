@@ -0,0 +1,36 @@
+from photodiode import Keysight
+from photodiode.simulator import SimulatedB2983B
+import numpy as np
+import time
+
+# Electrometer readout time against the simulated B2983B (no hardware needed)
+
+NSAMPLES = 5500
+NREPEAT = 5
+
+def time_readout(k, nrepeat=NREPEAT, combined=True):
+    """Return the mean readout time in ms of the last acquisition."""
+    dt = np.zeros(nrepeat)
+    for i in range(nrepeat):
+        t0 = time.perf_counter()
+        res = k.read_data(combined=combined)
+        dt[i] = time.perf_counter() - t0
+    assert len(res) == NSAMPLES
+    return 1e3 * dt.mean()
+
+if __name__ == "__main__":
+    k = Keysight(client=SimulatedB2983B(seed=42))
+    k.sync_tracked_properties()
+    k.set_mode('CURR')
+    k.set_nplc(0.01)
+    k.set_interval(2e-4)
+    k.set_nsamples(NSAMPLES)
+    k.on()
+    k.acquire()
+
+    print(f"Readout of {NSAMPLES} samples (time and current)")
+    for data_format in ['ASC', 'REAL,32', 'REAL,64']:
+        k.set_data_format(data_format)
+        separate = time_readout(k, combined=False)
+        combined = time_readout(k, combined=True)
+        print(f"{data_format:>8s}: {separate:8.2f} ms separate queries, {combined:8.2f} ms combined")
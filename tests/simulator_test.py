@@ -0,0 +1,44 @@
+from skyhunter import IoptronMount
+from skyhunter.simulator import SimulatedSerial
+from dynamical_test import IoptronMountTest
+import numpy as np
+import time
+
+# Control loop throughput against the mount simulator (no hardware needed)
+
+LATENCY = 2e-3 # sec
+JITTER = 0.5e-3 # sec
+NCALLS = 200
+
+def time_calls(func, ncalls=NCALLS):
+    """Return the mean and std time per call in ms."""
+    dt = np.zeros(ncalls)
+    for i in range(ncalls):
+        t0 = time.perf_counter()
+        func()
+        dt[i] = time.perf_counter() - t0
+    return 1e3 * dt.mean(), 1e3 * dt.std()
+
+def legacy_gac(mount):
+    mount.scope.send(":GAC#")
+    return mount.scope.recv()
+
+if __name__ == "__main__":
+    mount = IoptronMount('sim', ser=SimulatedSerial(latency=LATENCY, jitter=JITTER, seed=42))
+
+    print(f"Round trip per call over {NCALLS} calls (latency {1e3*LATENCY} ms, jitter {1e3*JITTER} ms)")
+    results = {
+        'send/recv :GAC#': time_calls(lambda: legacy_gac(mount), ncalls=20),
+        'query :GAC#': time_calls(lambda: mount.commands.execute(":GAC#")),
+        'query :GLS#': time_calls(lambda: mount.commands.execute(":GLS#")),
+        'get_current_alt_az': time_calls(lambda: mount.get_current_alt_az(verbose=False)),
+        'pipeline :SR9#,:qD#,:GAC#': time_calls(lambda: mount.pipeline(":SR9#", ":qD#", ":GAC#")),
+    }
+    for name, (mean, std) in results.items():
+        print(f"{name:>30s}: {mean:7.3f} +/- {std:6.3f} ms")
+
+    # the dome tests run unchanged against the simulated mount
+    mount_test = IoptronMountTest(mount)
+    slew = mount_test.slew_fixed_duration_test(1.4, 3, direction='alt', pauseTime=0.2)
+    print("Slew Speed Test Result:", slew['slew_speed'])
+    print(f"Test duration: {slew['test_duration']:.2f} seconds.")
@@ -0,0 +1,72 @@
+from photodiode import Keysight
+from photodiode.async_keysight import AsyncKeysight
+from photodiode.keysight_usb import TRACE_POINTS
+from photodiode.simulator import SimulatedB2983B
+import numpy as np
+import asyncio
+import contextlib
+
+# Streaming from the trace buffer against the simulated B2983B (no hardware needed).
+# The trigger delay leaves the first reads of the buffer empty.
+
+def make_keysight(delay):
+    k = Keysight(client=SimulatedB2983B(seed=42))
+    k.sync_tracked_properties()
+    k.set_mode('CURR')
+    k.set_nplc(0.01)
+    k.set_interval(2e-4)
+    k.set_delay(delay)
+    k.on()
+    return k
+
+def check_stream(chunks, nsamples, k):
+    data = np.concatenate(chunks)
+    assert len(data) == nsamples
+    assert np.all(np.diff(data['time']) > 0)
+    assert k.stream_stats.n == nsamples
+    assert np.isclose(k.stream_stats.mean, data['CURR'].mean())
+    return data
+
+async def async_stream(k, nsamples, chunk_interval, nchunks=None):
+    chunks = []
+    async with AsyncKeysight(keysight=k) as ak:
+        # aclosing: leaving the loop ends the stream now, not when the generator is collected
+        async with contextlib.aclosing(ak.stream(nsamples, chunk_interval=chunk_interval)) as stream:
+            async for chunk in stream:
+                chunks.append(chunk)
+                if len(chunks) == nchunks:
+                    break
+    return chunks
+
+def check_acquire(k, nsamples):
+    """A normal acquisition after a stream left early."""
+    assert k.params['nsamples'] == nsamples
+    k.acquire()
+    assert len(k.read_data()) == nsamples
+    assert k.check_errors() == []
+
+if __name__ == "__main__":
+    for delay, nsamples in [(0.5, 100), (0.5, 2000), (0.0, TRACE_POINTS + 500)]:
+        k = make_keysight(delay)
+        chunks = list(k.stream(nsamples, chunk_interval=0.1))
+        check_stream(chunks, nsamples, k)
+        print(f"delay {delay} s, {nsamples:6d} samples: {len(chunks)} chunks")
+
+        k = make_keysight(delay)
+        k.invalidate()
+        chunks = asyncio.run(async_stream(k, nsamples, chunk_interval=0.1))
+        check_stream(chunks, nsamples, k)
+        print(f"delay {delay} s, {nsamples:6d} samples: {len(chunks)} chunks (async)")
+
+    # leaving a stream after the first chunk aborts it and restores the settings
+    k = make_keysight(0.0)
+    k.set_nsamples(50)
+    for chunk in k.stream(20000, chunk_interval=0.1):
+        break
+    check_acquire(k, 50)
+
+    k = make_keysight(0.0)
+    k.set_nsamples(50)
+    asyncio.run(async_stream(k, 20000, chunk_interval=0.1, nchunks=1))
+    check_acquire(k, 50)
+    print("stream left after the first chunk: settings restored, acquisition ok")
@@ -0,0 +1,69 @@
+from twmdb import TraceStore
+import numpy as np
+import tempfile
+import time
+import os
+
+# Random access to electrometer traces in the memory-mapped TraceStore vs one
+# .npy file per exposure (no hardware needed).
+
+NTRACES = 2000
+NSAMPLES = 5000
+NREADS = 500
+
+def anonymous_rss_mb():
+    """Resident memory not backed by a file (Linux), the mapped traces are not counted."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(42)
+    t = np.arange(NSAMPLES) * 1e-3
+    with tempfile.TemporaryDirectory() as root:
+        store = TraceStore(os.path.join(root, '202408.traces'))
+        try:
+            TraceStore(store.path)
+            raise AssertionError("a second appender opened the store")
+        except IOError:
+            pass
+        t0 = time.perf_counter()
+        for seq_id in range(NTRACES):
+            data = np.rec.fromarrays([t, rng.normal(1e-9, 1e-12, NSAMPLES)], names=['time', 'CURR'])
+            store.append(20240821, seq_id, data)
+            np.save(os.path.join(root, f'20240821_{seq_id}.npy'), data)
+        print(f"Wrote {NTRACES} traces of {NSAMPLES} samples in {time.perf_counter() - t0:.2f} s "
+              f"({os.path.getsize(store.path) / 2**20:.0f} MiB data file)")
+        store.close()
+
+        # a fresh reader, as in a reprocessing job
+        store = TraceStore(os.path.join(root, '202408.traces'), mode='r')
+        seq_ids = rng.integers(0, NTRACES, NREADS)
+
+        t0 = time.perf_counter()
+        npy = [np.load(os.path.join(root, f'20240821_{seq_id}.npy'))['CURR'][:10].sum() for seq_id in seq_ids]
+        npy_time = 1e6 * (time.perf_counter() - t0) / NREADS
+
+        t0 = time.perf_counter()
+        mapped = [store.get(20240821, seq_id)['CURR'][:10].sum() for seq_id in seq_ids]
+        store_time = 1e6 * (time.perf_counter() - t0) / NREADS
+        assert np.allclose(npy, mapped)
+
+        # holding every trace of the night
+        rss0 = anonymous_rss_mb()
+        npy_traces = [np.load(os.path.join(root, f'20240821_{seq_id}.npy')) for seq_id in range(NTRACES)]
+        npy_rss = anonymous_rss_mb() - rss0
+        del npy_traces
+        rss0 = anonymous_rss_mb()
+        store_traces = [store.get(20240821, seq_id) for seq_id in range(NTRACES)]
+        store_rss = anonymous_rss_mb() - rss0
+        del store_traces
+        store.close()
+
+    print(f"Read the first 10 samples of a random trace ({NREADS} reads)")
+    print(f"{'np.load':>14s}: {npy_time:8.1f} us")
+    print(f"{'TraceStore':>14s}: {store_time:8.1f} us")
+    print(f"Memory holding all the {NTRACES * NSAMPLES * 16 / 2**20:.0f} MiB of traces")
+    print(f"{'np.load':>14s}: {npy_rss:8.1f} MiB")
+    print(f"{'TraceStore':>14s}: {store_rss:8.1f} MiB")
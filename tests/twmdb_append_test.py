@@ -0,0 +1,51 @@
+from twmdb import TwilightMonitorDatabase
+from datetime import datetime
+import numpy as np
+import tempfile
+import time
+import os
+
+# Bookkeeping time per exposure (add_exposure + save, as in helper.start_measurement)
+# over a night, rewrite storage vs append-only storage (no hardware needed).
+
+NEXPOSURES = 3000
+REPORT = [10, 100, 1000, 3000]
+
+def run_night(root, storage, nexposures=NEXPOSURES, **kwargs):
+    """Return the time in ms of each exposure and the reloaded database."""
+    db = TwilightMonitorDatabase(21, 8, 2024, path=root, electrometer_path=os.path.join(root, 'electrometer'),
+                                 mount_path=os.path.join(root, 'mount'), storage=storage, **kwargs)
+    dt = np.zeros(nexposures)
+    for i in range(nexposures):
+        t0 = time.perf_counter()
+        db.add_exposure(timestamp=datetime.utcnow(), alt=45.0, az=float(i % 360), exp_time_cmd=2.,
+                        exp_time=1.98, filter_type='SDSSr', current_mean=1e-9, current_std=1e-12)
+        db.save()
+        dt[i] = time.perf_counter() - t0
+    db.update_exposure(seq_id=5, flag=True)
+    db.close()
+
+    db = TwilightMonitorDatabase(21, 8, 2024, path=root, electrometer_path=os.path.join(root, 'electrometer'),
+                                 mount_path=os.path.join(root, 'mount'), storage=storage, **kwargs)
+    return 1e3 * dt, db
+
+if __name__ == "__main__":
+    results = {}
+    for label, storage, kwargs in [('rewrite', 'rewrite', {}),
+                                   ('append csv', 'append', {}),
+                                   ('append frames', 'append', {'log_format': 'frames'}),
+                                   ('append csv fsync', 'append', {'fsync': 'always'})]:
+        with tempfile.TemporaryDirectory() as root:
+            nexposures = 1000 if storage == 'rewrite' else NEXPOSURES
+            dt, db = run_night(root, storage, nexposures, **kwargs)
+            database = db.database
+            assert len(database) == nexposures and database['seq_id'].is_unique
+            assert bool(database.loc[database.seq_id == 5, 'flag'].iloc[0])
+            results[label] = dt
+            db.close()
+
+    print("Bookkeeping time per exposure (ms), at exposure number")
+    print(f"{'':>18s}" + ''.join(f"{n:>10d}" for n in REPORT))
+    for label, dt in results.items():
+        print(f"{label:>18s}" + ''.join(f"{np.median(dt[max(0, n - 10):n]):10.3f}" if n <= len(dt) else f"{'-':>10s}"
+                                        for n in REPORT))
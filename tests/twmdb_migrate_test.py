@@ -0,0 +1,40 @@
+from twmdb import TwilightMonitorDatabase, SQLiteMonitorDatabase
+from twmdb.migrate import migrate_csv
+from datetime import datetime, timedelta
+import tempfile
+import os
+
+# Migration of the CSV catalogs into SQLite (no hardware needed). The evening
+# twilight of a night passes 00:00 UTC, so the tmid of its last exposures is
+# the next day: they must still be imported into the night of the database.
+
+NEXPOSURES = 10
+
+def make_night(root, day, start, save=True):
+    """A night of exposures every 10 min from `start` (UTC), saved or only in the tmp files."""
+    db = TwilightMonitorDatabase(day, 8, 2024, path=root, electrometer_path=os.path.join(root, 'electrometer'),
+                                 mount_path=os.path.join(root, 'mount'))
+    for i in range(NEXPOSURES):
+        db.add_exposure(timestamp=start + timedelta(minutes=10 * i), alt=45.0, az=float(i))
+    if save:
+        db.close()
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as root:
+        # saved night, exposures from 23:00 to 00:30 UTC
+        make_night(root, 20, datetime(2024, 8, 20, 23, 0))
+        # night not saved (crash), only the tmp files: exposures from 23:30 to 01:00 UTC
+        make_night(root, 21, datetime(2024, 8, 21, 23, 30), save=False)
+        count = migrate_csv(os.path.join(root, 'DATA'), verbose=False)
+
+        db = SQLiteMonitorDatabase(21, 8, 2024, path=root, electrometer_path=os.path.join(root, 'electrometer'),
+                                   mount_path=os.path.join(root, 'mount'))
+        for night in ['20240820', '20240821']:
+            exposures = db.select(nights=night)
+            assert list(exposures['seq_id']) == list(range(1, NEXPOSURES + 1)), night
+            after_midnight = exposures['tmid'].astype(str).str[:8] != night
+            print(f"{night}: {len(exposures)} exposures, {after_midnight.sum()} after 00:00 UTC")
+            assert after_midnight.any()
+        assert db.select(nights='20240822').empty
+        db.close()
+    print(f"Imported {count} exposures")
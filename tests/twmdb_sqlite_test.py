@@ -0,0 +1,62 @@
+from twmdb import TwilightMonitorDatabase, SQLiteMonitorDatabase
+from twmdb.migrate import migrate_csv
+from datetime import datetime, timedelta
+import pandas as pd
+import numpy as np
+import tempfile
+import glob
+import time
+import os
+
+# Multi-night selections from the per-day CSV catalogs vs the SQLite catalog
+# (no hardware needed). The CSV catalogs are migrated with twmdb.migrate.
+
+NNIGHTS = 30
+NEXPOSURES = 300 # per night
+FILTERS = ['Empty', 'SDSSr', 'SDSSg']
+
+def make_month(root):
+    rng = np.random.default_rng(42)
+    for day in range(1, NNIGHTS + 1):
+        db = TwilightMonitorDatabase(day, 8, 2024, path=root, electrometer_path=os.path.join(root, 'electrometer'),
+                                     mount_path=os.path.join(root, 'mount'), storage='append')
+        for i in range(NEXPOSURES):
+            db.add_exposure(timestamp=datetime(2024, 8, day, 22) + timedelta(seconds=5 * i),
+                            alt=rng.uniform(20, 90), az=rng.uniform(0, 360), filter_type=FILTERS[i % 3],
+                            current_mean=rng.lognormal(-20, 1))
+        db.close()
+
+def select_csv(data_path, filter_type, alt_range):
+    files = sorted(glob.glob(os.path.join(data_path, '202408', '202408[0-9][0-9].csv')))
+    database = pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
+    return database[(database['filter'] == filter_type) & database['Alt'].between(*alt_range)]
+
+def best_time(func, nruns=5):
+    dt = []
+    for _ in range(nruns):
+        t0 = time.perf_counter()
+        result = func()
+        dt.append(time.perf_counter() - t0)
+    return 1e3 * min(dt), result
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as root:
+        make_month(root)
+        data_path = os.path.join(root, 'DATA')
+        t0 = time.perf_counter()
+        count = migrate_csv(data_path, verbose=False)
+        print(f"Migrated {count} exposures in {time.perf_counter() - t0:.2f} s")
+
+        db = SQLiteMonitorDatabase(15, 8, 2024, path=root, electrometer_path=os.path.join(root, 'electrometer'),
+                                   mount_path=os.path.join(root, 'mount'))
+        csv_time, csv_selection = best_time(lambda: select_csv(data_path, 'SDSSr', (40, 50)))
+        sql_time, sql_selection = best_time(lambda: db.select(nights=('20240801', '20240831'),
+                                                              filter_type='SDSSr', alt_range=(40, 50)))
+        assert len(csv_selection) == len(sql_selection)
+        seq_time, _ = best_time(lambda: db.select(nights='20240815', seq_id=150))
+        db.close()
+
+    print(f"Month selection (filter and altitude range, {len(sql_selection)} exposures)")
+    print(f"{'glob + read_csv':>20s}: {csv_time:8.2f} ms")
+    print(f"{'SQLite select':>20s}: {sql_time:8.2f} ms")
+    print(f"{'SQLite seq_id':>20s}: {seq_time:8.2f} ms")
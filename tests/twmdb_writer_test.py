@@ -0,0 +1,71 @@
+from twmdb import TwilightMonitorDatabase, SQLiteMonitorDatabase
+from datetime import datetime
+import numpy as np
+import tempfile
+import time
+import os
+
+# Time the acquisition thread spends on persistence per exposure with a slow
+# disk, synchronous writes vs the background writer (no hardware needed).
+# The slow disk is emulated by a delay in np.save and np.savez.
+
+NEXPOSURES = 100
+DISK_LATENCY = 0.02 # sec per file write
+NSAMPLES = 20000
+CADENCE = 0.05 # sec between exposures, the acquisition time
+
+np_save, np_savez = np.save, np.savez
+
+def slow_save(*args, **kwargs):
+    time.sleep(DISK_LATENCY)
+    np_save(*args, **kwargs)
+
+def slow_savez(*args, **kwargs):
+    time.sleep(DISK_LATENCY)
+    np_savez(*args, **kwargs)
+
+def run_night(root, cls=TwilightMonitorDatabase, **kwargs):
+    """Return the time in ms spent in the database calls of each exposure."""
+    db = cls(21, 8, 2024, path=root, electrometer_path=os.path.join(root, 'electrometer'),
+             mount_path=os.path.join(root, 'mount'), **kwargs)
+    rng = np.random.default_rng(42)
+    dt = np.zeros(NEXPOSURES)
+    for i in range(NEXPOSURES):
+        data = np.rec.fromarrays([np.arange(NSAMPLES) * 1e-3, rng.normal(1e-9, 1e-12, NSAMPLES)], names=['time', 'CURR'])
+        track = {'time': np.arange(10).astype('datetime64[s]'), 'alt': np.full(10, 45.), 'az': np.full(10, 90.)}
+        t0 = time.perf_counter()
+        db.add_exposure(timestamp=datetime.utcnow(), alt=45.0, az=float(i), exp_time_cmd=CADENCE)
+        db.save_electrometer_file(data)
+        db.save_mount_file(track)
+        db.save()
+        dt[i] = time.perf_counter() - t0
+        time.sleep(CADENCE) # the next acquisition
+    t0 = time.perf_counter()
+    writer = db.writer
+    db.close()
+    close_time = time.perf_counter() - t0
+
+    # every write is on disk, in order
+    db = cls(21, 8, 2024, path=root, electrometer_path=os.path.join(root, 'electrometer'),
+             mount_path=os.path.join(root, 'mount'), **{k: v for k, v in kwargs.items() if k != 'background'})
+    database = db.database
+    assert len(database) == NEXPOSURES and list(database['seq_id']) == list(range(1, NEXPOSURES + 1))
+    assert all(os.path.exists(f) for f in database['electrometer_filename'])
+    db.close()
+    return 1e3 * dt, close_time, writer
+
+if __name__ == "__main__":
+    np.save, np.savez = slow_save, slow_savez
+    print(f"Persistence time per exposure on the acquisition thread (ms), disk latency {1e3*DISK_LATENCY:.0f} ms")
+    for label, cls, kwargs in [('rewrite', TwilightMonitorDatabase, {}),
+                               ('rewrite background', TwilightMonitorDatabase, {'background': True}),
+                               ('append', TwilightMonitorDatabase, {'storage': 'append'}),
+                               ('append background', TwilightMonitorDatabase, {'storage': 'append', 'background': True}),
+                               ('sqlite', SQLiteMonitorDatabase, {}),
+                               ('sqlite background', SQLiteMonitorDatabase, {'background': True})]:
+        with tempfile.TemporaryDirectory() as root:
+            dt, close_time, writer = run_night(root, cls, **kwargs)
+        stats = f"median {np.median(dt):7.2f}  max {dt.max():7.2f}  close {1e3*close_time:7.1f}"
+        if writer is not None:
+            stats += f"  batches {writer.batches}  max queue {writer.max_depth}  blocked {1e3*writer.blocked_time:.1f} ms"
+        print(f"{label:>20s}: {stats}")
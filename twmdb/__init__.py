@@ -1,7 +1,20 @@
 # Import specific classes or functions from each module
 from .twmdb import TwilightMonitorDatabase
+from .exposure_log import ExposureTable, ExposureLog
+from .sqlite_db import SQLiteMonitorDatabase
+from .trace_store import TraceStore
+from .writer import BackgroundWriter
+from .archive import ArchiveWriter, ArchiveReader, archive_night
 
 # You can also define an __all__ list to control what's exported
 __all__ = [
-    'TwilightMonitorDatabase'
+    'TwilightMonitorDatabase',
+    'ExposureTable',
+    'ExposureLog',
+    'SQLiteMonitorDatabase',
+    'TraceStore',
+    'BackgroundWriter',
+    'ArchiveWriter',
+    'ArchiveReader',
+    'archive_night',
 ]
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""
+Append-only storage of the exposure catalog.
+
+ExposureTable keeps the catalog in memory as one preallocated NumPy array
+per column, doubled when full, so adding an exposure costs the same on the
+first and on the thousandth exposure of a night (`pd.concat` copies the whole
+table every time). ExposureLog appends each exposure to the day file as one
+record instead of rewriting the file: a CSV line, or a framed binary record
+(length, CRC32 and a JSON payload) that survives a torn last write.
+
+Records are never rewritten: an updated exposure is appended again and the
+last record of each seq_id wins when the log is read back.
+
+Example:
+    table = ExposureTable()
+    log = ExposureLog('20240821.csv', fsync='close')
+    for row in ExposureLog.read('20240821.csv'):
+        table.put(row)
+
+    table.put(row)       # new exposure
+    log.append(row)
+    log.close()
+"""
+import csv
+import json
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+# columns of the catalog and their dtype in ExposureTable
+COLUMNS = {
+    'tmid': object,
+    'date': object,
+    'seq_id': np.int64,
+    'exp_time_cmd': np.float64,
+    'exp_time': np.float64,
+    'filter': object,
+    'Alt': np.float64,
+    'Az': np.float64,
+    'current_mean': np.float64,
+    'current_std': np.float64,
+    'alt_std': np.float64,
+    'az_std': np.float64,
+    'alt_rank': np.int64,
+    'az_rank': np.int64,
+    'electrometer_filename': object,
+    'mount_filename': object,
+    'flag': bool,
+}
+
+# value of a column missing from a record
+DEFAULTS = {
+    np.float64: np.nan,
+    np.int64: -99,
+    bool: False,
+    object: None,
+}
+
+FRAME_HEADER = struct.Struct('<II') # payload length, CRC32 of the payload
+
+
+class ExposureTable:
+    """In-memory exposure catalog stored as preallocated columns.
+
+    Args:
+        columns (dict, optional): column names and dtypes. Defaults to COLUMNS.
+        capacity (int, optional): initial number of rows, doubled when full.
+    """
+    def __init__(self, columns=COLUMNS, capacity=1024):
+        self.columns = dict(columns)
+        self.capacity = capacity
+        self.size = 0
+        self.data = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.columns.items()}
+        self.index = {} # seq_id -> row
+        self.version = 0 # incremented on each change, see TwilightMonitorDatabase.database
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, seq_id):
+        return int(seq_id) in self.index
+
+    def _grow(self):
+        self.capacity *= 2
+        for name, column in self.data.items():
+            grown = np.empty(self.capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.data[name] = grown
+
+    def _set(self, i, name, value):
+        dtype = self.columns[name]
+        if value is None or (dtype is not object and isinstance(value, str) and value == ''):
+            value = DEFAULTS[dtype]
+        elif dtype is bool and isinstance(value, str):
+            value = value == 'True'
+        self.data[name][i] = value
+
+    def put(self, row):
+        """Add an exposure, or replace the exposure with the same seq_id.
+
+        Args:
+            row (dict): the values of the exposure, missing columns take their default.
+
+        Returns:
+            int: the row of the exposure.
+        """
+        seq_id = int(row['seq_id'])
+        i = self.index.get(seq_id)
+        if i is None:
+            if self.size == self.capacity:
+                self._grow()
+            i = self.size
+            self.size += 1
+            self.index[seq_id] = i
+        for name, dtype in self.columns.items():
+            self._set(i, name, row.get(name, DEFAULTS[dtype]))
+        self.version += 1
+        return i
+
+    def update(self, seq_id, **values):
+        """Change some columns of an exposure, unknown columns are ignored.
+
+        Raises:
+            KeyError: if the seq_id is not in the table.
+        """
+        i = self.index[int(seq_id)]
+        for name, value in values.items():
+            if name in self.columns:
+                self._set(i, name, value)
+        self.version += 1
+
+    def get(self, seq_id):
+        """The exposure with this seq_id as a dict."""
+        i = self.index[int(seq_id)]
+        return {name: self.data[name][i].item() if self.columns[name] is not object else self.data[name][i]
+                for name in self.columns}
+
+    def max_seq_id(self):
+        return max(self.index) if self.index else 0
+
+    def to_dataframe(self):
+        """Copy of the table as a pandas DataFrame."""
+        import pandas as pd
+        return pd.DataFrame({name: column[:self.size].copy() for name, column in self.data.items()})
+
+
+class ExposureLog:
+    """Append-only file of exposure records.
+
+    Args:
+        path (str): the log file, created if needed.
+        columns (list, optional): column order of the CSV records. Defaults to COLUMNS.
+        format (str, optional): 'csv' (one line per record, readable by pandas) or
+            'frames' (framed binary records). Defaults to 'csv'.
+        fsync (str or float, optional): when the records are forced to disk:
+            'always' after each record, 'close' on close only, 'never', or a number
+            of seconds between fsyncs. Records are always handed to the OS on append.
+    """
+    def __init__(self, path, columns=COLUMNS, format='csv', fsync='close'):
+        if format not in ('csv', 'frames'):
+            raise ValueError("Invalid format. Choose from 'csv', 'frames'.")
+        if not (fsync in ('always', 'close', 'never') or isinstance(fsync, (int, float))):
+            raise ValueError("Invalid fsync policy. Choose from 'always', 'close', 'never' or a number of seconds.")
+        self.path = path
+        self.columns = list(columns)
+        self.format = format
+        self.fsync = fsync
+        self.nrecords = 0 # records appended by this log
+        self.last_fsync = time.monotonic()
+
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a' if format == 'csv' else 'ab', newline='' if format == 'csv' else None)
+        if format == 'csv':
+            self.writer = csv.writer(self.file)
+            if new:
+                self.writer.writerow(self.columns)
+                self.file.flush()
+
+    def append(self, row):
+        """Append one record and apply the fsync policy."""
+        if self.format == 'csv':
+            self.writer.writerow(['' if row.get(name) is None else row.get(name) for name in self.columns])
+        else:
+            payload = json.dumps(row, default=str).encode('utf-8')
+            self.file.write(FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self.nrecords += 1
+        self.file.flush()
+        if self.fsync == 'always':
+            self.sync()
+        elif self.fsync not in ('close', 'never') and time.monotonic() - self.last_fsync >= self.fsync:
+            self.sync()
+
+    def sync(self):
+        """Force the records to disk."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_fsync = time.monotonic()
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.fsync != 'never':
+            self.sync()
+        self.file.close()
+
+    @staticmethod
+    def read(path, format='csv'):
+        """Read the records of a log file.
+
+        A torn or corrupted last frame (crash during a write) ends the read.
+
+        Returns:
+            list: one dict per record, in the order they were appended.
+        """
+        if not os.path.exists(path):
+            return []
+        if format == 'csv':
+            with open(path, newline='') as f:
+                return list(csv.DictReader(f))
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        records, offset = [], 0
+        while offset + FRAME_HEADER.size <= len(data):
+            size, crc = FRAME_HEADER.unpack_from(data, offset)
+            payload = data[offset + FRAME_HEADER.size:offset + FRAME_HEADER.size + size]
+            if len(payload) < size or zlib.crc32(payload) != crc:
+                print(f"{path}: corrupted record at byte {offset}, ignoring the rest of the log")
+                break
+            records.append(json.loads(payload))
+            offset += FRAME_HEADER.size + size
+        return records
@@ -0,0 +1,82 @@
+"""
+Import the CSV exposure catalogs into the SQLite catalog.
+
+Reads every day file DATA/YYYYMM/YYYYMMDD.csv (the last line of a seq_id
+wins, as in the append-only log), then the tmp/seq_id_NNNN.csv files for the
+exposures missing from the day files (a night that was not saved). The
+night of a tmp row is read from its mount or electrometer file name, which
+carry the night of the database (tmid is UTC and passes midnight during the
+evening twilight). The import is one transaction and can be run again:
+existing rows are replaced.
+
+Usage:
+    python -m twmdb.migrate /path/to/DATA [--db /path/to/DATA/twmdb.sqlite]
+"""
+import argparse
+import glob
+import logging
+import os
+import re
+
+from .exposure_log import ExposureLog
+from .sqlite_db import INSERT, connect, sql_row
+
+# the night in the file names of TwilightMonitorDatabase.mount_str and electrometer_str
+FILENAME_NIGHT = {
+    'mount_filename': re.compile(r'mount_pointing_(\d{8})_\d+$'),
+    'electrometer_filename': re.compile(r'(\d{8})_\d+\.npy$'),
+}
+
+
+def row_night(row):
+    """The night YYYYMMDD of a catalog row from its file names, None if unknown."""
+    for column, pattern in FILENAME_NIGHT.items():
+        match = pattern.search(os.path.basename(str(row.get(column) or '')))
+        if match:
+            return match.group(1)
+    return None
+
+
+def migrate_csv(data_path, db_file=None, verbose=True):
+    """Import the CSV catalogs under data_path into a SQLite catalog.
+
+    Args:
+        data_path (str): the DATA folder of TwilightMonitorDatabase.
+        db_file (str, optional): the SQLite catalog. Defaults to data_path/twmdb.sqlite.
+        verbose (bool, optional): print a line per file.
+
+    Returns:
+        int: the number of exposures imported.
+    """
+    db_file = db_file or os.path.join(data_path, 'twmdb.sqlite')
+    connection = connect(db_file)
+    count = 0
+    with connection:
+        for file_path in sorted(glob.glob(os.path.join(data_path, '[0-9]' * 6, '[0-9]' * 8 + '.csv'))):
+            night = os.path.basename(file_path)[:8]
+            rows = {int(float(row['seq_id'])): row for row in ExposureLog.read(file_path)}
+            connection.executemany(INSERT, [sql_row(night, row) for row in rows.values()])
+            count += len(rows)
+            if verbose: print(f"{file_path}: {len(rows)} exposures")
+
+        # exposures only in the tmp files, the tmp folder is shared by the nights of a month
+        insert = INSERT.replace('INSERT OR REPLACE', 'INSERT OR IGNORE')
+        for file_path in sorted(glob.glob(os.path.join(data_path, '[0-9]' * 6, 'tmp', 'seq_id_*.csv'))):
+            for row in ExposureLog.read(file_path):
+                night = row_night(row)
+                if night is None:
+                    logging.warning(f"{file_path}: night unknown, not imported")
+                    if verbose: print(f"{file_path}: night unknown, not imported")
+                    continue
+                count += connection.execute(insert, sql_row(night, row)).rowcount
+    connection.close()
+    if verbose: print(f"Imported {count} exposures into {db_file}")
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('data_path', help='the DATA folder of the CSV catalogs')
+    parser.add_argument('--db', default=None, help='the SQLite catalog (default: DATA/twmdb.sqlite)')
+    args = parser.parse_args()
+    migrate_csv(args.data_path, args.db)
@@ -0,0 +1,259 @@
+"""
+SQLite backend of the exposure catalog.
+
+SQLiteMonitorDatabase has the API of TwilightMonitorDatabase but keeps the
+exposures of every night in one SQLite file (DATA/twmdb.sqlite by default),
+in WAL mode so that readers (analysis notebooks, a UI) never block the
+acquisition. The exposures are keyed by (night, seq_id), and indexed by
+seq_id, tmid, (Alt, Az) and filter: deduplication, updates and multi-night
+selections are index lookups instead of scans of per-day CSV files.
+
+Existing CSV catalogs are imported with twmdb.migrate.
+
+Example:
+    db = SQLiteMonitorDatabase(21, 8, 2024, path=databaseRoot)
+    db.add_exposure(timestamp=datetime.utcnow(), alt=45.0, az=90.0, filter_type='SDSSr')
+    db.update_exposure(db.seq_id, current_mean=1e-9)
+    db.select(nights=('20240801', '20240831'), filter_type='SDSSr', alt_range=(30, 60))
+    db.close()
+"""
+import logging
+import sqlite3
+import threading
+
+import numpy as np
+
+from .exposure_log import COLUMNS
+from .twmdb import TwilightMonitorDatabase, add_path
+
+SQL_TYPES = {
+    object: 'TEXT',
+    np.float64: 'REAL',
+    np.int64: 'INTEGER',
+    bool: 'INTEGER',
+}
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS exposures (night TEXT NOT NULL, "
+    + ', '.join(f'"{name}" {SQL_TYPES[dtype]}' for name, dtype in COLUMNS.items())
+    + ', PRIMARY KEY (night, seq_id))',
+    'CREATE INDEX IF NOT EXISTS idx_exposures_seq_id ON exposures (seq_id)',
+    'CREATE INDEX IF NOT EXISTS idx_exposures_tmid ON exposures (tmid)',
+    'CREATE INDEX IF NOT EXISTS idx_exposures_altaz ON exposures ("Alt", "Az")',
+    'CREATE INDEX IF NOT EXISTS idx_exposures_filter ON exposures ("filter")',
+]
+
+INSERT = ('INSERT OR REPLACE INTO exposures (night, ' + ', '.join(f'"{name}"' for name in COLUMNS)
+          + ') VALUES (' + ', '.join('?' * (len(COLUMNS) + 1)) + ')')
+
+
+def sql_value(dtype, value):
+    """Convert a catalog value to a type sqlite3 can bind (no NumPy scalars)."""
+    if value is None or (isinstance(value, str) and value == '' and dtype is not object):
+        return None
+    if dtype is object:
+        return str(value)
+    if dtype is bool:
+        return int(value == 'True') if isinstance(value, str) else int(bool(value))
+    if dtype is np.int64:
+        return int(float(value))
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def sql_row(night, row):
+    """Parameters of INSERT for one exposure."""
+    return [night] + [sql_value(dtype, row.get(name)) for name, dtype in COLUMNS.items()]
+
+
+def connect(db_file, synchronous='NORMAL'):
+    """Open the catalog file in WAL mode and create the table and indexes."""
+    connection = sqlite3.connect(db_file, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    # NORMAL: a commit does not wait for the disk, a power loss may lose the last commits
+    connection.execute(f'PRAGMA synchronous={synchronous}')
+    for statement in SCHEMA:
+        connection.execute(statement)
+    connection.commit()
+    return connection
+
+
+class SQLiteMonitorDatabase(TwilightMonitorDatabase):
+    """Catalog of the exposures of one night in a SQLite file shared by all nights.
+
+    Args:
+        day, month, year (int, optional): the night. Defaults to today.
+        path (str, optional): root of the DATA folder holding the catalog file.
+        electrometer_path (str, optional): root of the electrometer files.
+        mount_path (str, optional): root of the mount files.
+        db_file (str, optional): the catalog file. Defaults to DATA/twmdb.sqlite.
+        synchronous (str, optional): SQLite synchronous mode, 'FULL' to fsync
+            every commit. Defaults to 'NORMAL'.
+        trace_store (bool or str, optional): append the electrometer traces to the
+            month's TraceStore, 'r' to open it read only, see TwilightMonitorDatabase.
+            Defaults to False.
+        background (bool, optional): run the SQL writes on a BackgroundWriter
+            thread, committed once per batch. Defaults to False.
+        queue_size (int, optional): size of the background write queue. Defaults to 256.
+    """
+    STORAGES = ('sqlite',)
+
+    def __init__(self, day=None, month=None, year=None, path="/home/estevesjh/Documents/github/",
+                 electrometer_path="/home/estevesjh/Documents/twilightMonitor/DATA/keysighB2987A",
+                 mount_path='/home/estevesjh/Documents/twilightMonitor/DATA/mount/',
+                 db_file=None, synchronous='NORMAL', trace_store=False, background=False, queue_size=256):
+        self.db_file = db_file
+        self.synchronous = synchronous
+        self.connection = None
+        # the connection is shared with the background writer
+        self.lock = threading.Lock()
+        # exposures added or updated by this instance, the catalog rows are not
+        # read back while their writes may still be queued
+        self.rows = {}
+        super().__init__(day, month, year, path=path, electrometer_path=electrometer_path,
+                         mount_path=mount_path, storage='sqlite', trace_store=trace_store,
+                         background=background, queue_size=queue_size)
+
+    @property
+    def database(self):
+        """The exposures of the night as a DataFrame."""
+        if self.connection is None:
+            return None
+        return self.select(nights=self.date_str)
+
+    @database.setter
+    def database(self, value):
+        # the catalog lives in the file
+        pass
+
+    def init_paths(self, path, electrometer_path, mount_path):
+        super().init_paths(path, electrometer_path, mount_path)
+        if self.db_file is None:
+            self.db_file = add_path(self.data, "twmdb.sqlite")
+
+    def load_database(self):
+        self.connection = connect(self.db_file, self.synchronous)
+        self.set_seq_id(self.max_seq_id())
+        logging.info(f"Opened {self.db_file} for {self.date_str}")
+
+    def max_seq_id(self):
+        seq_id, = self.connection.execute('SELECT MAX(seq_id) FROM exposures WHERE night = ?',
+                                          (self.date_str,)).fetchone()
+        return seq_id or 0
+
+    def _execute(self, sql, params=()):
+        with self.lock:
+            return self.connection.execute(sql, params)
+
+    def _commit(self):
+        with self.lock:
+            self.connection.commit()
+
+    def after_batch(self):
+        # one commit per batch of background writes
+        self._commit()
+
+    def insert_exposure(self, row):
+        if self.writer is not None:
+            self.rows[int(row['seq_id'])] = dict(row, night=self.date_str)
+        self._io(self._execute, INSERT, sql_row(self.date_str, row))
+
+    def update_exposure(self, seq_id, **kwargs):
+        values = {key: value for key, value in kwargs.items() if key in COLUMNS}
+        assignments = ', '.join(f'"{key}" = ?' for key in values) or 'seq_id = seq_id'
+        sql = f'UPDATE exposures SET {assignments} WHERE night = ? AND seq_id = ?'
+        params = [sql_value(COLUMNS[key], value) for key, value in values.items()] + [self.date_str, int(seq_id)]
+        if self.writer is not None:
+            # the seq_id of the night run from 1 to seq_id_last
+            found = int(seq_id) in self.rows or 0 < int(seq_id) <= self.seq_id_last
+            if found:
+                self.rows.get(int(seq_id), {}).update(values)
+                self.writer.submit(self._execute, sql, params)
+        else:
+            found = self._execute(sql, params).rowcount > 0
+        if not found:
+            logging.warning(f"seq_id {seq_id} not found in the database.")
+            raise ValueError(f"seq_id {seq_id} not found in the database.")
+        for key, value in values.items():
+            logging.info(f"Updated {key} for seq_id {seq_id} to {value}")
+        self.save_exposure(seq_id)
+
+    def set_seq_id(self, seq_id):
+        self.seq_id = int(seq_id)
+        self.seq_id_str = f"{self.seq_id:04d}"
+        if self.writer is not None:
+            self.exposure = self.rows.get(self.seq_id)
+        else:
+            self.exposure = self.get_exposure(self.seq_id)
+
+    def get_exposure(self, seq_id, night=None):
+        """The exposure as a dict, None if it is not in the catalog."""
+        self.flush()
+        with self.lock:
+            cursor = self.connection.execute('SELECT * FROM exposures WHERE night = ? AND seq_id = ?',
+                                             (night or self.date_str, int(seq_id)))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def select(self, nights=None, seq_id=None, filter_type=None, alt_range=None, az_range=None):
+        """Select exposures of any night with the catalog indexes.
+
+        Args:
+            nights (str or tuple, optional): a night 'YYYYMMDD' or a (first, last) range.
+            seq_id (int, optional): the sequence id.
+            filter_type (str, optional): the filter.
+            alt_range, az_range (tuple, optional): (min, max) altitude and azimuth in degree.
+
+        Returns:
+            pd.DataFrame: the exposures ordered by night and seq_id.
+        """
+        import pandas as pd
+
+        clauses, params = [], []
+        if isinstance(nights, str):
+            clauses.append('night = ?')
+            params.append(nights)
+        elif nights is not None:
+            clauses.append('night BETWEEN ? AND ?')
+            params.extend(nights)
+        if seq_id is not None:
+            clauses.append('seq_id = ?')
+            params.append(int(seq_id))
+        if filter_type is not None:
+            clauses.append('"filter" = ?')
+            params.append(filter_type)
+        for name, limits in (('Alt', alt_range), ('Az', az_range)):
+            if limits is not None:
+                clauses.append(f'"{name}" BETWEEN ? AND ?')
+                params.extend(float(limit) for limit in limits)
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        self.flush()
+        with self.lock:
+            database = pd.read_sql_query(f'SELECT * FROM exposures{where} ORDER BY night, seq_id',
+                                         self.connection, params=params)
+        database['flag'] = database['flag'].astype(bool)
+        return database
+
+    def save_exposure(self, seq_id):
+        if self.writer is None:
+            # committed after each batch with the background writer
+            self._commit()
+        self.set_seq_id(seq_id)
+        logging.debug(f"Committed exposure {self.seq_id} to {self.db_file}")
+
+    def save(self):
+        self._io(self._commit)
+        logging.info(f"Database saved for {self.date_str}")
+
+    def close(self):
+        self.close_writer()
+        if self.traces is not None:
+            self.traces.close()
+        if self.connection is None:
+            return
+        self.connection.commit()
+        self.connection.close()
+        self.connection = None
+        logging.info(f"Closing database for {self.date_str}")
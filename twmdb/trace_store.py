@@ -0,0 +1,182 @@
+"""
+Memory-mapped store of electrometer traces.
+
+TraceStore appends the trace of each exposure (the structured array of
+`Keysight.read_data`, e.g. 'time' and 'CURR') to one large preallocated data
+file, and records its byte range, length and dtype in an index file. A trace
+is read back as a view of a `np.memmap` of the data file: opening it is an
+O(1) index lookup, no data is copied and only the pages actually used are
+read, so memory stays flat when reprocessing a whole season.
+
+    store.traces       data file, preallocated and doubled when full
+    store.traces.idx   fixed-size index records (night, seq_id, offset, nbytes, length, dtype)
+
+The data of a trace is written before its index record, so a crash never
+leaves an index record pointing to missing data. One appender at a time: the
+'a' mode takes an exclusive lock on the data file, readers ('r') do not lock.
+
+Example:
+    store = TraceStore('DATA/keysight/202408.traces')
+    store.append(20240821, seq_id, keysight.read_data())
+    d = store.get(20240821, seq_id)      # np.memmap view, d['time'], d['CURR']
+    store.close()
+"""
+import fcntl
+import os
+
+import numpy as np
+
+# one index record per trace
+INDEX_DTYPE = np.dtype([
+    ('night', '<i4'),   # YYYYMMDD
+    ('seq_id', '<i8'),
+    ('offset', '<i8'),  # byte offset in the data file
+    ('nbytes', '<i8'),
+    ('length', '<i8'),  # number of samples
+    ('dtype', 'S120'),  # numpy dtype descr of the samples
+])
+
+ALIGNMENT = 64 # bytes, traces start on cache line boundaries
+
+
+def _encode_dtype(dtype):
+    return repr(np.lib.format.dtype_to_descr(dtype)).encode('ascii')
+
+
+def _decode_dtype(text):
+    import ast
+    return np.lib.format.descr_to_dtype(ast.literal_eval(text.decode('ascii')))
+
+
+class TraceStore:
+    """Append-only store of traces keyed by (night, seq_id).
+
+    Args:
+        path (str): the data file, the index is path + '.idx'.
+        mode (str, optional): 'a' to append (created if needed) or 'r' read only.
+            Defaults to 'a'.
+        capacity (int, optional): initial size of a new data file in bytes,
+            doubled when full. Defaults to 64 MiB.
+    """
+    def __init__(self, path, mode='a', capacity=64 * 2**20):
+        if mode not in ('a', 'r'):
+            raise ValueError("Invalid mode. Choose from 'a', 'r'.")
+        self.path = path
+        self.index_path = path + '.idx'
+        self.mode = mode
+        self.map = None
+        self.file = self.index_file = None
+
+        if mode == 'a':
+            # created if needed, not O_APPEND: the traces are written at their offset
+            self.file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+            try:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.file.close()
+                self.file = None
+                raise IOError(f"{path} is already open for appending") from None
+            if os.path.getsize(path) == 0:
+                self.file.truncate(capacity)
+            self.capacity = os.path.getsize(path)
+            if os.path.exists(self.index_path):
+                # drop a record torn by a crash before appending
+                os.truncate(self.index_path, len(self.info()) * INDEX_DTYPE.itemsize)
+
+        # (night, seq_id) -> (offset, nbytes, dtype), the last record of a key wins
+        self.index = {}
+        self.dtypes = {}
+        self.end = 0
+        for record in self.info():
+            self._add(record['night'], record['seq_id'], record['offset'], record['nbytes'], record['dtype'])
+
+        if mode == 'a':
+            self.index_file = open(self.index_path, 'ab')
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return (int(key[0]), int(key[1])) in self.index
+
+    def __getitem__(self, key):
+        return self.get(*key)
+
+    def keys(self):
+        """The (night, seq_id) of the stored traces."""
+        return list(self.index)
+
+    def _add(self, night, seq_id, offset, nbytes, dtype):
+        text = bytes(dtype)
+        if text not in self.dtypes:
+            self.dtypes[text] = _decode_dtype(text)
+        self.index[(int(night), int(seq_id))] = (int(offset), int(nbytes), self.dtypes[text])
+        self.end = max(self.end, int(offset) + int(nbytes))
+
+    def append(self, night, seq_id, data):
+        """Append the trace of an exposure (replaces a trace with the same key).
+
+        Args:
+            night (int): the night as YYYYMMDD.
+            seq_id (int): the sequence id of the exposure.
+            data (np.ndarray): the samples, usually a structured array.
+        """
+        if self.file is None:
+            raise IOError(f"{self.path} is open read only")
+        data = np.ascontiguousarray(data)
+        offset = -(-self.end // ALIGNMENT) * ALIGNMENT
+        if offset + data.nbytes > self.capacity:
+            # grow geometrically, the file stays sparse until written
+            while offset + data.nbytes > self.capacity:
+                self.capacity *= 2
+            self.file.truncate(self.capacity)
+
+        self.file.seek(offset)
+        self.file.write(data.tobytes())
+        self.file.flush()
+
+        record = np.zeros(1, dtype=INDEX_DTYPE)
+        record[0] = (night, seq_id, offset, data.nbytes, len(data), _encode_dtype(data.dtype))
+        self.index_file.write(record.tobytes())
+        self.index_file.flush()
+        self._add(night, seq_id, offset, data.nbytes, record['dtype'][0])
+
+    def _map(self, end):
+        """The memory map of the data file, remapped if the file grew past it."""
+        if self.map is None or len(self.map) < end:
+            self.map = np.memmap(self.path, dtype=np.uint8, mode='r')
+        return self.map
+
+    def get(self, night, seq_id):
+        """The trace of an exposure as a read-only view of the data file.
+
+        Raises:
+            KeyError: if the trace is not in the store.
+        """
+        offset, nbytes, dtype = self.index[(int(night), int(seq_id))]
+        return self._map(offset + nbytes)[offset:offset + nbytes].view(dtype)
+
+    def info(self):
+        """The index file as a structured array (one record per append, including replaced traces)."""
+        if not os.path.exists(self.index_path):
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        if self.index_file is not None:
+            self.index_file.flush()
+        # a record torn by a crash is ignored
+        with open(self.index_path, 'rb') as f:
+            data = f.read()
+        return np.frombuffer(data[:len(data) - len(data) % INDEX_DTYPE.itemsize], dtype=INDEX_DTYPE)
+
+    def sync(self):
+        """Force the data and the index to disk."""
+        if self.file is not None:
+            os.fsync(self.file.fileno())
+            os.fsync(self.index_file.fileno())
+
+    def close(self):
+        self.map = None
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.index_file.close()
+            self.file = self.index_file = None
@@ -4,10 +4,54 @@ import numpy as np
 from datetime import datetime
 import logging
 
+from .exposure_log import ExposureTable, ExposureLog
+from .trace_store import TraceStore
+from .writer import BackgroundWriter
+
 class TwilightMonitorDatabase:
+    """Catalog of the exposures of one night.
+
+    Args:
+        day, month, year (int, optional): the night. Defaults to today.
+        path (str, optional): root of the DATA/YYYYMM/YYYYMMDD.csv catalog.
+        electrometer_path (str, optional): root of the electrometer files.
+        mount_path (str, optional): root of the mount files.
+        storage (str, optional): 'rewrite' keeps the catalog in a DataFrame and
+            rewrites the day file and a tmp file per exposure on save; 'append'
+            keeps it in an ExposureTable and appends each exposure to the day
+            log, so the cost of an exposure does not grow during the night.
+            Defaults to 'rewrite'.
+        log_format (str, optional): 'csv' or 'frames' in append storage, see
+            ExposureLog. The frames log is YYYYMMDD.log, compacted to the day CSV
+            on close. Defaults to 'csv'.
+        fsync (str or float, optional): fsync policy of the log, see ExposureLog.
+            Defaults to 'close'.
+        trace_store (bool or str, optional): append the electrometer traces to the
+            month's TraceStore (YYYYMM.traces in the electrometer folder) instead
+            of one .npy file per exposure; the electrometer_filename of the catalog
+            is then the store, keyed by (night, seq_id). 'r' opens the store read
+            only, to read a night while the acquisition appends to it. Defaults to False.
+        background (bool, optional): run the disk writes on a BackgroundWriter
+            thread, the acquisition then never waits for the disk unless
+            `queue_size` writes are pending. Defaults to False.
+        queue_size (int, optional): size of the background write queue. Defaults to 256.
+    """
+    STORAGES = ('rewrite', 'append')
+
     def __init__(self, day=None, month=None, year=None, path="/home/estevesjh/Documents/github/",
                  electrometer_path="/home/estevesjh/Documents/twilightMonitor/DATA/keysighB2987A",
-                 mount_path='/home/estevesjh/Documents/twilightMonitor/DATA/mount/'):
+                 mount_path='/home/estevesjh/Documents/twilightMonitor/DATA/mount/',
+                 storage='rewrite', log_format='csv', fsync='close', trace_store=False,
+                 background=False, queue_size=256):
+        if storage not in self.STORAGES:
+            raise ValueError(f"Invalid storage. Choose from {', '.join(map(repr, self.STORAGES))}.")
+        self.storage = storage
+        self.log_format = log_format
+        self.fsync = fsync
+        self.table = None
+        self.log = None
+        self.writer = None
+        self.database = None
         self.year = year if year is not None else datetime.now().year
         self.month = month if month is not None else datetime.now().month
         self.day = day if day is not None else datetime.now().day
@@ -22,11 +66,53 @@ class TwilightMonitorDatabase:
         
         # Initialize or load database
         self.load_database()
+        self.traces = TraceStore(self.trace_store_path, mode='r' if trace_store == 'r' else 'a') if trace_store else None
 
         # count the exposures
-        self.seq_id_last = self.database['seq_id'].max() if not self.database.empty else 0
+        self.seq_id_last = self.max_seq_id()
+
+        if background:
+            self.writer = BackgroundWriter(maxsize=queue_size, on_batch=self.after_batch)
+
+    def _io(self, func, *args, **kwargs):
+        """Run a disk write now, or queue it on the background writer."""
+        if self.writer is None:
+            return func(*args, **kwargs)
+        self.writer.submit(func, *args, **kwargs)
+
+    def after_batch(self):
+        """Called by the background writer after each batch of writes."""
+
+    def flush(self):
+        """Wait for the background writes."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def max_seq_id(self):
+        """The last seq_id of the night, 0 if there is no exposure yet."""
+        if self.storage == 'append':
+            return self.table.max_seq_id()
+        return self.database['seq_id'].max() if not self.database.empty else 0
+
+    @property
+    def database(self):
+        """The catalog as a DataFrame (built from the table in append storage)."""
+        if self.table is None:
+            return self._database
+        if self._database_version != self.table.version:
+            self._database = self.table.to_dataframe()
+            self._database_version = self.table.version
+        return self._database
+
+    @database.setter
+    def database(self, value):
+        self._database = value
+        self._database_version = None
 
     def load_database(self):
+        if self.storage == 'append':
+            self.load_log()
+            return
         if not os.path.exists(self.file_path):
             self.database = pd.DataFrame(columns=[
                 'tmid', 'date', 'seq_id', 'exp_time_cmd', 'exp_time', 
@@ -44,6 +130,37 @@ class TwilightMonitorDatabase:
                 self.set_seq_id(self.database['seq_id'].max() + 1 if not self.database.empty else 0)
             logging.info(f"Loaded existing database for {self.date_str}")
 
+    def load_log(self):
+        """Load the day catalog into an ExposureTable and open its append-only log."""
+        self.table = ExposureTable()
+        if self.log_format == 'frames' and os.path.exists(self.log_path):
+            records = ExposureLog.read(self.log_path, format='frames')
+        else:
+            # start from the day CSV (written by either storage)
+            records = ExposureLog.read(self.file_path)
+        for row in records:
+            # the last record of a seq_id wins
+            self.table.put(row)
+        self.log_records = len(records)
+
+        if self.log_format == 'csv' and records and list(records[0]) != list(self.table.columns):
+            # a day file from the rewrite storage with other columns, rewrite it once
+            self.compact()
+        seed = self.log_format == 'frames' and not os.path.exists(self.log_path)
+        self.log = ExposureLog(self.log_path, columns=self.table.columns, format=self.log_format, fsync=self.fsync)
+        if seed:
+            # the frames log starts with the exposures of the day CSV
+            for seq_id in self.table.index:
+                self.log.append(self.table.get(seq_id))
+        self.seq_id = self.table.max_seq_id()
+        self.seq_id_str = f"{self.seq_id:04d}"
+        logging.info(f"Loaded {len(self.table)} exposures for {self.date_str} from {self.log_path}")
+
+    def compact(self):
+        """Rewrite the day CSV with one line per exposure (append storage)."""
+        self.database.to_csv(self.file_path, index=False)
+        self.log_records = len(self.table)
+
     def init_paths(self, path, electrometer_path, mount_path):
         # Define paths
         # self.root = add_path(path, "twmdb-python")
@@ -52,11 +169,14 @@ class TwilightMonitorDatabase:
         self.file_path = add_path(self.folder_path, f"{self.year}{self.month:02d}{self.day:02d}.csv")
         self.tmp_folder = add_path(self.folder_path, "tmp")
         self.seq_id_file = add_path(self.tmp_folder, "seq_id_{:04d}.csv")
+        # append-only log of the append storage
+        self.log_path = self.file_path if self.log_format == 'csv' else add_path(self.folder_path, f"{self.date_str}.log")
 
         # Define paths for electrometer
         self.electrometer_path = electrometer_path
         self.electrometer_folder = add_path(self.electrometer_path, f"{self.year}{self.month:02d}")
         self.electrometer_str = add_path(self.electrometer_folder, "%s_{seq_id}.npy" % (self.date_str))
+        self.trace_store_path = add_path(self.electrometer_folder, f"{self.year}{self.month:02d}.traces")
 
         # Define paths for mount
         self.mount_path = mount_path
@@ -78,9 +198,11 @@ class TwilightMonitorDatabase:
         self.set_seq_id(self.seq_id_last + 1)
         tmid = timestamp.strftime('%Y%m%d%H%M%S')
         if electrometer_filename is None:
-            electrometer_filename = self.electrometer_str.format(seq_id=self.seq_id)
+            # the trace is stored under (night, seq_id), see load_electrometer_file
+            electrometer_filename = self.trace_store_path if self.traces is not None else \
+                self.electrometer_str.format(seq_id=self.seq_id)
 
-        new_exposure = pd.DataFrame([{
+        new_exposure = {
             'tmid': tmid,
             'date': timestamp,
             'seq_id': self.seq_id,
@@ -98,13 +220,28 @@ class TwilightMonitorDatabase:
             'electrometer_filename': electrometer_filename,
             'mount_filename': self.mount_str.format(seq_id=self.seq_id),
             'flag': flag
-        }])
-        self.database = pd.concat([self.database, new_exposure], ignore_index=True)
+        }
+        self.insert_exposure(new_exposure)
         self.save_exposure(self.seq_id)
         self.seq_id_last += 1
         logging.info(f"Added exposure {self.seq_id} at {timestamp}")
 
+    def insert_exposure(self, row):
+        """Add the row of a new exposure to the catalog."""
+        if self.storage == 'append':
+            self.table.put(row)
+        else:
+            self.database = pd.concat([self.database, pd.DataFrame([row])], ignore_index=True)
+
     def update_exposure(self, seq_id, **kwargs):
+        if self.storage == 'append':
+            if seq_id not in self.table:
+                logging.warning(f"seq_id {seq_id} not found in the database.")
+                raise ValueError(f"seq_id {seq_id} not found in the database.")
+            self.table.update(seq_id, **kwargs)
+            logging.info(f"Updated {list(kwargs)} for seq_id {seq_id}")
+            self.save_exposure(seq_id)
+            return
         if seq_id in self.database['seq_id'].values:
             for key, value in kwargs.items():
                 if key in self.database.columns:
@@ -118,32 +255,76 @@ class TwilightMonitorDatabase:
     def set_seq_id(self, seq_id):
         self.seq_id = int(seq_id)
         self.seq_id_str = f"{self.seq_id:04d}"
-        self.exposure = self.database.loc[self.database.seq_id == self.seq_id]
+        if self.storage == 'append':
+            # the row as a dict, the DataFrame is not built for each exposure
+            self.exposure = self.table.get(self.seq_id) if self.seq_id in self.table else None
+        else:
+            self.exposure = self.database.loc[self.database.seq_id == self.seq_id]
 
     def save_exposure(self, seq_id):
         self.set_seq_id(seq_id)
-        self.exposure.to_csv(self.seq_id_file.format(self.seq_id), index=False, header=True)
+        if self.storage == 'append':
+            # the log record replaces the tmp file
+            self._io(self.log.append, self.exposure)
+            self.log_records += 1
+            logging.debug(f"Appended exposure {self.seq_id} to {self.log_path}")
+            return
+        self._io(self.exposure.to_csv, self.seq_id_file.format(self.seq_id), index=False, header=True)
         logging.debug(f"Saved tmp exposure {self.seq_id} to {self.seq_id_file.format(self.seq_id)}")
 
     def save_electrometer_file(self, data, seq_id=None):
         if seq_id is None: seq_id = self.seq_id
+        if self.traces is not None:
+            self.exposure_electrometer_file = self.trace_store_path
+            self._io(self.traces.append, int(self.date_str), seq_id, data)
+            logging.info(f"Appended electrometer trace for seq_id {seq_id} to {self.trace_store_path}")
+            return
         self.exposure_electrometer_file = self.electrometer_str.format(seq_id=seq_id)
-        np.save(self.exposure_electrometer_file, data)
+        self._io(np.save, self.exposure_electrometer_file, data)
         logging.info(f"Saved electrometer file for seq_id {self.seq_id} to {self.exposure_electrometer_file}")
 
+    def load_electrometer_file(self, seq_id=None):
+        """The electrometer trace of an exposure, memory mapped (not read into RAM)."""
+        if seq_id is None: seq_id = self.seq_id
+        self.flush()
+        if self.traces is not None and (int(self.date_str), seq_id) in self.traces:
+            return self.traces.get(int(self.date_str), seq_id)
+        return np.load(self.electrometer_str.format(seq_id=seq_id), mmap_mode='r')
+
     def save_mount_file(self, dict, seq_id=None):
         if seq_id is None: seq_id = self.seq_id
         self.exposure_mount_file = self.mount_str.format(seq_id=seq_id)
-        np.savez(self.exposure_mount_file, **dict)
+        self._io(np.savez, self.exposure_mount_file, **dict)
         logging.info(f"Saved mount file for seq_id {self.seq_id} to {self.exposure_mount_file}")
 
     def save(self):
-        self.exposure.to_csv(self.seq_id_file.format(self.seq_id), index=False, header=True)
-        self.database.to_csv(self.file_path, index=False)
+        if self.storage == 'append':
+            # the records are already in the log, see ExposureLog for the fsync policy
+            return
+        self._io(self.exposure.to_csv, self.seq_id_file.format(self.seq_id), index=False, header=True)
+        # a copy, update_exposure changes the DataFrame in place
+        database = self.database if self.writer is None else self.database.copy()
+        self._io(database.to_csv, self.file_path, index=False)
         logging.info(f"Database saved for {self.date_str}")
 
+    def close_writer(self):
+        """Flush the background writes and stop the writer thread."""
+        if self.writer is not None:
+            writer, self.writer = self.writer, None
+            writer.close()
+
     def close(self):
-        self.save()
+        if self.storage == 'rewrite':
+            self.save()
+        self.close_writer()
+        if self.traces is not None:
+            self.traces.close()
+        if self.storage == 'append':
+            self.log.close()
+            if self.log_format == 'frames' or self.log_records != len(self.table):
+                # updates were appended as new records, keep one line per exposure
+                self.compact()
+            self.table = None
         self.database = None
         logging.info(f"Closing database for {self.date_str}")
         # destroy the self object
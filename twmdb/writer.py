@@ -0,0 +1,131 @@
+"""
+Background writer for the database and file persistence.
+
+BackgroundWriter runs the disk writes of TwilightMonitorDatabase (log
+records, tmp and day CSV files, electrometer and mount files, SQLite
+statements) on a dedicated thread, so a slow SD card or network disk does
+not stall the mount/electrometer cycle:
+
+- ordering: one FIFO queue and one thread, the writes run in the order
+  they were submitted;
+- batching: the writer takes every write waiting in the queue (up to
+  `batch_size`) and calls `on_batch` once after them (e.g. one SQLite commit);
+- backpressure: the queue is bounded, `submit` blocks when it is full
+  instead of letting the memory grow while the disk is stalled;
+- flush on close: `flush` waits for the queued writes and `close` flushes
+  and stops the thread.
+
+An exception raised by a write is kept and raised again by the next
+`submit`, `flush` or `close`, on the acquisition thread.
+
+Example:
+    writer = BackgroundWriter(maxsize=256)
+    writer.submit(np.save, filename, data)
+    writer.close()
+"""
+import logging
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """Run write calls in order on a background thread.
+
+    Args:
+        maxsize (int, optional): number of queued writes before `submit` blocks. Defaults to 256.
+        batch_size (int, optional): maximum number of writes between two `on_batch`. Defaults to 64.
+        on_batch (callable, optional): called on the writer thread after each batch.
+        timeout (float, optional): longest time `submit` blocks on a full queue
+            before raising queue.Full. Defaults to None (wait for the disk).
+    """
+    def __init__(self, maxsize=256, batch_size=64, on_batch=None, timeout=None, name='twmdb-writer'):
+        self.queue = queue.Queue(maxsize)
+        self.batch_size = batch_size
+        self.on_batch = on_batch
+        self.timeout = timeout
+        self.error = None
+        self.written = 0 # writes done
+        self.batches = 0
+        self.blocked_time = 0.0 # time submit waited on a full queue, sec
+        self.max_depth = 0
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    @property
+    def is_running(self):
+        return self.thread.is_alive()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError(f"Background write failed: {error!r}") from error
+
+    def submit(self, func, *args, **kwargs):
+        """Queue a call to func(*args, **kwargs), blocking while the queue is full.
+
+        The arguments are used later on the writer thread: they must not be
+        modified after the call.
+        """
+        self._raise_error()
+        if not self.is_running:
+            raise RuntimeError("The background writer is closed")
+        item = (func, args, kwargs)
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # backpressure: wait for the disk
+            t0 = time.perf_counter()
+            self.queue.put(item, timeout=self.timeout)
+            self.blocked_time += time.perf_counter() - t0
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            for item in batch:
+                if item is _STOP:
+                    stop = True
+                    continue
+                func, args, kwargs = item
+                try:
+                    func(*args, **kwargs)
+                    self.written += 1
+                except Exception as error:
+                    logging.exception(f"Background write {getattr(func, '__name__', func)} failed")
+                    if self.error is None:
+                        self.error = error
+            if self.on_batch is not None:
+                try:
+                    self.on_batch()
+                except Exception as error:
+                    logging.exception("Background write batch callback failed")
+                    if self.error is None:
+                        self.error = error
+            self.batches += 1
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """Wait until every queued write is done."""
+        if self.is_running:
+            self.queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Flush the queued writes and stop the thread."""
+        if self.is_running:
+            self.queue.put(_STOP)
+            self.thread.join()
+        self._raise_error()